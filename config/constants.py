@@ -13,6 +13,13 @@ TEST_PATH = path.join(PROJECT_ROOT, "test")
 DATA_V2_PATH = path.join(RAW_DATA_PATH, "uniswap_v2")
 DATA_V3_PATH = path.join(RAW_DATA_PATH, "uniswap_v3")
 
+# Format of the raw event data in the version directories: "parquet" saves
+# each (entity, event) partition in entity=<entity>/event=<event>/part-0.parquet,
+# "csv" in <event>_<entity>.csv
+RAW_DATA_FORMAT = "parquet"
+# compression of the parquet files
+PARQUET_COMPRESSION = "zstd"
+
 # Event timestring UTC
 # 币安宣布并购FTX以救济同行(随后FTX的平台币FTX Token开始暴跌). FTX平台出现挤兑.
 EVENT_ONE = ("event_one", "2022-11-06 15:47:00")
@@ -23,14 +30,115 @@ EVENT_THREE = ("event_three", "2022-11-09 14:30:00")
 # 币安宣布放弃并表示问题太大，无法解决，随后FTX申请破产
 EVENT_FOUR = ("event_four", "2022-11-09 21:00:00")
 
+# Events fetched and aggregated in the panel
+EVENT_LIST = [EVENT_ONE, EVENT_TWO, EVENT_THREE, EVENT_FOUR]
+
 # Event window in hours
 EVENT_WINDOW = 2
 
 # API HTTP
 HTTP_V2 = "https://api.thegraph.com/subgraphs/name/ianlapham/uniswapv2"
 HTTP_V3 = "https://api.thegraph.com/subgraphs/name/uniswap/uniswap-v3"
+# blocks of the chain, to map the timestamps to block numbers
+HTTP_BLOCKS = "https://api.thegraph.com/subgraphs/name/blocklytics/ethereum-blocks"
+
+# Equivalent endpoints serving the same subgraph, e.g. mirrors or self-hosted
+# graph-nodes: the queries to HTTP_V2, HTTP_V3 and HTTP_BLOCKS are balanced
+# over the endpoint and its mirrors, and fail over to the healthy ones
+HTTP_V2_MIRRORS: list[str] = []
+HTTP_V3_MIRRORS: list[str] = []
+HTTP_BLOCKS_MIRRORS: list[str] = []
+# seconds between two health checks of the endpoints, and their timeout
+ENDPOINT_HEALTH_SECONDS = 60
+ENDPOINT_HEALTH_TIMEOUT = 5
+# blocks an endpoint may lag behind the most recent one and stay healthy
+ENDPOINT_MAX_BLOCK_LAG = 10
+# seconds a failing endpoint is left out, doubled after each failure
+ENDPOINT_COOLDOWN = 5.0
+ENDPOINT_COOLDOWN_CAP = 300.0
+
+# HTTP client settings shared by all the subgraph queries
+# number of per-host connection pools kept alive
+HTTP_POOL_CONNECTIONS = 4
+# maximum number of keep-alive connections per host
+HTTP_POOL_MAXSIZE = 16
+# request timeout in seconds
+HTTP_TIMEOUT = 120
+# maximum number of requests in flight for the asyncio client
+ASYNC_CONCURRENCY = 8
+# number of the latest request timings kept by a client
+HTTP_TIMINGS_KEPT = 1000
+
+# Retry policy for failed queries (HTTP 429/5xx and GraphQL error payloads)
+RETRY_MAX_ATTEMPTS = 8
+# exponential backoff in seconds: min(cap, base * 2 ** attempt) with full jitter
+RETRY_BACKOFF_BASE = 1.0
+RETRY_BACKOFF_CAP = 60.0
+# token-bucket rate limit of each endpoint shared by all the workers,
+# in requests per second
+RATE_LIMIT_PER_SECOND = 10.0
+RATE_LIMIT_BURST = 20
+
+# On-disk cache of the query responses, off by default: the range store
+# already keeps the fetched events, in about half the space, so the cache
+# is only needed to replay the responses, e.g. with the stand-in server
+CACHE_ENABLED = False
+CACHE_PATH = path.join(RAW_DATA_PATH, "cache")
+# size cap in bytes, least recently used entries are evicted beyond it
+CACHE_MAX_BYTES = 2 * 1024**3
+
+# Checkpoints of the fetch runs, to resume an interrupted window: the pages
+# of the window being fetched, as uncompressed JSON, removed once the window
+# is covered
+CHECKPOINT_ENABLED = True
+CHECKPOINT_PATH = path.join(RAW_DATA_PATH, "checkpoints")
+
+# Store of the fetched time ranges, so only the missing ranges are fetched
+RANGE_STORE_ENABLED = True
+RANGE_STORE_PATH = path.join(RAW_DATA_PATH, "ranges")
+
+# Telemetry of the subgraph requests: one JSON line per request in
+# requests_<run>.jsonl and a Prometheus textfile snapshot in fetch.prom
+TELEMETRY_ENABLED = True
+TELEMETRY_PATH = path.join(RAW_DATA_PATH, "telemetry")
+# seconds between two snapshots of the textfile during a run
+TELEMETRY_SNAPSHOT_SECONDS = 15
+# upper bounds in seconds of the buckets of the latency histograms
+TELEMETRY_LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+# Streaming of the events to disk, to bound the memory of long windows
+# number of pages flattened and written together
+STREAM_PAGES = 10
+# number of rows per frame read back from the range store
+STREAM_CHUNK_ROWS = 100_000
+
+# Cursor the event windows are paged on: "timestamp" pages the events by
+# timestamp, "block" by the block number of their transaction, with the
+# blocks of each window looked up in the block index
+FETCH_MODE = "timestamp"
+BLOCK_INDEX_PATH = path.join(RAW_DATA_PATH, "blocks")
+
+# Pipeline of the fetch and panel tasks
+# number of worker threads running the tasks
+PIPELINE_WORKERS = 8
+# maximum number of tasks querying the same subgraph endpoint at once
+ENDPOINT_CONCURRENCY = 2
 
 # Query Scripts
+QUERY_BLOCK_AT = """
+query ($timestamp: BigInt!){
+  blocks(
+    first: 1
+    orderBy: timestamp
+    orderDirection: desc
+    where: {timestamp_lte: $timestamp}
+  ) {
+    number
+    timestamp
+  }
+}
+"""
+
 QUERY_SWAP_V2 = """
 query ($start_timestamp_gt: Int!){
   swaps(
@@ -530,3 +638,356 @@ query ($start_timestamp_gt: Int!){
   }
 }
 """
+
+QUERY_COLLECT_V3 = """
+query ($start_timestamp_gt: Int!){
+  collects(
+    first: 1000
+    orderBy: timestamp
+    orderDirection: asc
+    where: {timestamp_gt: $start_timestamp_gt}
+  ) {
+    amount0
+    amount1
+    amountUSD
+    id
+    logIndex
+    owner
+    pool {
+      collectedFeesToken0
+      collectedFeesToken1
+      collectedFeesUSD
+      createdAtBlockNumber
+      createdAtTimestamp
+      feeGrowthGlobal0X128
+      feeGrowthGlobal1X128
+      feeTier
+      feesUSD
+      id
+      liquidity
+      liquidityProviderCount
+      observationIndex
+      sqrtPrice
+      tick
+      token0Price
+      token1Price
+      totalValueLockedETH
+      totalValueLockedToken0
+      totalValueLockedToken1
+      totalValueLockedUSD
+      totalValueLockedUSDUntracked
+      txCount
+      untrackedVolumeUSD
+      volumeToken0
+      volumeToken1
+      volumeUSD
+    }
+    tickLower
+    tickUpper
+    timestamp
+    transaction {
+      blockNumber
+      gasPrice
+      gasUsed
+      id
+      timestamp
+    }
+  }
+}
+"""
+
+QUERY_FLASH_V3 = """
+query ($start_timestamp_gt: Int!){
+  flashes(
+    first: 1000
+    orderBy: timestamp
+    orderDirection: asc
+    where: {timestamp_gt: $start_timestamp_gt}
+  ) {
+    amount0
+    amount0Paid
+    amount1
+    amount1Paid
+    amountUSD
+    id
+    logIndex
+    pool {
+      collectedFeesToken0
+      collectedFeesToken1
+      collectedFeesUSD
+      createdAtBlockNumber
+      createdAtTimestamp
+      feeGrowthGlobal0X128
+      feeGrowthGlobal1X128
+      feeTier
+      feesUSD
+      id
+      liquidity
+      liquidityProviderCount
+      observationIndex
+      sqrtPrice
+      tick
+      token0Price
+      token1Price
+      totalValueLockedETH
+      totalValueLockedToken0
+      totalValueLockedToken1
+      totalValueLockedUSD
+      totalValueLockedUSDUntracked
+      txCount
+      untrackedVolumeUSD
+      volumeToken0
+      volumeToken1
+      volumeUSD
+    }
+    recipient
+    sender
+    timestamp
+    transaction {
+      blockNumber
+      gasPrice
+      gasUsed
+      id
+      timestamp
+    }
+  }
+}
+"""
+
+# Raw columns used by the panel converters for each (version, entity),
+# also the projection of the "panel-minimal" query profile
+PANEL_COLUMNS = {
+    ("v2", "swaps"): [
+        "id",
+        "timestamp",
+        "pair_id",
+        "pair_token0_id",
+        "pair_token0_name",
+        "pair_token0_symbol",
+        "pair_token1_id",
+        "pair_token1_name",
+        "pair_token1_symbol",
+        "amount0In",
+        "amount0Out",
+        "amount1In",
+        "amount1Out",
+        "amountUSD",
+        "pair_reserve0",
+        "pair_reserve1",
+    ],
+    ("v3", "swaps"): [
+        "id",
+        "timestamp",
+        "pool_id",
+        "token0_id",
+        "token0_name",
+        "token0_symbol",
+        "token1_id",
+        "token1_name",
+        "token1_symbol",
+        "amount0",
+        "amount1",
+        "amountUSD",
+        "pool_totalValueLockedToken0",
+        "pool_totalValueLockedToken1",
+    ],
+    ("v2", "mints"): [
+        "id",
+        "timestamp",
+        "pair_id",
+        "pair_token0_id",
+        "pair_token0_name",
+        "pair_token0_symbol",
+        "pair_token1_id",
+        "pair_token1_name",
+        "pair_token1_symbol",
+        "amount0",
+        "amount1",
+        "amountUSD",
+        "pair_reserve0",
+        "pair_reserve1",
+    ],
+    ("v3", "mints"): [
+        "id",
+        "timestamp",
+        "pool_id",
+        "token0_id",
+        "token0_name",
+        "token0_symbol",
+        "token1_id",
+        "token1_name",
+        "token1_symbol",
+        "amount0",
+        "amount1",
+        "amountUSD",
+        "pool_totalValueLockedToken0",
+        "pool_totalValueLockedToken1",
+        "pool_token0Price",
+        "pool_token1Price",
+    ],
+    ("v2", "burns"): [
+        "id",
+        "timestamp",
+        "pair_id",
+        "pair_token0_id",
+        "pair_token0_name",
+        "pair_token0_symbol",
+        "pair_token1_id",
+        "pair_token1_name",
+        "pair_token1_symbol",
+        "amount0",
+        "amount1",
+        "amountUSD",
+        "pair_reserve0",
+        "pair_reserve1",
+    ],
+    ("v3", "burns"): [
+        "id",
+        "timestamp",
+        "pool_id",
+        "token0_id",
+        "token0_name",
+        "token0_symbol",
+        "token1_id",
+        "token1_name",
+        "token1_symbol",
+        "amount0",
+        "amount1",
+        "amountUSD",
+        "pool_totalValueLockedToken0",
+        "pool_totalValueLockedToken1",
+        "pool_token0Price",
+        "pool_token1Price",
+    ],
+}
+
+# Query profile of the fetchers: "full" fetches every field of the QUERY_*
+# scripts, "panel-minimal" only the PANEL_COLUMNS and "normalized" the event
+# fields with the ids of the DIMENSION_FIELDS
+QUERY_PROFILE = "full"
+
+# Declared types of the fields of the subgraphs, by version, parsed when the
+# events are fetched: a column of the unwrapped events takes the type of its
+# leaf field, e.g. pair_reserve0 that of reserve0. The BigDecimal fields and
+# the BigInt fields past int64, e.g. sqrtPriceX96, are float64; the fields
+# not listed, the ids, addresses, names and symbols, are strings
+FIELD_TYPES = {
+    "v2": {
+        "int64": [
+            "blockNumber",
+            "createdAtBlockNumber",
+            "createdAtTimestamp",
+            "decimals",
+            "liquidityProviderCount",
+            "logIndex",
+            "timestamp",
+            "txCount",
+        ],
+        "float64": [
+            "amount0",
+            "amount0In",
+            "amount0Out",
+            "amount1",
+            "amount1In",
+            "amount1Out",
+            "amountUSD",
+            "derivedETH",
+            "feeLiquidity",
+            "liquidity",
+            "reserve0",
+            "reserve1",
+            "reserveETH",
+            "reserveUSD",
+            "token0Price",
+            "token1Price",
+            "totalLiquidity",
+            "totalSupply",
+            "trackedReserveETH",
+            "tradeVolume",
+            "tradeVolumeUSD",
+            "untrackedVolumeUSD",
+            "volumeToken0",
+            "volumeToken1",
+            "volumeUSD",
+        ],
+        "bool": ["needsComplete"],
+    },
+    "v3": {
+        "int64": [
+            "blockNumber",
+            "createdAtBlockNumber",
+            "createdAtTimestamp",
+            "decimals",
+            "feeTier",
+            "gasPrice",
+            "gasUsed",
+            "liquidityProviderCount",
+            "logIndex",
+            "observationIndex",
+            "poolCount",
+            "tick",
+            "tickLower",
+            "tickUpper",
+            "timestamp",
+            "txCount",
+        ],
+        "float64": [
+            "amount",
+            "amount0",
+            "amount0Paid",
+            "amount1",
+            "amount1Paid",
+            "amountUSD",
+            "collectedFeesToken0",
+            "collectedFeesToken1",
+            "collectedFeesUSD",
+            "derivedETH",
+            "feeGrowthGlobal0X128",
+            "feeGrowthGlobal1X128",
+            "feesUSD",
+            "liquidity",
+            "sqrtPrice",
+            "sqrtPriceX96",
+            "token0Price",
+            "token1Price",
+            "totalSupply",
+            "totalValueLocked",
+            "totalValueLockedETH",
+            "totalValueLockedToken0",
+            "totalValueLockedToken1",
+            "totalValueLockedUSD",
+            "totalValueLockedUSDUntracked",
+            "untrackedVolumeUSD",
+            "volume",
+            "volumeToken0",
+            "volumeToken1",
+            "volumeUSD",
+        ],
+    },
+}
+
+# Nested objects fetched as dimension tables in the "normalized" profile:
+# the events only keep their id, the dimension tables keep the fields
+DIMENSION_FIELDS = {
+    "v2": {"pair": "pairs", "token0": "tokens", "token1": "tokens"},
+    "v3": {"pool": "pools", "token0": "tokens", "token1": "tokens"},
+}
+DIMENSION_BATCH_SIZE = 1000
+
+# Time slices of an event window paged in parallel by the fetchers,
+# and the number of threads paging them
+FETCH_SLICES = 1
+SLICE_WORKERS = 8
+
+# Adaptive slicing: width in seconds of the buckets of the learned event
+# density, and the expected pages below which a slice is not split further
+DENSITY_BUCKET = 60
+SLICE_MIN_PAGES = 2
+
+# Pages fetched ahead of the consumer across the time slices of a window;
+# the slice being yielded is never held back by it
+SLICE_BUFFER_PAGES = 64
+
+# Dry-run plan of a fetch: pages sampled in each event window to estimate
+# the density of the events
+PLAN_SAMPLES = 8
@@ -0,0 +1,192 @@
+"""
+Throughput benchmark of the fetch functions against local stand-in subgraphs.
+"""
+
+import asyncio
+import contextlib
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable
+import numpy as np
+import pandas as pd
+from config import constants
+import environ.fetch.fetch_async as fetch_async
+import environ.fetch.fetch_utils as utils
+import environ.fetch.subgraph_query as subgraph
+from environ.benchmark.stand_in_server import start_in_process
+from environ.fetch.fetch_burns_v2 import fetch_burns_v2
+from environ.fetch.fetch_burns_v3 import fetch_burns_v3
+from environ.fetch.fetch_mints_v2 import fetch_mints_v2
+from environ.fetch.fetch_mints_v3 import fetch_mints_v3
+from environ.fetch.fetch_swaps_v2 import fetch_swaps_v2
+from environ.fetch.fetch_swaps_v3 import fetch_swaps_v3
+from environ.fetch.subgraph_query import RetryPolicy, SubgraphClient
+from environ.fetch.subgraph_query_async import AsyncSubgraphClient, gather_or_cancel
+
+# sync and async fetch functions by (version, entity)
+FETCHERS = {
+    ("v2", "swaps"): (fetch_swaps_v2, fetch_async.fetch_swaps_v2_async),
+    ("v3", "swaps"): (fetch_swaps_v3, fetch_async.fetch_swaps_v3_async),
+    ("v2", "mints"): (fetch_mints_v2, fetch_async.fetch_mints_v2_async),
+    ("v3", "mints"): (fetch_mints_v3, fetch_async.fetch_mints_v3_async),
+    ("v2", "burns"): (fetch_burns_v2, fetch_async.fetch_burns_v2_async),
+    ("v3", "burns"): (fetch_burns_v3, fetch_async.fetch_burns_v3_async),
+}
+
+
+def _run_sync(
+    jobs: list[tuple[Callable, int, int]], concurrency: int, policy: RetryPolicy
+) -> tuple[int, list[dict], float]:
+    """
+    Run the jobs with the sync fetchers on a thread pool.
+    """
+
+    client = SubgraphClient(
+        pool_maxsize=concurrency, policy=policy, use_cache=False, timings_kept=None
+    )
+    subgraph.set_client(client)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        frames = list(executor.map(lambda job: job[0](job[1], job[2]), jobs))
+    wall = time.perf_counter() - start
+
+    client.close()
+    return sum(len(frame) for frame in frames), list(client.timings), wall
+
+
+def _run_async(
+    jobs: list[tuple[Callable, int, int]], concurrency: int, policy: RetryPolicy
+) -> tuple[int, list[dict], float]:
+    """
+    Run the jobs with the async fetchers on one event loop.
+    """
+
+    async def _run() -> tuple[int, list[dict], float]:
+        async with AsyncSubgraphClient(
+            concurrency=concurrency, policy=policy, use_cache=False, timings_kept=None
+        ) as client:
+            start = time.perf_counter()
+            frames = await gather_or_cancel(
+                *[func(client, lo, hi) for func, lo, hi in jobs]
+            )
+            wall = time.perf_counter() - start
+            return sum(len(frame) for frame in frames), list(client.timings), wall
+
+    return asyncio.run(_run())
+
+
+def _summarize(
+    mode: str, concurrency: int, rows: int, timings: list[dict], wall: float
+) -> dict:
+    """
+    Throughput and latency of one benchmark run.
+    """
+
+    latencies = [timing["elapsed"] for timing in timings if timing["status"] == 200]
+    pages = len(latencies)
+
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "pages": pages,
+        "rows": rows,
+        "retries": len(timings) - pages,
+        "wall_s": round(wall, 3),
+        "pages_per_s": round(pages / wall, 2),
+        "rows_per_s": round(rows / wall, 1),
+        "mb_per_s": round(sum(t["bytes"] for t in timings) / wall / 2**20, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 1),
+    }
+
+
+def benchmark_fetch(
+    concurrency_levels: tuple[int, ...] = (1, 2, 4, 8),
+    modes: tuple[str, ...] = ("sync",),
+    event_info: tuple[str, str] = constants.EVENT_ONE,
+    window_hours: float = 1.0,
+    keys: tuple[tuple[str, str], ...] = (("v2", "swaps"), ("v3", "swaps")),
+    latency: float = 0.05,
+    latency_jitter: float = 0.0,
+    error_rate: float = 0.0,
+    server_rate_limit: float | None = None,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Function to run the real fetch functions against two stand-in subgraphs
+    (v2 and v3) and report pages/s, rows/s and p50/p99 latency for each
+    mode and concurrency level.
+
+    At concurrency level N the window is split into N sub-windows per
+    (version, entity), fetched side by side; in the "sliced" mode the
+    fetchers split the window into N time slices themselves.
+    """
+
+    center = int(pd.to_datetime(event_info[1]).timestamp())
+    start = int(center - window_hours * 3600 / 2)
+    end = int(center + window_hours * 3600 / 2)
+
+    # no client-side rate limit, only the stand-in throttles
+    policy = RetryPolicy(rate_limit=1e9, rate_burst=10**9, backoff_base=0.1)
+
+    results = []
+    endpoints = (constants.HTTP_V2, constants.HTTP_V3)
+    server_kwargs = {
+        "latency": latency,
+        "latency_jitter": latency_jitter,
+        "error_rate": error_rate,
+        "rate_limit": server_rate_limit,
+    }
+    # one server process per version
+    server_v2, url_v2 = start_in_process(seed, **server_kwargs)
+    server_v3, url_v3 = start_in_process(seed + 1, **server_kwargs)
+
+    # point the fetchers at the stand-ins, always fetching the whole window
+    constants.HTTP_V2, constants.HTTP_V3 = url_v2, url_v3
+    stores = (
+        constants.RANGE_STORE_ENABLED,
+        constants.CHECKPOINT_ENABLED,
+        constants.TELEMETRY_ENABLED,
+    )
+    (
+        constants.RANGE_STORE_ENABLED,
+        constants.CHECKPOINT_ENABLED,
+        constants.TELEMETRY_ENABLED,
+    ) = (False, False, False)
+    try:
+        for mode in modes:
+            for concurrency in concurrency_levels:
+                if mode == "sliced":
+                    # one job per key, the fetcher slices the window itself
+                    jobs = [
+                        (partial(FETCHERS[key][0], slices=concurrency), start, end)
+                        for key in keys
+                    ]
+                else:
+                    jobs = [
+                        (FETCHERS[key][mode == "async"], lo, hi)
+                        for key in keys
+                        for lo, hi in utils.split_window(start, end, concurrency)
+                    ]
+                runner = _run_async if mode == "async" else _run_sync
+
+                # silence the per-page progress messages
+                with contextlib.redirect_stdout(io.StringIO()):
+                    rows, timings, wall = runner(jobs, concurrency, policy)
+
+                results.append(_summarize(mode, concurrency, rows, timings, wall))
+    finally:
+        constants.HTTP_V2, constants.HTTP_V3 = endpoints
+        (
+            constants.RANGE_STORE_ENABLED,
+            constants.CHECKPOINT_ENABLED,
+            constants.TELEMETRY_ENABLED,
+        ) = stores
+        subgraph.set_client(None)
+        server_v2.terminate()
+        server_v3.terminate()
+
+    return pd.DataFrame(results)
@@ -0,0 +1,855 @@
+"""
+Local stand-in for the Uniswap subgraphs.
+
+Answers the swaps/mints/burns queries of config/constants (and the other
+entity queries of the fetch layer) either from seeded synthetic data for
+any time window or by replaying recorded responses from the query cache,
+with configurable latency, errors and throttling.
+"""
+
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+import pandas as pd
+from config import constants
+from environ.fetch.graphql_parser import Field, parse_query, resolve_value
+
+# entities listed by the event queries
+EVENT_ENTITIES = ("swaps", "mints", "burns", "collects", "flashes")
+
+# mean number of events per second outside the bursts
+DEFAULT_RATES = {
+    "swaps": 4.0,
+    "mints": 0.2,
+    "burns": 0.2,
+    "collects": 0.2,
+    "flashes": 0.01,
+}
+
+# data range of the synthetic subgraph
+DATA_START = int(pd.Timestamp("2022-11-01 00:00:00").timestamp())
+DATA_END = int(pd.Timestamp("2022-11-16 00:00:00").timestamp())
+
+# block number at DATA_START and seconds per block
+BLOCK_ZERO = 15_870_000
+BLOCK_TIME = 12
+
+# largest time span scanned by queries not ordered by timestamp
+MAX_UNORDERED_SPAN = 6 * 3600
+
+_ADDRESS_FIELDS = {"from", "to", "sender", "origin", "recipient", "owner", "feeTo"}
+_INT_FIELDS = {
+    "feeTier",
+    "observationIndex",
+    "txCount",
+    "liquidityProviderCount",
+    "poolCount",
+    "createdAtBlockNumber",
+    "gasUsed",
+    "gasPrice",
+}
+_TICK_FIELDS = {"tick", "tickLower", "tickUpper"}
+_BIG_INT_FIELDS = {
+    "sqrtPriceX96",
+    "sqrtPrice",
+    "liquidity",
+    "feeGrowthGlobal0X128",
+    "feeGrowthGlobal1X128",
+}
+_FILTER_OPS = ("_not_in", "_gte", "_lte", "_not", "_gt", "_lt", "_in")
+
+
+def _hash_int(*parts: Any) -> int:
+    """
+    Deterministic 64-bit hash of the parts.
+    """
+
+    digest = hashlib.blake2b(
+        "|".join(str(part) for part in parts).encode(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "big")
+
+
+def _hex(*parts: Any, length: int = 40) -> str:
+    """
+    Deterministic hex string such as an address or a transaction hash.
+    """
+
+    digest = hashlib.blake2b(
+        "|".join(str(part) for part in parts).encode(), digest_size=length // 2
+    ).hexdigest()
+    return f"0x{digest}"
+
+
+def _split_filter(key: str) -> tuple[str, str]:
+    """
+    Split a where key such as `timestamp_gt` into (`timestamp`, `_gt`).
+    """
+
+    for op in _FILTER_OPS:
+        if key.endswith(op):
+            return key[: -len(op)], op
+    return key, ""
+
+
+def _compare(value: Any, op: str, target: Any) -> bool:
+    """
+    Evaluate one filter condition.
+    """
+
+    if op in ("_in", "_not_in"):
+        targets = {type(value)(item) for item in target}
+        return (value in targets) == (op == "_in")
+
+    target = type(value)(target)
+    if op == "":
+        return value == target
+    if op == "_not":
+        return value != target
+    if op == "_gt":
+        return value > target
+    if op == "_gte":
+        return value >= target
+    if op == "_lt":
+        return value < target
+    return value <= target
+
+
+def _matches(values: dict[str, Any], where: dict[str, Any]) -> bool:
+    """
+    Evaluate a where filter against the filterable values of an entity.
+    """
+
+    for key, target in where.items():
+        # nested filter such as transaction_: {blockNumber_gte: ...}
+        if key.endswith("_") and isinstance(target, dict):
+            if not _matches(values.get(key[:-1], {}), target):
+                return False
+            continue
+
+        field, op = _split_filter(key)
+        if field not in values:
+            raise ValueError(f"Filter {key} is not supported by the stand-in")
+        if not _compare(values[field], op, target):
+            return False
+
+    return True
+
+
+class SyntheticSubgraph:
+    """
+    Seeded synthetic Uniswap subgraph.
+
+    Events of every entity are generated second by second with a mean rate
+    and bursts around the event times of config/constants, so the data is
+    skewed like the real windows and several events share a timestamp.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        rates: dict[str, float] | None = None,
+        n_pairs: int = 200,
+        n_tokens: int = 100,
+        burst_times: list[int] | None = None,
+        burst_factor: float = 10.0,
+        burst_width: float = 600.0,
+    ) -> None:
+        self.seed = seed
+        self.rates = {**DEFAULT_RATES, **(rates or {})}
+        self.n_pairs = n_pairs
+        self.n_tokens = n_tokens
+        self.burst_times = (
+            burst_times
+            if burst_times is not None
+            else [
+                int(pd.Timestamp(event[1]).timestamp())
+                for event in constants.EVENT_LIST
+            ]
+        )
+        self.burst_factor = burst_factor
+        self.burst_width = burst_width
+
+        self.pair_ids = [_hex(seed, "pair", idx) for idx in range(n_pairs)]
+        self.token_ids = [_hex(seed, "token", idx) for idx in range(n_tokens)]
+        self._pair_index = {pair_id: idx for idx, pair_id in enumerate(self.pair_ids)}
+        self._token_index = {
+            token_id: idx for idx, token_id in enumerate(self.token_ids)
+        }
+
+        self.bucket = lru_cache(maxsize=500_000)(self._bucket)
+        self._leaf = lru_cache(maxsize=500_000)(self._leaf_uncached)
+
+        # parsed queries are kept so the selection sets of pairs and tokens
+        # can be memoized by identity
+        self._parse = lru_cache(maxsize=None)(parse_query)
+        self._static: dict[tuple[str, int, int], dict] = {}
+
+    def density(self, entity: str, timestamp: int) -> float:
+        """
+        Expected number of events per second at a timestamp.
+        """
+
+        bump = sum(
+            self.burst_factor * 2 ** (-(((timestamp - center) / self.burst_width) ** 2))
+            for center in self.burst_times
+            if abs(timestamp - center) < 5 * self.burst_width
+        )
+        return self.rates.get(entity, 0.0) * (1 + bump)
+
+    @staticmethod
+    def block_of(timestamp: int) -> int:
+        """
+        Block number mined at a timestamp.
+        """
+
+        return BLOCK_ZERO + (timestamp - DATA_START) // BLOCK_TIME
+
+    @staticmethod
+    def timestamp_of(block: int) -> int:
+        """
+        First second of a block.
+        """
+
+        return DATA_START + (block - BLOCK_ZERO) * BLOCK_TIME
+
+    def pair_tokens(self, pair_idx: int) -> tuple[int, int]:
+        """
+        Indices of the two tokens of a pair.
+        """
+
+        token0 = _hash_int(self.seed, "pair_token0", pair_idx) % self.n_tokens
+        token1 = (
+            token0
+            + 1
+            + _hash_int(self.seed, "pair_token1", pair_idx) % (self.n_tokens - 1)
+        ) % self.n_tokens
+        return token0, token1
+
+    def _bucket(self, entity: str, timestamp: int) -> list[dict]:
+        """
+        Events of an entity mined at one second, sorted by id.
+        """
+
+        if not DATA_START <= timestamp < DATA_END:
+            return []
+
+        density = self.density(entity, timestamp)
+        fraction = _hash_int(self.seed, entity, timestamp, "n") % 10**6 / 10**6
+        count = int(density + fraction)
+
+        events = []
+        for idx in range(count):
+            tx_hash = _hex(self.seed, entity, timestamp, idx, length=64)
+            log_index = _hash_int(tx_hash, "log") % 300
+            events.append(
+                {
+                    "entity": entity,
+                    "id": f"{tx_hash}-{log_index}",
+                    "timestamp": timestamp,
+                    "logIndex": log_index,
+                    "pair": _hash_int(tx_hash, "pair") % self.n_pairs,
+                    "transaction": {
+                        "id": tx_hash,
+                        "blockNumber": self.block_of(timestamp),
+                        "timestamp": timestamp,
+                    },
+                }
+            )
+
+        return sorted(events, key=lambda event: event["id"])
+
+    def _leaf_uncached(self, kind: str, key: str, name: str) -> Any:
+        """
+        Value of a scalar field of an entity.
+        """
+
+        value = _hash_int(self.seed, kind, key, name)
+        if name in _ADDRESS_FIELDS:
+            return _hex(self.seed, kind, key, name)
+        if name == "needsComplete":
+            return False
+        if name in _TICK_FIELDS:
+            return str(value % 400_000 - 200_000)
+        if name in _INT_FIELDS:
+            return str(value % 100_000)
+        if name in _BIG_INT_FIELDS:
+            return str(value * 10**12 + value % 10**12)
+        if name == "createdAtTimestamp":
+            return str(DATA_START - value % 10**7)
+        return f"{value % 10**9 / 10**3:.6f}"
+
+    def _event_values(self, event: dict) -> dict[str, Any]:
+        """
+        Filterable values of an event.
+        """
+
+        pair_id = self.pair_ids[event["pair"]]
+        return {**event, "pair": pair_id, "pool": pair_id}
+
+    def _select(self, kind: str, obj: Any, selections: list[Field]) -> dict:
+        """
+        Build the response object of an entity for a selection set.
+        """
+
+        if kind in ("pair", "token"):
+            key = (kind, obj, id(selections))
+            if key not in self._static:
+                self._static[key] = {
+                    field.key: self._resolve(kind, obj, field) for field in selections
+                }
+            return self._static[key]
+
+        return {field.key: self._resolve(kind, obj, field) for field in selections}
+
+    def _resolve(self, kind: str, obj: Any, field: Field) -> Any:
+        """
+        Resolve one field of an entity.
+        """
+
+        name = field.name
+        if kind == "event":
+            if name in ("id", "logIndex", "timestamp"):
+                return str(obj[name])
+            if name in ("pair", "pool"):
+                return self._select("pair", obj["pair"], field.selections)
+            if name in ("token0", "token1"):
+                token = self.pair_tokens(obj["pair"])[name == "token1"]
+                return self._select("token", token, field.selections)
+            if name == "transaction":
+                return self._select("transaction", obj["transaction"], field.selections)
+            value = self._leaf(obj["entity"], obj["id"], name)
+            # v3 swaps have one negative amount, paid to the trader
+            if obj["entity"] == "swaps" and name in ("amount0", "amount1"):
+                sign = (
+                    -1
+                    if (_hash_int(obj["id"], "side") % 2) == (name == "amount1")
+                    else 1
+                )
+                return f"{sign * float(value):.6f}"
+            return value
+
+        if kind == "pair":
+            if name == "id":
+                return self.pair_ids[obj]
+            if name in ("token0", "token1"):
+                token = self.pair_tokens(obj)[name == "token1"]
+                return self._select("token", token, field.selections)
+            return self._leaf("pair", self.pair_ids[obj], name)
+
+        if kind == "token":
+            if name == "id":
+                return self.token_ids[obj]
+            if name == "symbol":
+                return f"TKN{obj}"
+            if name == "name":
+                return f"Token {obj}"
+            if name == "decimals":
+                return "18"
+            return self._leaf("token", self.token_ids[obj], name)
+
+        if kind == "transaction":
+            if name in ("id", "blockNumber", "timestamp"):
+                return str(obj[name])
+            return self._leaf("transaction", obj["id"], name)
+
+        if kind == "meta":
+            if name == "block":
+                return self._select("block", obj, field.selections)
+            if name == "hasIndexingErrors":
+                return False
+            return f"stand-in-{self.seed}"
+
+        # kind == "block"
+        if name == "number":
+            return self.block_of(obj)
+        if name == "timestamp":
+            return obj
+        return _hex(self.seed, "block", obj, length=64)
+
+    def _second_range(self, where: dict[str, Any]) -> tuple[int, int]:
+        """
+        Seconds [lo, hi) that can hold events matching the where filter.
+        """
+
+        lo, hi = DATA_START, DATA_END
+        conditions = list(where.items())
+        for key, target in where.items():
+            if key == "transaction_" and isinstance(target, dict):
+                conditions.extend(target.items())
+
+        for key, target in conditions:
+            field, op = _split_filter(key)
+            if field == "timestamp":
+                bound = int(target)
+            elif field == "blockNumber":
+                # map the block bound to the first second of the block
+                bound = self.timestamp_of(int(target))
+                if op in ("_gt", "_lte"):
+                    bound += BLOCK_TIME - 1
+                elif op == "":
+                    lo = max(lo, bound)
+                    hi = min(hi, bound + BLOCK_TIME)
+                    continue
+            else:
+                continue
+
+            if op == "":
+                lo, hi = max(lo, bound), min(hi, bound + 1)
+            elif op == "_gt":
+                lo = max(lo, bound + 1)
+            elif op == "_gte":
+                lo = max(lo, bound)
+            elif op == "_lt":
+                hi = min(hi, bound)
+            elif op == "_lte":
+                hi = min(hi, bound + 1)
+
+        return lo, hi
+
+    def list_events(self, entity: str, arguments: dict[str, Any]) -> list[dict]:
+        """
+        Events of an entity matching the list arguments of a query.
+        """
+
+        where = arguments.get("where") or {}
+        first = int(arguments.get("first", 100))
+        skip = int(arguments.get("skip", 0))
+        order_by = arguments.get("orderBy", "id")
+        descending = arguments.get("orderDirection", "asc") == "desc"
+        if first > 1000:
+            raise ValueError("The `first` argument must be between 0 and 1000")
+
+        lo, hi = self._second_range(where)
+        seconds = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+
+        # block ordering scans forward block by block, ties broken by id
+        if order_by == "transaction__blockNumber":
+            events = []
+            blocks = range(self.block_of(lo), self.block_of(hi - 1) + 1)
+            for block in reversed(blocks) if descending else blocks:
+                bucket = sorted(
+                    (
+                        event
+                        for second in range(
+                            max(lo, self.timestamp_of(block)),
+                            min(hi, self.timestamp_of(block + 1)),
+                        )
+                        for event in self.bucket(entity, second)
+                        if _matches(self._event_values(event), where)
+                    ),
+                    key=lambda event: event["id"],
+                    reverse=descending,
+                )
+                events.extend(bucket)
+                if len(events) >= skip + first:
+                    break
+            return events[skip : skip + first]
+
+        # timestamp ordering scans forward and stops once the page is full
+        if order_by == "timestamp":
+            events = []
+            for second in seconds:
+                bucket = [
+                    event
+                    for event in self.bucket(entity, second)
+                    if _matches(self._event_values(event), where)
+                ]
+                events.extend(reversed(bucket) if descending else bucket)
+                if len(events) >= skip + first:
+                    break
+            return events[skip : skip + first]
+
+        # any other ordering needs the whole range
+        if hi - lo > MAX_UNORDERED_SPAN:
+            raise ValueError(
+                f"Ordering by {order_by} needs a range of at most "
+                f"{MAX_UNORDERED_SPAN} seconds on the stand-in"
+            )
+        events = [
+            event
+            for second in seconds
+            for event in self.bucket(entity, second)
+            if _matches(self._event_values(event), where)
+        ]
+        events.sort(
+            key=lambda event: self._order_key(event, order_by), reverse=descending
+        )
+        return events[skip : skip + first]
+
+    @staticmethod
+    def _order_key(event: dict, order_by: str) -> tuple:
+        """
+        Sort key of an event, ties broken by id like graph-node.
+        """
+
+        if order_by == "id":
+            return (event["id"],)
+        if order_by == "transaction__blockNumber":
+            return (event["transaction"]["blockNumber"], event["id"])
+        if order_by in event:
+            return (event[order_by], event["id"])
+        raise ValueError(f"Ordering by {order_by} is not supported by the stand-in")
+
+    def list_blocks(self, arguments: dict[str, Any]) -> list[int]:
+        """
+        First seconds of the blocks matching the list arguments of a query.
+        """
+
+        where = arguments.get("where") or {}
+        first = int(arguments.get("first", 100))
+        skip = int(arguments.get("skip", 0))
+        blocks = range(self.block_of(DATA_START), self.block_of(DATA_END - 1) + 1)
+        if arguments.get("orderDirection", "asc") == "desc":
+            blocks = reversed(blocks)
+
+        matched = []
+        for block in blocks:
+            timestamp = self.timestamp_of(block)
+            if _matches({"number": block, "timestamp": timestamp}, where):
+                matched.append(timestamp)
+                if len(matched) >= skip + first:
+                    break
+        return matched[skip : skip + first]
+
+    def _list_static(self, ids: list[str], arguments: dict[str, Any]) -> list[int]:
+        """
+        Indices of the pairs/pools/tokens matching the list arguments.
+        """
+
+        where = arguments.get("where") or {}
+        first = int(arguments.get("first", 100))
+        skip = int(arguments.get("skip", 0))
+        matched = [
+            idx
+            for idx, entity_id in enumerate(ids)
+            if _matches({"id": entity_id}, where)
+        ]
+        matched.sort(
+            key=lambda idx: ids[idx],
+            reverse=arguments.get("orderDirection", "asc") == "desc",
+        )
+        return matched[skip : skip + first]
+
+    def execute_field(self, field: Field, variables: dict[str, Any] | None) -> Any:
+        """
+        Resolve one root field of a query.
+        """
+
+        arguments = resolve_value(field.arguments, variables)
+        name = field.name
+
+        if name in EVENT_ENTITIES:
+            return [
+                self._select("event", event, field.selections)
+                for event in self.list_events(name, arguments)
+            ]
+        if name == "transactions":
+            return [
+                self._select("transaction", event["transaction"], field.selections)
+                for event in self.list_events(
+                    "swaps", self._transaction_arguments(arguments)
+                )
+            ]
+        if name in ("pairs", "pools"):
+            return [
+                self._select("pair", idx, field.selections)
+                for idx in self._list_static(self.pair_ids, arguments)
+            ]
+        if name == "tokens":
+            return [
+                self._select("token", idx, field.selections)
+                for idx in self._list_static(self.token_ids, arguments)
+            ]
+        if name in ("pair", "pool"):
+            idx = self._pair_index.get(arguments.get("id"))
+            return None if idx is None else self._select("pair", idx, field.selections)
+        if name == "token":
+            idx = self._token_index.get(arguments.get("id"))
+            return None if idx is None else self._select("token", idx, field.selections)
+        if name == "blocks":
+            return [
+                self._select("block", timestamp, field.selections)
+                for timestamp in self.list_blocks(arguments)
+            ]
+        if name == "_meta":
+            return self._select("meta", DATA_END - 1, field.selections)
+
+        raise ValueError(f"Field {name} is not supported by the stand-in")
+
+    @staticmethod
+    def _transaction_arguments(arguments: dict[str, Any]) -> dict[str, Any]:
+        """
+        Map transaction list arguments onto the swaps backing them.
+        """
+
+        where = {}
+        for key, target in (arguments.get("where") or {}).items():
+            field, _ = _split_filter(key)
+            if field in ("blockNumber", "id"):
+                where.setdefault("transaction_", {})[key] = target
+            else:
+                where[key] = target
+        order_by = arguments.get("orderBy", "id")
+        return {
+            **arguments,
+            "where": where,
+            "orderBy": (
+                "transaction__blockNumber" if order_by == "blockNumber" else order_by
+            ),
+        }
+
+    def execute(self, query: str, variables: dict[str, Any] | None = None) -> dict:
+        """
+        Execute a GraphQL query and return the response payload.
+        """
+
+        try:
+            operation = self._parse(query)
+            data = {
+                field.key: self.execute_field(field, variables)
+                for field in operation.selections
+            }
+        except (ValueError, KeyError, TypeError) as exc:
+            return {"errors": [{"message": str(exc)}]}
+
+        return {"data": data}
+
+
+class ReplayIndex:
+    """
+    Recorded responses of the query cache, looked up by query text and
+    variables regardless of the endpoint they were recorded from.
+    """
+
+    def __init__(self, path: str = constants.CACHE_PATH) -> None:
+        self._paths: dict[tuple[str, str], str] = {}
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                if not filename.endswith(".json.gz"):
+                    continue
+                file_path = os.path.join(dirpath, filename)
+                with gzip.open(file_path, "rb") as file:
+                    entry = json.loads(file.read())
+                if "query" in entry:
+                    self._paths[self._key(entry["query"], entry.get("variables"))] = (
+                        file_path
+                    )
+
+    @staticmethod
+    def _key(query: str, variables: dict | None) -> tuple[str, str]:
+        return (
+            hashlib.sha256(query.encode()).hexdigest(),
+            json.dumps(variables, sort_keys=True),
+        )
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def execute(self, query: str, variables: dict[str, Any] | None = None) -> dict:
+        """
+        Return the recorded response of a query.
+        """
+
+        file_path = self._paths.get(self._key(query, variables))
+        if file_path is None:
+            return {"errors": [{"message": "Query was not recorded"}]}
+        with gzip.open(file_path, "rb") as file:
+            return json.loads(file.read())["result"]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    HTTP handler of the stand-in GraphQL endpoint.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        """
+        Answer a GraphQL POST request.
+        """
+
+        stand_in: StandInServer = self.server.stand_in
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+        # throttling
+        if not stand_in.allow():
+            stand_in.count("throttled")
+            self._reply(429, b"Too Many Requests", {"Retry-After": "1"})
+            return
+
+        # latency
+        delay = stand_in.latency + random.uniform(0, stand_in.latency_jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        # injected errors, half HTTP 500 and half GraphQL error payloads
+        if random.random() < stand_in.error_rate:
+            stand_in.count("errors")
+            if random.random() < 0.5:
+                self._reply(500, b"Internal Server Error")
+            else:
+                self._reply_json({"errors": [{"message": "Injected error"}]})
+            return
+
+        stand_in.count("requests")
+        self._reply_json(
+            stand_in.backend.execute(payload["query"], payload.get("variables"))
+        )
+
+    def _reply_json(self, result: dict) -> None:
+        content = json.dumps(result).encode()
+        headers = {"Content-Type": "application/json"}
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            content = gzip.compress(content, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+        self._reply(200, content, headers)
+
+    def _reply(self, status: int, content: bytes, headers: dict | None = None) -> None:
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args) -> None:  # pylint: disable=arguments-differ
+        """
+        Keep the benchmark output quiet.
+        """
+
+
+class StandInServer:
+    """
+    Threaded local GraphQL server answering from a synthetic subgraph
+    or a replay index.
+
+        with StandInServer(latency=0.05) as server:
+            constants.HTTP_V2 = server.url
+    """
+
+    def __init__(
+        self,
+        backend: SyntheticSubgraph | ReplayIndex | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: float | None = None,
+    ) -> None:
+        self.backend = backend or SyntheticSubgraph()
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0}
+
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stand_in = self
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._tokens = float(rate_limit or 0)
+        self._updated = time.monotonic()
+
+    @property
+    def url(self) -> str:
+        """
+        URL of the endpoint.
+        """
+
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def count(self, key: str) -> None:
+        """
+        Increase one of the counters.
+        """
+
+        with self._lock:
+            self.stats[key] += 1
+
+    def allow(self) -> bool:
+        """
+        Whether a request is within the rate limit (token bucket, burst of
+        one second of requests).
+        """
+
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate_limit, self._tokens + (now - self._updated) * self.rate_limit
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def start(self) -> str:
+        """
+        Start serving in a background thread and return the URL.
+        """
+
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def serve_forever(self) -> None:
+        """
+        Serve in the current thread.
+        """
+
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        """
+        Stop serving and release the port.
+        """
+
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def _serve_in_process(queue: multiprocessing.Queue, seed: int, kwargs: dict) -> None:
+    """
+    Entry point of the stand-in server process.
+    """
+
+    server = StandInServer(SyntheticSubgraph(seed), **kwargs)
+    queue.put(server.url)
+    server.serve_forever()
+
+
+def start_in_process(seed: int = 0, **kwargs) -> tuple[multiprocessing.Process, str]:
+    """
+    Function to run a synthetic stand-in server in its own process, so it
+    does not compete with the fetchers for the GIL. Returns the process
+    (terminate it when done) and the URL.
+    """
+
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_serve_in_process, args=(queue, seed, kwargs), daemon=True
+    )
+    process.start()
+    return process, queue.get(timeout=30)
@@ -0,0 +1,119 @@
+"""
+Benchmark of the flattening of the nested subgraph objects.
+"""
+
+import time
+from typing import Callable
+import numpy as np
+import pandas as pd
+import environ.fetch.page_decoder as decoder
+from environ.fetch.event_registry import get_event
+from environ.fetch.fetch_engine import unwrap_df
+from environ.fetch.graphql_parser import Field, parse_query
+
+
+def unwrap_df_apply(df_events: pd.DataFrame, nested_list: list[str]) -> pd.DataFrame:
+    """
+    The previous unwrap, one `Series.apply` per nested key with the keys of
+    the first row, kept as the baseline of the benchmark.
+    """
+
+    for nested in nested_list:
+        if nested not in df_events.columns:
+            continue
+        nested_keys = df_events[nested][0].keys()
+        for nested_key in nested_keys:
+            df_events[f"{nested}_{nested_key}"] = df_events[nested].apply(
+                lambda x: x[nested_key]
+            )
+        df_events = df_events.drop(nested, axis=1)
+
+    return df_events
+
+
+def _synthetic_record(fields: list[Field], rng: np.random.Generator) -> dict:
+    """
+    One record with the shape of a selection set and random leaf values.
+    """
+
+    return {
+        field.key: (
+            _synthetic_record(field.selections, rng)
+            if field.selections
+            else str(round(float(rng.random()) * 1e6, 6))
+        )
+        for field in fields
+    }
+
+
+def synthetic_records(
+    version: str, entity: str, rows: int, distinct: int = 1000, seed: int = 0
+) -> list[dict]:
+    """
+    Function to generate the records of an event query, with the nested
+    objects drawn from `distinct` different ones as on a real window.
+    """
+
+    rng = np.random.default_rng(seed)
+    fields = parse_query(get_event(version, entity).query_scripts).selections[0]
+    nested = [field for field in fields.selections if field.selections]
+    leaves = [field for field in fields.selections if not field.selections]
+    pool = [_synthetic_record(nested, rng) for _ in range(distinct)]
+    template = _synthetic_record(leaves, rng)
+
+    records = []
+    for row in range(rows):
+        # a new dictionary per row and per object, as the json decoder gives
+        record = {**template, "id": str(row), "timestamp": str(row)}
+        for key, value in pool[row % distinct].items():
+            record[key] = dict(value)
+        records.append(record)
+
+    return records
+
+
+def _time(func: Callable, *args) -> tuple[pd.DataFrame, float]:
+    """
+    Run a function once and return its result and wall time.
+    """
+
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def benchmark_unwrap(
+    rows_levels: tuple[int, ...] = (10_000, 100_000, 1_000_000),
+    version: str = "v2",
+    entity: str = "swaps",
+) -> pd.DataFrame:
+    """
+    Function to time the single-pass `unwrap_df` against the per-key
+    `Series.apply` baseline on synthetic pages of each size, and check
+    that both give the same dataframe.
+    """
+
+    nested_list = get_event(version, entity).nested_list
+
+    results = []
+    for rows in rows_levels:
+        df_events = decoder.concat_batches(
+            [decoder.decode_page(synthetic_records(version, entity, rows), version)]
+        )
+
+        df_apply, wall_apply = _time(unwrap_df_apply, df_events.copy(), nested_list)
+        df_flat, wall_flat = _time(unwrap_df, df_events, nested_list)
+
+        results.append(
+            {
+                "rows": rows,
+                "columns": df_flat.shape[1],
+                "apply_s": round(wall_apply, 3),
+                "single_pass_s": round(wall_flat, 3),
+                "speedup": round(wall_apply / wall_flat, 1),
+                "same_result": df_apply.astype(str).equals(df_flat.astype(str)),
+            }
+        )
+        del df_events, df_apply, df_flat
+
+    return pd.DataFrame(results)
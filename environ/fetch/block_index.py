@@ -0,0 +1,115 @@
+"""
+Index of the block mined at each timestamp, cached on disk.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from config import constants
+import environ.fetch.subgraph_query as subgraph
+from environ.fetch.page_decoder import loads
+
+
+class BlockIndex:
+    """
+    Block number mined at or before each timestamp looked up, i.e. the
+    head of the chain at that second, in `blocks_<hash>.json`.
+
+    The blocks are a property of the chain, so one index per blocks
+    endpoint serves the events of every version and entity. A timestamp is
+    looked up once from the blocks subgraph and read from the index by
+    the next fetches and runs.
+    """
+
+    def __init__(self, http: str, root: str = constants.BLOCK_INDEX_PATH) -> None:
+        self.http = http
+        http_hash = hashlib.sha256(http.encode()).hexdigest()[:12]
+        self.path = os.path.join(root, f"blocks_{http_hash}.json")
+        self._lock = threading.Lock()
+
+        # blocks of the timestamps looked up by the earlier runs
+        self.blocks: dict[int, int] = {}
+        try:
+            with open(self.path, "rb") as file:
+                self.blocks = {
+                    int(timestamp): block
+                    for timestamp, block in loads(file.read()).items()
+                }
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def _save(self) -> None:
+        """
+        Write the index, to a temporary file first so it is never partial.
+        """
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {str(timestamp): block for timestamp, block in self.blocks.items()},
+                file,
+            )
+        os.replace(tmp_path, self.path)
+
+    def blocks_at(self, timestamps: list[int]) -> dict[int, int]:
+        """
+        Return the block mined at or before each timestamp, looking up the
+        timestamps not in the index in one request.
+        """
+
+        with self._lock:
+            missing = sorted(set(timestamps) - set(self.blocks))
+            if missing:
+                results = subgraph.run_batched_query(
+                    self.http,
+                    {
+                        f"t{timestamp}": (
+                            constants.QUERY_BLOCK_AT,
+                            {"timestamp": str(timestamp)},
+                        )
+                        for timestamp in missing
+                    },
+                )
+                for timestamp in missing:
+                    blocks = results[f"t{timestamp}"]["data"]["blocks"]
+                    if not blocks:
+                        raise ValueError(f"No block mined before timestamp {timestamp}")
+                    self.blocks[timestamp] = int(blocks[0]["number"])
+
+                # info message
+                print(f"Looked up the blocks of {len(missing)} timestamps")
+                self._save()
+
+            return {timestamp: self.blocks[timestamp] for timestamp in timestamps}
+
+    def block_range(self, start: int, end: int) -> tuple[int, int]:
+        """
+        Return the blocks `(block_gt, block_lt)` holding the events of the
+        timestamps [start, end). The first block may also hold events
+        before `start`.
+        """
+
+        blocks = self.blocks_at([start, end - 1])
+
+        return blocks[start] - 1, blocks[end - 1] + 1
+
+
+_INDEXES: dict[str, BlockIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_block_index() -> BlockIndex:
+    """
+    Return the block index of the `HTTP_BLOCKS` endpoint, shared by all
+    the fetches of the process.
+    """
+
+    key = f"{constants.HTTP_BLOCKS}\n{constants.BLOCK_INDEX_PATH}"
+    with _INDEXES_LOCK:
+        if key not in _INDEXES:
+            _INDEXES[key] = BlockIndex(
+                constants.HTTP_BLOCKS, constants.BLOCK_INDEX_PATH
+            )
+        return _INDEXES[key]
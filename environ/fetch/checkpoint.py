@@ -0,0 +1,191 @@
+"""
+Checkpoints of the pagination of long fetch runs.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Iterator
+from config import constants
+from environ.fetch.page_decoder import loads
+from environ.fetch.paginator import Paginator
+
+
+class Checkpoint:
+    """
+    Cursor and pages of one (version, entity, window, query) fetch.
+
+    The pages are appended to `pages.jsonl` as they arrive and the cursor
+    after them, with the pages and bytes it covers, to `cursor.json`.
+    A page written without its cursor, e.g. when the run is killed in
+    between, is ignored on load and fetched again.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        entity: str,
+        start_timestamp_gt: int,
+        end_timestamp_lt: int,
+        query_scripts: str,
+        root: str = constants.CHECKPOINT_PATH,
+    ) -> None:
+        query_hash = hashlib.sha256(query_scripts.encode()).hexdigest()[:12]
+        self.path = os.path.join(
+            root,
+            f"{version}_{entity}_{start_timestamp_gt}_{end_timestamp_lt}_{query_hash}",
+        )
+        self.pages = 0
+        self.bytes = 0
+
+    @property
+    def cursor_path(self) -> str:
+        """
+        Path of the cursor file.
+        """
+
+        return os.path.join(self.path, "cursor.json")
+
+    @property
+    def pages_path(self) -> str:
+        """
+        Path of the pages file.
+        """
+
+        return os.path.join(self.path, "pages.jsonl")
+
+    def load(self) -> tuple[dict[str, Any] | None, Iterator[list[dict]]]:
+        """
+        Return the saved cursor and an iterator over the saved pages, read
+        one at a time, (None, empty) without a checkpoint.
+        """
+
+        try:
+            with open(self.cursor_path, "rb") as file:
+                state = loads(file.read())
+            size = os.path.getsize(self.pages_path)
+        except (FileNotFoundError, ValueError, KeyError):
+            return None, iter([])
+
+        # the pages file is shorter than the cursor says: start over
+        if size < state["bytes"]:
+            return None, iter([])
+
+        # drop the pages written after the last cursor
+        with open(self.pages_path, "rb+") as file:
+            file.truncate(state["bytes"])
+
+        self.pages, self.bytes = state["pages"], state["bytes"]
+        return state["cursor"], self._iter_pages()
+
+    def _iter_pages(self) -> Iterator[list[dict]]:
+        """
+        Yield the saved pages.
+        """
+
+        with open(self.pages_path, "rb") as file:
+            for line in file:
+                yield loads(line)
+
+    def save(self, cursor: dict[str, Any], page: list[dict]) -> None:
+        """
+        Append a page and move the cursor past it.
+        """
+
+        if self.pages == 0:
+            # a new checkpoint replaces any partial one
+            self.clear()
+            os.makedirs(self.path, exist_ok=True)
+
+        content = (json.dumps(page) + "\n").encode()
+        with open(self.pages_path, "ab") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        self.pages += 1
+        self.bytes += len(content)
+
+        # write to a temporary file first so the cursor is never partial
+        tmp_path = f"{self.cursor_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"cursor": cursor, "pages": self.pages, "bytes": self.bytes}, file
+            )
+        os.replace(tmp_path, self.cursor_path)
+
+    def clear(self) -> None:
+        """
+        Remove the checkpoint, once the fetch is complete.
+        """
+
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.pages = 0
+        self.bytes = 0
+
+
+def get_checkpoint(
+    version: str,
+    entity: str,
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    query_scripts: str,
+) -> Checkpoint | None:
+    """
+    Return the checkpoint of a fetch, or None if checkpoints are disabled.
+    """
+
+    if not constants.CHECKPOINT_ENABLED:
+        return None
+
+    return Checkpoint(
+        version,
+        entity,
+        start_timestamp_gt,
+        end_timestamp_lt,
+        query_scripts,
+        constants.CHECKPOINT_PATH,
+    )
+
+
+def resume(checkpoint: Checkpoint | None, paginator: Paginator) -> Iterator[list[dict]]:
+    """
+    Function to move a paginator to the cursor of its checkpoint and return
+    an iterator over the pages already fetched.
+    """
+
+    if checkpoint is None:
+        return iter([])
+
+    cursor, pages = checkpoint.load()
+    if cursor is not None:
+        paginator.cursor = cursor
+        paginator.pages = checkpoint.pages
+
+        # info message
+        print(
+            f"Resuming {paginator.entity} after {checkpoint.pages} pages "
+            f"from timestamp {paginator.timestamp}"
+        )
+
+    return pages
+
+
+def checkpointed_pages(
+    checkpoint: Checkpoint | None, paginator: Paginator
+) -> Iterator[list[dict]]:
+    """
+    Function to page through a window from its checkpoint, saving the cursor
+    and every new page, and to remove the checkpoint once the window is
+    covered.
+    """
+
+    yield from resume(checkpoint, paginator)
+
+    for page in paginator:
+        if checkpoint is not None:
+            checkpoint.save(paginator.cursor, page)
+        yield page
+
+    if checkpoint is not None:
+        checkpoint.clear()
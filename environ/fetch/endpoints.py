@@ -0,0 +1,264 @@
+"""
+Pools of equivalent subgraph endpoints, with health checks and failover.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from config import constants
+
+# query of the health checks: the latest block indexed by the endpoint
+QUERY_HEALTH = "{ _meta { block { number } hasIndexingErrors } }"
+
+# names of the endpoint constants that can have mirrors
+_ENDPOINTS = ["HTTP_V2", "HTTP_V3", "HTTP_BLOCKS"]
+
+
+def endpoint_urls(http: str) -> list[str]:
+    """
+    Function to list the equivalent endpoints of an endpoint: itself and
+    its mirrors, e.g. the `HTTP_V2_MIRRORS` of `HTTP_V2`.
+    """
+
+    for name in _ENDPOINTS:
+        if http == getattr(constants, name):
+            return list(dict.fromkeys([http, *getattr(constants, f"{name}_MIRRORS")]))
+
+    return [http]
+
+
+def _head_block(url: str) -> int | None:
+    """
+    Function to get the latest block indexed by an endpoint, None if it
+    fails its health check.
+    """
+
+    try:
+        response = requests.post(
+            url,
+            json={"query": QUERY_HEALTH},
+            timeout=constants.ENDPOINT_HEALTH_TIMEOUT,
+        )
+        meta = response.json()["data"]["_meta"]
+        if response.status_code == 200 and not meta["hasIndexingErrors"]:
+            return int(meta["block"]["number"])
+    except (requests.RequestException, ValueError, KeyError, TypeError):
+        pass
+
+    # info message
+    print(f"Endpoint {url} failed its health check")
+
+    return None
+
+
+class EndpointState:
+    """
+    Health, mean latency and requests in flight of one endpoint.
+    """
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.healthy = True
+        self.latency: float | None = None
+        self.inflight = 0
+        self.failures = 0
+        self.retry_at = 0.0
+        self.block: int | None = None
+
+    def cost(self, default: float) -> float:
+        """
+        Expected seconds before a request sent now completes, with the
+        `default` latency until one is measured.
+        """
+
+        latency = default if self.latency is None else self.latency
+
+        return latency * (self.inflight + 1)
+
+
+class EndpointPool:
+    """
+    Equivalent endpoints of one subgraph.
+
+    Each request goes to the available endpoint with the lowest expected
+    wait, its mean latency times the requests it has in flight, so the
+    load spreads over the endpoints in proportion to their speed. An
+    endpoint failing a request is left out for `ENDPOINT_COOLDOWN` seconds,
+    doubled at each failure in a row, and the retry of the request goes to
+    another endpoint: the paginators keep their cursor and only the failed
+    page is sent again.
+
+    The endpoints are health checked every `ENDPOINT_HEALTH_SECONDS`. One
+    with indexing errors, or lagging more than `ENDPOINT_MAX_BLOCK_LAG`
+    blocks behind the others, would answer with missing events, so it is
+    left out until the next check. A pool of one endpoint is never checked.
+    """
+
+    def __init__(self, urls: list[str], alpha: float = 0.2) -> None:
+        self.states = {url: EndpointState(url) for url in urls}
+        self.alpha = alpha
+        self.checked: float | None = None
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+
+    def check(self) -> None:
+        """
+        Health check every endpoint, all at once.
+        """
+
+        with ThreadPoolExecutor(max_workers=len(self.states)) as executor:
+            blocks = {
+                url: block
+                for url, block in zip(
+                    self.states, executor.map(_head_block, self.states)
+                )
+                if block is not None
+            }
+
+        now = time.monotonic()
+        head = max(blocks.values(), default=None)
+        with self._lock:
+            self.checked = now
+            for url, state in self.states.items():
+                state.block = blocks.get(url)
+                if state.block is None:
+                    self._fail(state, now)
+                elif state.block < head - constants.ENDPOINT_MAX_BLOCK_LAG:
+                    # info message
+                    print(f"Endpoint {url} lags {head - state.block} blocks behind")
+                    state.healthy = False
+                    state.retry_at = now + constants.ENDPOINT_HEALTH_SECONDS
+                else:
+                    state.healthy, state.failures, state.retry_at = True, 0, 0.0
+
+    def check_due(self) -> bool:
+        """
+        Whether the next `acquire` health checks the endpoints, blocking on
+        their requests, see `_maybe_check`.
+        """
+
+        return len(self.states) > 1 and (
+            self.checked is None
+            or time.monotonic() - self.checked >= constants.ENDPOINT_HEALTH_SECONDS
+        )
+
+    def _maybe_check(self) -> None:
+        """
+        Health check the endpoints if they are due, before the first request
+        and then every `ENDPOINT_HEALTH_SECONDS` by one thread at a time.
+        """
+
+        if self.checked is None:
+            with self._check_lock:
+                if self.checked is None:
+                    self.check()
+            return
+
+        if not self.check_due():
+            return
+        if self._check_lock.acquire(blocking=False):
+            try:
+                self.check()
+            finally:
+                self._check_lock.release()
+
+    def _fail(self, state: EndpointState, now: float) -> None:
+        """
+        Leave an endpoint out for its cooldown.
+        """
+
+        state.healthy = False
+        state.failures += 1
+        state.retry_at = now + min(
+            constants.ENDPOINT_COOLDOWN_CAP,
+            constants.ENDPOINT_COOLDOWN * 2 ** (state.failures - 1),
+        )
+
+    def _available(self, now: float) -> list[EndpointState]:
+        """
+        Endpoints that can take a request: the healthy ones and those at
+        the end of their cooldown.
+        """
+
+        return [
+            state
+            for state in self.states.values()
+            if state.healthy or state.retry_at <= now
+        ]
+
+    def acquire(self) -> str:
+        """
+        Pick the endpoint of the next request.
+        """
+
+        if len(self.states) == 1:
+            return next(iter(self.states))
+
+        self._maybe_check()
+        with self._lock:
+            available = self._available(time.monotonic())
+            if not available:
+                # every endpoint is failing: the one back first
+                available = [min(self.states.values(), key=lambda s: s.retry_at)]
+
+            # the endpoints not measured yet count as the mean of the others
+            latencies = [
+                state.latency
+                for state in self.states.values()
+                if state.latency is not None
+            ]
+            default = sum(latencies) / len(latencies) if latencies else 1.0
+            state = min(available, key=lambda state: state.cost(default))
+            state.inflight += 1
+
+            return state.url
+
+    def release(self, url: str, elapsed: float | None, ok: bool) -> None:
+        """
+        Record the outcome of a request to an endpoint, with its wall time
+        or None without a response.
+        """
+
+        if len(self.states) == 1:
+            return
+
+        with self._lock:
+            state = self.states[url]
+            state.inflight -= 1
+            if elapsed is not None:
+                state.latency = (
+                    elapsed
+                    if state.latency is None
+                    else (1 - self.alpha) * state.latency + self.alpha * elapsed
+                )
+            if ok:
+                state.healthy, state.failures, state.retry_at = True, 0, 0.0
+            else:
+                self._fail(state, time.monotonic())
+
+    def failover(self, url: str) -> bool:
+        """
+        Whether an endpoint other than `url` can take a request now, so a
+        failed request can be retried at once.
+        """
+
+        with self._lock:
+            return any(state.url != url for state in self._available(time.monotonic()))
+
+
+_POOLS: dict[tuple[str, ...], EndpointPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(http: str) -> EndpointPool:
+    """
+    Return the pool of an endpoint and its mirrors, shared by the sync and
+    async clients of the process.
+    """
+
+    urls = tuple(endpoint_urls(http))
+    with _POOLS_LOCK:
+        if urls not in _POOLS:
+            _POOLS[urls] = EndpointPool(list(urls))
+        return _POOLS[urls]
@@ -0,0 +1,101 @@
+"""
+Registry of the events fetched from the Uniswap subgraphs.
+"""
+
+from config import constants
+
+
+class EventSpec:
+    """
+    Fetch parameters of one (version, entity): the names of the constants
+    holding the endpoint and the full query, and the nested objects to
+    unwrap into columns.
+
+    The constants are read at call time, so overriding e.g.
+    `constants.HTTP_V3` points every fetch of the version elsewhere.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        entity: str,
+        http: str,
+        query: str,
+        nested_list: list[str],
+    ) -> None:
+        self.version = version
+        self.entity = entity
+        self.http = http
+        self.query = query
+        self.nested_list = nested_list
+
+    @property
+    def endpoint(self) -> str:
+        """
+        Endpoint of the subgraph.
+        """
+
+        return getattr(constants, self.http)
+
+    @property
+    def query_scripts(self) -> str:
+        """
+        Full query of the entity.
+        """
+
+        return getattr(constants, self.query)
+
+    def __repr__(self) -> str:
+        return f"EventSpec({self.version!r}, {self.entity!r})"
+
+
+EVENTS: dict[tuple[str, str], EventSpec] = {}
+
+
+def register_event(
+    version: str, entity: str, http: str, query: str, nested_list: list[str]
+) -> EventSpec:
+    """
+    Function to register an event so the fetch engine can fetch it.
+    """
+
+    spec = EventSpec(version, entity, http, query, nested_list)
+    EVENTS[(version, entity)] = spec
+
+    return spec
+
+
+def get_event(version: str, entity: str) -> EventSpec:
+    """
+    Function to get the registered event of a (version, entity).
+    """
+
+    try:
+        return EVENTS[(version, entity)]
+    except KeyError as exc:
+        raise ValueError(f"No {version} {entity} event is registered") from exc
+
+
+def version_events(version: str) -> list[EventSpec]:
+    """
+    Function to list the registered events of a version.
+    """
+
+    return [spec for spec in EVENTS.values() if spec.version == version]
+
+
+# nested data to unwrap for each version
+NESTED_V2 = ["pair", "pair_token0", "pair_token1", "transaction"]
+NESTED_V3 = ["pool", "token0", "token1", "transaction"]
+
+# events of Uniswap V2
+register_event("v2", "swaps", "HTTP_V2", "QUERY_SWAP_V2", NESTED_V2)
+register_event("v2", "mints", "HTTP_V2", "QUERY_MINT_V2", NESTED_V2)
+register_event("v2", "burns", "HTTP_V2", "QUERY_BURN_V2", NESTED_V2)
+
+# events of Uniswap V3
+register_event("v3", "swaps", "HTTP_V3", "QUERY_SWAP_V3", NESTED_V3)
+register_event("v3", "mints", "HTTP_V3", "QUERY_MINT_V3", NESTED_V3)
+register_event("v3", "burns", "HTTP_V3", "QUERY_BURN_V3", NESTED_V3)
+register_event("v3", "collects", "HTTP_V3", "QUERY_COLLECT_V3", ["pool", "transaction"])
+register_event("v3", "flashes", "HTTP_V3", "QUERY_FLASH_V3", ["pool", "transaction"])
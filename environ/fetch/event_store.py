@@ -0,0 +1,125 @@
+"""
+Store of the raw event data, one partition per (version, entity, event).
+"""
+
+import glob
+import os
+from typing import Callable
+import pandas as pd
+import pyarrow.parquet as pq
+from config import constants
+from environ.fetch.schema import cast_table, event_schema, read_csv, table_frame
+from environ.fetch.sinks import CsvSink, ParquetSink, Sink
+
+
+def _data_format() -> str:
+    """
+    Function to get the `RAW_DATA_FORMAT` of the raw event data.
+    """
+
+    if constants.RAW_DATA_FORMAT not in ("parquet", "csv"):
+        raise ValueError(f"Unknown raw data format {constants.RAW_DATA_FORMAT!r}")
+
+    return constants.RAW_DATA_FORMAT
+
+
+def partition_path(data_path: str, event_name: str, entity: str) -> str:
+    """
+    Function to get the file of the events of an entity in an event window,
+    in the version directory `data_path`.
+    """
+
+    if _data_format() == "csv":
+        return f"{data_path}/{event_name}_{entity}.csv"
+
+    return f"{data_path}/entity={entity}/event={event_name}/part-0.parquet"
+
+
+def list_partitions(data_path: str) -> list[tuple[str, str]]:
+    """
+    Function to list the (event, entity) partitions saved in a version
+    directory.
+    """
+
+    if _data_format() == "csv":
+        return [
+            tuple(os.path.basename(file_path)[: -len(".csv")].rsplit("_", 1))
+            for file_path in sorted(glob.glob(f"{data_path}/*_*.csv"))
+            if not os.path.basename(file_path).startswith("dim_")
+        ]
+
+    return [
+        (
+            os.path.basename(os.path.dirname(file_path))[len("event=") :],
+            os.path.basename(os.path.dirname(os.path.dirname(file_path)))[
+                len("entity=") :
+            ],
+        )
+        for file_path in sorted(
+            glob.glob(f"{data_path}/entity=*/event=*/part-0.parquet")
+        )
+    ]
+
+
+def partition_sink(
+    version: str,
+    data_path: str,
+    event_name: str,
+    entity: str,
+    columns: list[str] | None = None,
+) -> Sink:
+    """
+    Function to open the sink of a partition, written frame by frame under
+    the declared types of the `columns` of the version.
+    """
+
+    file_path = partition_path(data_path, event_name, entity)
+
+    # check if there is the path
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    if _data_format() == "csv":
+        return CsvSink(file_path, columns)
+
+    return ParquetSink(file_path, event_schema(version, columns) if columns else None)
+
+
+def save_partition(
+    df_events: pd.DataFrame, version: str, data_path: str, event_name: str, entity: str
+) -> None:
+    """
+    Function to save the events of a partition at once.
+    """
+
+    with partition_sink(
+        version, data_path, event_name, entity, list(df_events.columns)
+    ) as sink:
+        sink.write(df_events)
+
+
+def read_partition(
+    version: str,
+    data_path: str,
+    event_name: str,
+    entity: str,
+    usecols: Callable[[str], bool] | None = None,
+) -> pd.DataFrame:
+    """
+    Function to read the events of a partition, only the columns for which
+    `usecols` is true if given, with the declared types of the version.
+    """
+
+    file_path = partition_path(data_path, event_name, entity)
+
+    # read only the columns asked for
+    if _data_format() == "csv":
+        columns = list(pd.read_csv(file_path, nrows=0).columns)
+    else:
+        columns = pq.read_schema(file_path).names
+    columns = [column for column in columns if usecols is None or usecols(column)]
+
+    if _data_format() == "csv":
+        return read_csv(version, file_path, columns)
+
+    # cast the partitions saved as the strings of the subgraph
+    return table_frame(cast_table(version, pq.read_table(file_path, columns=columns)))
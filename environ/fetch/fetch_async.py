@@ -0,0 +1,124 @@
+"""
+Asyncio counterparts of the swaps, mints and burns fetch functions.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable
+import pandas as pd
+from config import constants
+from environ.fetch.fetch_engine import fetch_events_async
+from environ.fetch.subgraph_query_async import AsyncSubgraphClient, gather_or_cancel
+
+
+async def fetch_swaps_v2_async(
+    client: AsyncSubgraphClient,
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    profile: str | None = None,
+    slices: int | None = None,
+) -> pd.DataFrame:
+    """
+    Function to fetch swaps from Uniswap V2.
+    """
+
+    return await fetch_events_async(
+        client, "v2", "swaps", start_timestamp_gt, end_timestamp_lt, profile, slices
+    )
+
+
+async def fetch_swaps_v3_async(
+    client: AsyncSubgraphClient,
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    profile: str | None = None,
+    slices: int | None = None,
+) -> pd.DataFrame:
+    """
+    Function to fetch swaps from Uniswap V3.
+    """
+
+    return await fetch_events_async(
+        client, "v3", "swaps", start_timestamp_gt, end_timestamp_lt, profile, slices
+    )
+
+
+async def fetch_mints_v2_async(
+    client: AsyncSubgraphClient,
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    profile: str | None = None,
+    slices: int | None = None,
+) -> pd.DataFrame:
+    """
+    Function to fetch mints from Uniswap V2.
+    """
+
+    return await fetch_events_async(
+        client, "v2", "mints", start_timestamp_gt, end_timestamp_lt, profile, slices
+    )
+
+
+async def fetch_mints_v3_async(
+    client: AsyncSubgraphClient,
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    profile: str | None = None,
+    slices: int | None = None,
+) -> pd.DataFrame:
+    """
+    Function to fetch mints from Uniswap V3.
+    """
+
+    return await fetch_events_async(
+        client, "v3", "mints", start_timestamp_gt, end_timestamp_lt, profile, slices
+    )
+
+
+async def fetch_burns_v2_async(
+    client: AsyncSubgraphClient,
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    profile: str | None = None,
+    slices: int | None = None,
+) -> pd.DataFrame:
+    """
+    Function to fetch burns from Uniswap V2.
+    """
+
+    return await fetch_events_async(
+        client, "v2", "burns", start_timestamp_gt, end_timestamp_lt, profile, slices
+    )
+
+
+async def fetch_burns_v3_async(
+    client: AsyncSubgraphClient,
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    profile: str | None = None,
+    slices: int | None = None,
+) -> pd.DataFrame:
+    """
+    Function to fetch burns from Uniswap V3.
+    """
+
+    return await fetch_events_async(
+        client, "v3", "burns", start_timestamp_gt, end_timestamp_lt, profile, slices
+    )
+
+
+def run_fetch_jobs(
+    jobs: list[tuple[Callable[..., Awaitable[pd.DataFrame]], int, int]],
+    concurrency: int = constants.ASYNC_CONCURRENCY,
+) -> list[pd.DataFrame]:
+    """
+    Run several (async fetch function, start, end) jobs concurrently
+    and return their dataframes in the order of the jobs.
+    """
+
+    async def _run() -> list[Any]:
+        async with AsyncSubgraphClient(concurrency=concurrency) as client:
+            return await gather_or_cancel(
+                *[func(client, start, end) for func, start, end in jobs]
+            )
+
+    return asyncio.run(_run())
@@ -0,0 +1,30 @@
+"""
+Functions to fetch swaps, mints and burns of one window in shared requests.
+"""
+
+import pandas as pd
+from environ.fetch.fetch_engine import fetch_events_batched
+
+
+def fetch_window_v2(
+    start_timestamp_gt: int, end_timestamp_lt: int, profile: str | None = None
+) -> dict[str, pd.DataFrame]:
+    """
+    Function to fetch swaps, mints and burns from Uniswap V2.
+    """
+
+    return fetch_events_batched(
+        "v2", ["swaps", "mints", "burns"], start_timestamp_gt, end_timestamp_lt, profile
+    )
+
+
+def fetch_window_v3(
+    start_timestamp_gt: int, end_timestamp_lt: int, profile: str | None = None
+) -> dict[str, pd.DataFrame]:
+    """
+    Function to fetch swaps, mints and burns from Uniswap V3.
+    """
+
+    return fetch_events_batched(
+        "v3", ["swaps", "mints", "burns"], start_timestamp_gt, end_timestamp_lt, profile
+    )
@@ -0,0 +1,143 @@
+"""
+Functions to fetch the pair, pool and token dimension tables.
+"""
+
+import os
+import pandas as pd
+from config import constants
+import environ.fetch.page_decoder as decoder
+import environ.fetch.subgraph_query as subgraph
+from environ.fetch.event_store import list_partitions, read_partition
+from environ.fetch.fetch_engine import parse_events, unwrap_df
+from environ.fetch.query_builder import build_dimension_query
+from environ.fetch.schema import read_csv
+
+
+def dimension_path(data_path: str, dimension: str) -> str:
+    """
+    Function to get the path of a dimension table beside the event data.
+    """
+
+    return f"{data_path}/dim_{dimension}.csv"
+
+
+def foreign_keys(df_events: pd.DataFrame, version: str) -> dict[str, set[str]]:
+    """
+    Function to collect the dimension ids referenced by a dataframe,
+    e.g. the `pair_id` column of the normalized v2 events.
+    """
+
+    keys: dict[str, set[str]] = {}
+    for field, dimension in constants.DIMENSION_FIELDS[version].items():
+        if f"{field}_id" in df_events.columns:
+            keys.setdefault(dimension, set()).update(
+                df_events[f"{field}_id"].dropna().astype(str)
+            )
+
+    return keys
+
+
+def fetch_dimension(
+    http: str, version: str, dimension: str, ids: list[str]
+) -> pd.DataFrame:
+    """
+    Function to fetch the rows of a dimension table by ids,
+    `DIMENSION_BATCH_SIZE` ids per request.
+    """
+
+    query_scripts = build_dimension_query(version, dimension)
+
+    # fetch the ids batch by batch
+    batches = []
+    for start in range(0, len(ids), constants.DIMENSION_BATCH_SIZE):
+        params_ids = {"ids": ids[start : start + constants.DIMENSION_BATCH_SIZE]}
+        result = subgraph.run_query_var(http, query_scripts, params_ids)
+        batches.append(decoder.decode_page(result["data"][dimension], version))
+
+    # create a dataframe from all the batches at once
+    df_dimension = decoder.concat_batches(batches)
+    if df_dimension.empty:
+        return df_dimension
+
+    # unwrap the ids of the nested dimensions and parse the rows
+    return parse_events(
+        version, unwrap_df(df_dimension, list(constants.DIMENSION_FIELDS[version]))
+    )
+
+
+def update_dimensions(
+    version: str, event_dfs: list[pd.DataFrame], data_path: str
+) -> dict[str, int]:
+    """
+    Function to add the dimension rows referenced by the events to the
+    dimension tables of a version. Only the ids missing from the tables
+    are fetched, so every pair, pool and token is fetched once.
+    """
+
+    http = getattr(constants, f"HTTP_{version.upper()}")
+
+    # ids referenced by the events
+    pending: dict[str, set[str]] = {}
+    for df_events in event_dfs:
+        for dimension, ids in foreign_keys(df_events, version).items():
+            pending.setdefault(dimension, set()).update(ids)
+
+    added = {}
+    while pending:
+        dimension, ids = pending.popitem()
+        file_path = dimension_path(data_path, dimension)
+
+        # keep the rows already fetched
+        df_known = (
+            read_csv(version, file_path)
+            if os.path.exists(file_path)
+            else pd.DataFrame(columns=["id"])
+        )
+        missing = sorted(ids - set(df_known["id"]))
+        if not missing:
+            continue
+
+        # info message
+        print(f"Fetching {len(missing)} {version} {dimension}")
+
+        df_new = fetch_dimension(http, version, dimension, missing)
+        if df_new.empty:
+            continue
+        added[dimension] = added.get(dimension, 0) + len(df_new)
+
+        # save the table with the new rows
+        os.makedirs(data_path, exist_ok=True)
+        df_dimension = (
+            df_new
+            if df_known.empty
+            else pd.concat([df_known, df_new], ignore_index=True)
+        )
+        # write to a temporary file first so readers never see partial tables
+        df_dimension.to_csv(f"{file_path}.tmp", index=False)
+        os.replace(f"{file_path}.tmp", file_path)
+
+        # follow the dimensions referenced by the new rows, e.g. pair tokens
+        for nested, nested_ids in foreign_keys(df_new, version).items():
+            pending.setdefault(nested, set()).update(nested_ids)
+
+    return added
+
+
+def update_dimensions_from_store(version: str, data_path: str) -> dict[str, int]:
+    """
+    Function to update the dimension tables from the event partitions
+    already saved in a version directory.
+    """
+
+    event_dfs = [
+        read_partition(
+            version,
+            data_path,
+            event_name,
+            entity,
+            usecols=lambda column: column.endswith("_id"),
+        )
+        for event_name, entity in list_partitions(data_path)
+    ]
+
+    return update_dimensions(version, event_dfs, data_path)
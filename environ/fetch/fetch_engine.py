@@ -0,0 +1,439 @@
+"""
+Generic engine to fetch the registered events of the Uniswap subgraphs.
+"""
+
+import itertools
+from functools import lru_cache, partial
+from typing import Callable, Iterator
+import pandas as pd
+from config import constants
+import environ.fetch.page_decoder as decoder
+import environ.fetch.subgraph_query as subgraph
+from environ.fetch.block_index import get_block_index
+from environ.fetch.checkpoint import checkpointed_pages, get_checkpoint, resume
+from environ.fetch.event_registry import get_event
+from environ.fetch.graphql_parser import Field, parse_query
+from environ.fetch.paginator import BlockPaginator, Paginator
+from environ.fetch.query_builder import get_query
+from environ.fetch.range_store import get_range_store
+from environ.fetch.schema import event_schema, typed_frame
+from environ.fetch.slicer import iter_pages, slice_paginators, stitch_pages
+from environ.fetch.subgraph_query_async import AsyncSubgraphClient, gather_or_cancel
+
+
+def unwrap_df(df_events: pd.DataFrame, nested_list: list[str]) -> pd.DataFrame:
+    """
+    Function to unwrap the nested data, e.g. `pair` -> `pair_id`, ...
+
+    Each nested object is split into its keys in one pass over the rows by
+    the dataframe constructor, with the keys of all the rows; missing keys
+    and null objects give NaN. The values of the nested objects are kept as
+    they are in object columns, parsed by `parse_events`. A nested object
+    unwrapped from another, e.g. `pair_token0`, is listed after it.
+    """
+
+    # columns of the unwrapped dataframe, in the order of the dataframe
+    columns = {column: df_events[column] for column in df_events.columns}
+
+    # unwrap each nested object once, appending its keys
+    for nested in nested_list:
+        # skip the nested data not fetched by the query profile
+        if nested not in columns:
+            continue
+
+        records = [
+            record if isinstance(record, dict) else {}
+            for record in columns.pop(nested).tolist()
+        ]
+        # keys of all the rows in order of first appearance
+        nested_keys = list(dict.fromkeys(itertools.chain.from_iterable(records)))
+        df_nested = pd.DataFrame(
+            records, index=df_events.index, columns=nested_keys, dtype=object
+        )
+        for nested_key in df_nested.columns:
+            columns[f"{nested}_{nested_key}"] = df_nested[nested_key]
+
+    # build the dataframe once
+    return pd.DataFrame(columns, index=df_events.index)
+
+
+@lru_cache(maxsize=64)
+def event_columns(version: str, entity: str, query_scripts: str) -> list[str]:
+    """
+    Function to get the columns of the unwrapped events of a query, in the
+    order `unwrap_df` gives them.
+    """
+
+    def _template(fields: list[Field]) -> dict:
+        return {
+            field.key: _template(field.selections) if field.selections else None
+            for field in fields
+        }
+
+    root = parse_query(query_scripts).selections[0]
+    df_template = pd.DataFrame([_template(root.selections)], dtype=object)
+
+    return list(unwrap_df(df_template, get_event(version, entity).nested_list))
+
+
+def parse_events(version: str, df_events: pd.DataFrame) -> pd.DataFrame:
+    """
+    Function to parse the unwrapped events, strings of the subgraph, into
+    the declared types of their columns, see `FIELD_TYPES`.
+    """
+
+    return typed_frame(df_events, event_schema(version, list(df_events.columns)))
+
+
+def window_paging(
+    start_timestamp_gt: int, end_timestamp_lt: int
+) -> tuple[Callable[..., Paginator], int, int]:
+    """
+    Function to get the paginator of a window for the `FETCH_MODE` and the
+    bounds of its cursor: the timestamps, or the blocks mined over the
+    window from the block index, whose events outside the window are
+    dropped by the paginator.
+    """
+
+    if constants.FETCH_MODE == "timestamp":
+        return Paginator, start_timestamp_gt - 1, end_timestamp_lt
+    if constants.FETCH_MODE != "block":
+        raise ValueError(f"Unknown fetch mode {constants.FETCH_MODE!r}")
+
+    block_gt, block_lt = get_block_index().block_range(
+        start_timestamp_gt, end_timestamp_lt
+    )
+
+    return (
+        partial(BlockPaginator, window=(start_timestamp_gt, end_timestamp_lt)),
+        block_gt,
+        block_lt,
+    )
+
+
+def _iter_window(
+    version: str,
+    entity: str,
+    query_scripts: str,
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    slices: int | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Function to fetch the events of a window from the subgraph, yielding
+    them `STREAM_PAGES` pages at a time as unwrapped frames with the
+    columns of the query, parsed into their declared types.
+    """
+
+    spec = get_event(version, entity)
+    schema = event_schema(version, event_columns(version, entity, query_scripts))
+    paginator, lo, hi = window_paging(start_timestamp_gt, end_timestamp_lt)
+
+    # page through the window from its checkpoint, or in parallel time
+    # slices if asked
+    if (slices or constants.FETCH_SLICES) <= 1:
+        pages = checkpointed_pages(
+            get_checkpoint(version, entity, lo, hi, query_scripts),
+            paginator(spec.endpoint, query_scripts, lo, hi),
+        )
+    else:
+        pages = iter_pages(
+            spec.endpoint, query_scripts, lo, hi, slices, paginator=paginator
+        )
+
+    # decode each page into column buffers
+    batches = []
+    for iter_count, events_iter in enumerate(pages, start=1):
+        if events_iter:
+            batches.append(decoder.decode_page(events_iter, version))
+
+        # summarize the iteration count
+        print(f"Iteration count: {iter_count} {entity}: {len(events_iter)}")
+
+        # flatten and hand over the pages so far
+        if len(batches) >= constants.STREAM_PAGES:
+            yield typed_frame(
+                unwrap_df(decoder.concat_batches(batches), spec.nested_list), schema
+            )
+            batches = []
+
+    if batches:
+        yield typed_frame(
+            unwrap_df(decoder.concat_batches(batches), spec.nested_list), schema
+        )
+
+
+def iter_events(
+    version: str,
+    entity: str,
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    profile: str | None = None,
+    slices: int | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Function to fetch the events of a registered (version, entity) as a
+    stream of frames in timestamp order, so the memory used does not grow
+    with the window.
+
+    The fields fetched depend on the query profile, see `get_query`, and
+    the window is paged on the cursor of the `FETCH_MODE`, see
+    `window_paging`, in `slices` parallel slices, see `iter_pages`.
+    A window paged in one slice is checkpointed page by page and resumed
+    by the next call after an interruption, see `Checkpoint`.
+
+    With the range store only the parts of the window not fetched before
+    are queried, streamed into the store, and the window is read back from
+    the store, see `RangeStore`.
+    """
+
+    spec = get_event(version, entity)
+
+    # build the query of the profile
+    query_scripts = get_query(version, entity, profile)
+
+    store = get_range_store(version, entity, spec.endpoint, query_scripts)
+    if store is None:
+        yield from _iter_window(
+            version,
+            entity,
+            query_scripts,
+            start_timestamp_gt,
+            end_timestamp_lt,
+            slices,
+        )
+        return
+
+    # fetch and store the ranges of the window not covered yet
+    for range_start, range_end in store.missing(start_timestamp_gt, end_timestamp_lt):
+        # info message
+        print(f"Fetching {version} {entity} from {range_start} to {range_end}")
+
+        store.put(
+            range_start,
+            range_end,
+            _iter_window(
+                version, entity, query_scripts, range_start, range_end, slices
+            ),
+        )
+
+    yield from store.iter_read(start_timestamp_gt, end_timestamp_lt)
+
+
+def fetch_events(
+    version: str,
+    entity: str,
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    profile: str | None = None,
+    slices: int | None = None,
+) -> pd.DataFrame:
+    """
+    Function to fetch the events of a registered (version, entity) into
+    one dataframe, see `iter_events`.
+    """
+
+    frames = list(
+        iter_events(
+            version, entity, start_timestamp_gt, end_timestamp_lt, profile, slices
+        )
+    )
+    if not frames:
+        return pd.DataFrame()
+
+    return pd.concat(frames, ignore_index=True)
+
+
+async def _page_async(
+    client: AsyncSubgraphClient, paginator: Paginator
+) -> list[list[dict]]:
+    """
+    Function to page through the time slice of one paginator.
+    """
+
+    pages = []
+    while not paginator.done:
+        # run the query of the next page
+        query_scripts, params = paginator.next_request()
+        result_iter = await client.run_query_var(paginator.http, query_scripts, params)
+
+        # list of events for this batch
+        pages.append(paginator.advance(result_iter["data"]))
+
+    return pages
+
+
+async def fetch_events_async(
+    client: AsyncSubgraphClient,
+    version: str,
+    entity: str,
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    profile: str | None = None,
+    slices: int | None = None,
+) -> pd.DataFrame:
+    """
+    Function to fetch the events of a registered (version, entity) with the
+    async client.
+
+    The pages of one time slice depend on each other, so they are awaited
+    in turn; the concurrency comes from the `slices` of the window and from
+    running several windows at once.
+    """
+
+    spec = get_event(version, entity)
+    paginator, lo, hi = window_paging(start_timestamp_gt, end_timestamp_lt)
+
+    # page the time slices of the window concurrently
+    paginators = slice_paginators(
+        spec.endpoint,
+        get_query(version, entity, profile),
+        lo,
+        hi,
+        slices or constants.FETCH_SLICES,
+        paginator=paginator,
+    )
+    slice_pages = await gather_or_cancel(
+        *[_page_async(client, paginator) for paginator in paginators]
+    )
+
+    # column buffers of all the batches, stitched in timestamp order
+    batches = [
+        decoder.decode_page(events_iter, version)
+        for events_iter in stitch_pages(
+            (page for pages in slice_pages for page in pages),
+            paginators[0].position,
+        )
+    ]
+
+    # create a dataframe from all the batches at once
+    df_events = decoder.concat_batches(batches)
+
+    # unwrap the nested data and parse it
+    return parse_events(version, unwrap_df(df_events, spec.nested_list))
+
+
+def _fetch_window_batched(
+    version: str,
+    queries: dict[str, str],
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+) -> dict[str, pd.DataFrame]:
+    """
+    Function to fetch the events of a window from the subgraph, one aliased
+    sub-query per entity in each request.
+
+    Every entity keeps its own paginator and checkpoint; an entity drops
+    out of the batch once its paginator has covered the window.
+    """
+
+    specs = {entity: get_event(version, entity) for entity in queries}
+    http = next(iter(specs.values())).endpoint
+    paginator, lo, hi = window_paging(start_timestamp_gt, end_timestamp_lt)
+
+    # paginator, checkpoint and column buffers of each entity
+    paginators, checkpoints, batches = {}, {}, {}
+    for entity, query_scripts in queries.items():
+        paginators[entity] = paginator(http, query_scripts, lo, hi)
+        checkpoints[entity] = get_checkpoint(version, entity, lo, hi, query_scripts)
+
+        # resume from the pages already fetched
+        batches[entity] = [
+            decoder.decode_page(events_iter, version)
+            for events_iter in resume(checkpoints[entity], paginators[entity])
+        ]
+        if paginators[entity].done:
+            del paginators[entity]
+
+    iter_count = 0
+    while paginators:
+        # one aliased sub-query per entity still paging
+        parts = {
+            entity: paginator.next_request() for entity, paginator in paginators.items()
+        }
+        results = subgraph.run_batched_query(http, parts)
+
+        for entity, result_iter in results.items():
+            # list of events for this batch
+            events_iter = paginators[entity].advance(result_iter["data"])
+            batches[entity].append(decoder.decode_page(events_iter, version))
+            if checkpoints[entity] is not None:
+                checkpoints[entity].save(paginators[entity].cursor, events_iter)
+
+            # stop paging this entity once the window is covered
+            if paginators[entity].done:
+                del paginators[entity]
+
+        # summarize the iteration count
+        iter_count += 1
+        print(
+            f"Iteration count: {iter_count} entities still paging: {list(paginators)}"
+        )
+
+    # the window is covered, drop the checkpoints
+    for checkpoint in checkpoints.values():
+        if checkpoint is not None:
+            checkpoint.clear()
+
+    # create a parsed dataframe per entity from all its batches at once
+    return {
+        entity: parse_events(
+            version,
+            unwrap_df(decoder.concat_batches(batches[entity]), spec.nested_list),
+        )
+        for entity, spec in specs.items()
+    }
+
+
+def fetch_events_batched(
+    version: str,
+    entities: list[str],
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    profile: str | None = None,
+) -> dict[str, pd.DataFrame]:
+    """
+    Function to fetch several entities of the same version and window in
+    shared requests, see `_fetch_window_batched`.
+
+    With the range store each entity is only queried over the parts of
+    the window it has not fetched before; the entities missing the same
+    range share its requests.
+    """
+
+    queries = {entity: get_query(version, entity, profile) for entity in entities}
+    stores = {
+        entity: get_range_store(
+            version, entity, get_event(version, entity).endpoint, query_scripts
+        )
+        for entity, query_scripts in queries.items()
+    }
+    if any(store is None for store in stores.values()):
+        return _fetch_window_batched(
+            version, queries, start_timestamp_gt, end_timestamp_lt
+        )
+
+    # entities missing each range of the window
+    missing: dict[tuple[int, int], list[str]] = {}
+    for entity, store in stores.items():
+        for missing_range in store.missing(start_timestamp_gt, end_timestamp_lt):
+            missing.setdefault(missing_range, []).append(entity)
+
+    # fetch and store the ranges not covered yet
+    for (range_start, range_end), range_entities in sorted(missing.items()):
+        # info message
+        print(f"Fetching {version} {range_entities} from {range_start} to {range_end}")
+
+        df_events = _fetch_window_batched(
+            version,
+            {entity: queries[entity] for entity in range_entities},
+            range_start,
+            range_end,
+        )
+        for entity, df_entity in df_events.items():
+            stores[entity].put(range_start, range_end, [df_entity])
+
+    return {
+        entity: store.read(start_timestamp_gt, end_timestamp_lt)
+        for entity, store in stores.items()
+    }
@@ -0,0 +1,281 @@
+"""
+Functions to estimate the cost of a fetch before running it.
+"""
+
+import gzip
+import io
+import json
+import time
+import pandas as pd
+import pyarrow.parquet as pq
+from config import constants
+import environ.fetch.page_decoder as decoder
+import environ.fetch.subgraph_query as subgraph
+from environ.fetch.endpoints import endpoint_urls
+from environ.fetch.event_registry import get_event
+from environ.fetch.fetch_engine import parse_events, unwrap_df, window_paging
+from environ.fetch.fetch_plan import event_windows, plan_ranges
+from environ.fetch.paginator import paginated_queries
+from environ.fetch.query_builder import get_query
+from environ.fetch.schema import event_schema, frame_table
+from environ.fetch.slicer import DensityModel, get_density_model
+
+
+def sample_window(
+    version: str,
+    entity: str,
+    start: int,
+    end: int,
+    model: DensityModel,
+    samples: int = constants.PLAN_SAMPLES,
+    profile: str | None = None,
+    client: subgraph.SubgraphClient | None = None,
+) -> list[tuple[float, float, int, int]]:
+    """
+    Function to sample the density of the events of the window [start, end):
+    one page from the middle of each of `samples` equal parts of the window,
+    recorded in the density `model`. Returns the request latency, the time
+    to cache, decode and write the events, the events and the bytes of each
+    sampled page.
+    """
+
+    spec = get_event(version, entity)
+    http = spec.endpoint
+    query_scripts = get_query(version, entity, profile)
+    paginator, lo, hi = window_paging(start, end)
+
+    probes = []
+    for sample in range(samples):
+        point = lo + (hi - lo) * (2 * sample + 1) // (2 * samples)
+        probe = paginator(http, query_scripts, point, hi)
+
+        # fetch the first page from the point
+        query, params = probe.next_request()
+        request_start = time.perf_counter()
+        result = subgraph.run_query_var(http, query, params, client)
+        latency = time.perf_counter() - request_start
+        page = probe.advance(result["data"])
+
+        # cursor positions covered by the page
+        model.observe(
+            point + 1,
+            probe.end_timestamp_lt if probe.done else probe.timestamp + 1,
+            len(page),
+        )
+
+        # cache, decode, flatten, parse and write the page as the fetchers do
+        process_start = time.perf_counter()
+        body = json.dumps(result).encode()
+        if constants.CACHE_ENABLED:
+            gzip.compress(body)
+        if page:
+            df_page = parse_events(
+                version,
+                unwrap_df(
+                    decoder.concat_batches([decoder.decode_page(page, version)]),
+                    spec.nested_list,
+                ),
+            )
+            if constants.RAW_DATA_FORMAT == "csv":
+                df_page.to_csv(io.StringIO(), index=False)
+            else:
+                pq.write_table(
+                    frame_table(df_page, event_schema(version, list(df_page.columns))),
+                    io.BytesIO(),
+                    compression=constants.PARQUET_COMPRESSION,
+                )
+        process = time.perf_counter() - process_start
+
+        probes.append((latency, process, len(page), len(body)))
+
+    return probes
+
+
+def _estimate(
+    model: DensityModel,
+    lo: int,
+    hi: int,
+    page_size: int,
+    latency: float,
+    process: float,
+    event_bytes: float,
+    endpoints: int,
+    slices: int,
+) -> dict[str, float]:
+    """
+    Function to estimate the events, pages, bytes and wall time of paging
+    the cursor positions [lo, hi) in `slices` slices.
+    """
+
+    events = model.expected(lo, hi) or 0.0
+
+    # every slice ends with a short page
+    pages = int(events // page_size) + slices
+
+    # the slices are paged at once, as fast as the rate limits allow, and
+    # their pages decoded one after the other
+    seconds = pages * process + max(
+        pages * latency / min(slices, constants.SLICE_WORKERS),
+        pages / (constants.RATE_LIMIT_PER_SECOND * endpoints),
+    )
+
+    return {
+        "events": round(events),
+        "pages": pages,
+        "mb": events * event_bytes / 2**20,
+        "seconds": seconds,
+        # enough slices to keep the workers busy, with no sparse slice
+        "slices": max(
+            1, min(constants.SLICE_WORKERS, pages // constants.SLICE_MIN_PAGES)
+        ),
+    }
+
+
+def estimate_fetch(
+    versions: list[str] | None = None,
+    entities: list[str] | None = None,
+    events: list[tuple[str, str]] | None = None,
+    profile: str | None = None,
+    slices: int | None = None,
+    samples: int = constants.PLAN_SAMPLES,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Function to plan a fetch without running it.
+
+    The density of the events of each (version, entity) is sampled in every
+    event window, with a few pages fetched outside the response cache. The
+    events, pages, bytes and wall time of each window are then estimated
+    under the configured slices, workers and rate limits, along with the
+    slices suggested to page it. The density sampled is kept by the
+    fetches of the process, whose slices are then sized by expected events
+    from the start.
+
+    Returns the estimates by (version, entity, event), and by (version,
+    entity) and range of the fetch plan, i.e. what a run fetches.
+    """
+
+    versions = versions or ["v2", "v3"]
+    entities = entities or ["swaps", "burns", "mints"]
+    slices = slices or constants.FETCH_SLICES
+    windows = event_windows(events)
+    client = subgraph.SubgraphClient(use_cache=False)
+
+    window_rows, range_rows = [], []
+    for version in versions:
+        for entity in entities:
+            http = get_event(version, entity).endpoint
+            query_scripts = get_query(version, entity, profile)
+            model = get_density_model(http, query_scripts)
+
+            # sample the density of every event window
+            probes = []
+            for start, end in windows.values():
+                probes.extend(
+                    sample_window(
+                        version, entity, start, end, model, samples, profile, client
+                    )
+                )
+
+            # mean latency and processing time of a page of the samples, and
+            # size of an event, scaled to full pages
+            page_size = paginated_queries(query_scripts)[3]
+            sampled = max(1, sum(probe[2] for probe in probes))
+            latency = sum(probe[0] for probe in probes) / len(probes)
+            process = sum(probe[1] for probe in probes) / sampled * page_size
+            costs = (
+                page_size,
+                latency,
+                process,
+                sum(probe[3] for probe in probes) / sampled,
+                len(endpoint_urls(http)),
+                slices,
+            )
+
+            for event_name, (start, end) in windows.items():
+                _, lo, hi = window_paging(start, end)
+                window_rows.append(
+                    {
+                        "version": version,
+                        "entity": entity,
+                        "event": event_name,
+                        **_estimate(model, lo + 1, hi, *costs),
+                    }
+                )
+            for start, end in plan_ranges(windows):
+                _, lo, hi = window_paging(start, end)
+                range_rows.append(
+                    {
+                        "version": version,
+                        "entity": entity,
+                        "endpoint": http,
+                        "start": start,
+                        "end": end,
+                        **_estimate(model, lo + 1, hi, *costs),
+                    }
+                )
+
+    return pd.DataFrame(window_rows), pd.DataFrame(range_rows)
+
+
+def total_seconds(df_ranges: pd.DataFrame, endpoint_concurrency: int | None) -> float:
+    """
+    Function to estimate the wall time of fetching the ranges of a plan:
+    one after the other as the fetch scripts do, or `endpoint_concurrency`
+    at a time per endpoint and mirror as the pipeline does.
+    """
+
+    if endpoint_concurrency is None:
+        return float(df_ranges["seconds"].sum())
+
+    # the endpoints are queried at once, each as fast as its rate limit allows
+    seconds = []
+    for http, df_endpoint in df_ranges.groupby("endpoint"):
+        endpoints = len(endpoint_urls(http))
+        seconds.append(
+            max(
+                df_endpoint["seconds"].sum() / (endpoint_concurrency * endpoints),
+                df_endpoint["seconds"].max(),
+                df_endpoint["pages"].sum()
+                / (constants.RATE_LIMIT_PER_SECOND * endpoints),
+            )
+        )
+
+    return max(seconds)
+
+
+def print_plan(
+    versions: list[str] | None = None,
+    entities: list[str] | None = None,
+    events: list[tuple[str, str]] | None = None,
+    profile: str | None = None,
+    endpoint_concurrency: int | None = None,
+) -> pd.DataFrame:
+    """
+    Function to print the plan of a fetch and its estimated cost, see
+    `estimate_fetch`. Returns the estimates by (version, entity, event).
+    """
+
+    df_windows, df_ranges = estimate_fetch(versions, entities, events, profile)
+
+    # info message
+    print("Estimated fetch by event window:")
+    print(df_windows.round(2).to_string(index=False))
+    print(
+        f"Estimated total over the fetch plan: {df_ranges['events'].sum():,} events "
+        f"in {df_ranges['pages'].sum():,} pages, {df_ranges['mb'].sum():,.1f} MB, "
+        f"about {total_seconds(df_ranges, endpoint_concurrency) / 60:,.1f} minutes"
+    )
+    if constants.CACHE_ENABLED:
+        print(
+            f"Response cache on: the responses are kept in {constants.CACHE_PATH}, "
+            f"up to {constants.CACHE_MAX_BYTES / 2**20:,.0f} MB; the estimates "
+            "are for a run without cached responses"
+        )
+    else:
+        print(
+            "Response cache off (CACHE_ENABLED = False): the range store keeps "
+            "the fetched events; the estimates are for a run without cached "
+            "responses"
+        )
+
+    return df_windows
@@ -1,120 +1,29 @@
 """
 Functions to fetch mints data from Uniswap V2.
 """
-import warnings
+
 import pandas as pd
-import environ.fetch.subgraph_query as subgraph
 from config import constants
-
-# ignore warnings
-warnings.filterwarnings("ignore")
+import environ.fetch.fetch_utils as utils
+from environ.fetch.fetch_engine import fetch_events
 
 
-def _timestamp_converter(datestr: str) -> int:
+def fetch_mints_v2(
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    profile: str | None = None,
+    slices: int | None = None,
+) -> pd.DataFrame:
     """
-    Function to convert date string to unix timestamp.
+    Function to fetch mints from Uniswap V2, see `fetch_events`.
     """
 
-    # Convert date string to unix timestamp
-    timestamp = pd.to_datetime(datestr).timestamp()
-
-    return int(timestamp)
-
-
-def _fetch_batch_zero_v2(start_timestamp_gt: int) -> str:
-    """
-    Function to fetch the first 1000 mints as the initial batch 0
-    ordered by timestamp in ascending order.
-    """
-
-    # Start from fetching the first 1000 mints as the initial batch 0
-    # ordered by timestamp in ascending order
-    params_start_gt = {"start_timestamp_gt": start_timestamp_gt - 1}
-
-    mints_0 = subgraph.run_query_var(
-        constants.HTTP_V2, constants.QUERY_MINT_V2, params_start_gt
+    return fetch_events(
+        "v2", "mints", start_timestamp_gt, end_timestamp_lt, profile, slices
     )
 
-    return mints_0
-
-
-def _unwrap_df(df_all_mints: pd.DataFrame, nested_list: list[str]) -> pd.DataFrame:
-    """
-    Function to unwrap the nested data.
-    """
-
-    # Unwrap the nested data level 1
-    for nested in nested_list:
-        # get the key of the nested dictionary
-        nested_keys = df_all_mints[nested][0].keys()
-
-        # unwrap the nested dictionary
-        for nested_key in nested_keys:
-            df_all_mints[f"{nested}_{nested_key}"] = df_all_mints[nested].apply(
-                lambda x: x[nested_key]
-            )
-
-        # drop the nested dictionary
-        df_all_mints = df_all_mints.drop(nested, axis=1)
-
-    return df_all_mints
-
-
-def fetch_mints_v2(start_timestamp_gt: int, end_timestamp_lt: int) -> pd.DataFrame:
-    """
-    Function to fetch mints from Uniswap V2.
-    """
-
-    # fetch the first 1000 mints as the initial batch 0
-    df_mints_0 = _fetch_batch_zero_v2(start_timestamp_gt)
-
-    # create a dataframe from the initial batch 0
-    df_all_mints = pd.DataFrame.from_dict(df_mints_0["data"]["mints"])
-
-    # iterate through the rest of the batches and start from the last timestamp
-    # which is got by batch 0
-    iter_count = 0
-    mints_iter = df_mints_0["data"]["mints"]
-
-    while int(mints_iter[-1]["timestamp"]) < end_timestamp_lt:
-        # get the last timestamp of the previous batch
-        last_timestamp = int(mints_iter[-1]["timestamp"])
-
-        # create the query parameters
-        params_last_timestamp = {"start_timestamp_gt": last_timestamp}
-
-        # run the query
-        result_iter = subgraph.run_query_var(
-            constants.HTTP_V2, constants.QUERY_MINT_V2, params_last_timestamp
-        )
-
-        # check if the result is empty
-        if list(result_iter.keys()) == ["data"]:
-            # list of mints for this batch
-            mints_iter = result_iter["data"]["mints"]
-
-            # add list of this batch to the dataframe
-            df_all_mints = df_all_mints.append(mints_iter, ignore_index=True)
-
-            # summarize the iteration count
-            iter_count += 1
-            print(
-                f"Iteration count: {iter_count} last timestamp: {pd.to_datetime(last_timestamp, unit='s')}"
-            )
-
-    # drop the entries with timestamp larger than the end timestamp
-    df_all_mints = df_all_mints[
-        df_all_mints["timestamp"].astype(int) < end_timestamp_lt
-    ]
-
-    # unwrap the nested data
-    df_all_mints = _unwrap_df(
-        df_all_mints, ["pair", "pair_token0", "pair_token1", "transaction"]
-    )
-
-    return df_all_mints
-
 
 if __name__ == "__main__":
-    # print the timestamp of event three
-    print(_timestamp_converter(constants.EVENT_THREE[1]))
+    # fetch the mints of the first event window
+    timestamps = utils.timestamp_converter(constants.EVENT_ONE[1])
+    print(fetch_mints_v2(timestamps["start_timestamp"], timestamps["end_timestamp"]))
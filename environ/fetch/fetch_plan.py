@@ -0,0 +1,196 @@
+"""
+Functions to fetch the event windows once over their union.
+"""
+
+from contextlib import ExitStack
+import pandas as pd
+from config import constants
+import environ.fetch.fetch_utils as utils
+from environ.fetch.event_store import partition_sink, save_partition
+from environ.fetch.fetch_engine import (
+    event_columns,
+    fetch_events,
+    fetch_events_batched,
+    iter_events,
+)
+from environ.fetch.query_builder import get_query
+from environ.fetch.range_store import merge_intervals
+
+
+def event_windows(
+    events: list[tuple[str, str]] | None = None,
+) -> dict[str, tuple[int, int]]:
+    """
+    Function to get the [start, end) window of each event,
+    by default of the `EVENT_LIST` of the constants.
+    """
+
+    windows = {}
+    for event_name, event_time in events or constants.EVENT_LIST:
+        timestamps = utils.timestamp_converter(event_time)
+        windows[event_name] = (
+            timestamps["start_timestamp"],
+            timestamps["end_timestamp"],
+        )
+
+    return windows
+
+
+def plan_ranges(windows: dict[str, tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    Function to plan the time ranges to fetch: the union of the windows,
+    so the overlapping windows are fetched once.
+    """
+
+    return merge_intervals(list(windows.values()))
+
+
+def fetch_event_windows(
+    version: str,
+    entities: list[str],
+    events: list[tuple[str, str]] | None = None,
+    profile: str | None = None,
+) -> dict[str, dict[str, pd.DataFrame]]:
+    """
+    Function to fetch the entities of a version over every event window.
+
+    Each range of the plan is fetched once per entity, in shared requests
+    for several entities, and the events of each window are cut out of it.
+    Returns the dataframes by event and entity.
+    """
+
+    windows = event_windows(events)
+
+    # fetch each range of the plan once
+    ranges = {}
+    for range_start, range_end in plan_ranges(windows):
+        # info message
+        print(
+            f"Fetching {version} {', '.join(entities)} data "
+            f"from timestamp {range_start} to {range_end}"
+        )
+
+        if len(entities) == 1:
+            ranges[(range_start, range_end)] = {
+                entities[0]: fetch_events(
+                    version, entities[0], range_start, range_end, profile
+                )
+            }
+        else:
+            ranges[(range_start, range_end)] = fetch_events_batched(
+                version, entities, range_start, range_end, profile
+            )
+
+    # cut the window of each event out of its range
+    data = {}
+    for event_name, (start, end) in windows.items():
+        range_dfs = next(
+            dfs
+            for (range_start, range_end), dfs in ranges.items()
+            if range_start <= start and end <= range_end
+        )
+        data[event_name] = {
+            entity: (
+                df_range
+                if df_range.empty
+                else df_range[
+                    (df_range["timestamp"] >= start) & (df_range["timestamp"] < end)
+                ].reset_index(drop=True)
+            )
+            for entity, df_range in range_dfs.items()
+        }
+
+    return data
+
+
+def save_event_windows(
+    data: dict[str, dict[str, pd.DataFrame]], version: str, data_path: str
+) -> None:
+    """
+    Function to save the dataframes of each event and entity to their
+    partitions in `data_path`, see `partition_path`.
+    """
+
+    for event_name, dfs in data.items():
+        for entity, df_entity in dfs.items():
+            save_partition(df_entity, version, data_path, event_name, entity)
+
+
+def stream_range(
+    version: str,
+    entity: str,
+    range_start: int,
+    range_end: int,
+    windows: dict[str, tuple[int, int]],
+    data_path: str,
+    profile: str | None = None,
+) -> dict[str, int]:
+    """
+    Function to fetch a range of the plan and stream the events of each
+    event window in it to their partitions in `data_path`, frame by frame.
+    Returns the number of rows written per event.
+    """
+
+    columns = event_columns(version, entity, get_query(version, entity, profile))
+
+    with ExitStack() as stack:
+        sinks = {
+            event_name: stack.enter_context(
+                partition_sink(version, data_path, event_name, entity, columns)
+            )
+            for event_name in windows
+        }
+
+        # append the events of each frame to the windows they fall in
+        for df_frame in iter_events(version, entity, range_start, range_end, profile):
+            for event_name, (start, end) in windows.items():
+                sinks[event_name].write(
+                    df_frame[
+                        (df_frame["timestamp"] >= start) & (df_frame["timestamp"] < end)
+                    ]
+                )
+
+    return {event_name: sink.rows for event_name, sink in sinks.items()}
+
+
+def stream_event_windows(
+    version: str,
+    entity: str,
+    data_path: str,
+    events: list[tuple[str, str]] | None = None,
+    profile: str | None = None,
+) -> dict[str, int]:
+    """
+    Function to fetch an entity over every event window and save the events
+    of each window as they arrive, so the memory used does not depend on
+    the length of the windows. Each range of the plan is fetched once.
+    Returns the number of rows saved per event.
+    """
+
+    windows = event_windows(events)
+
+    rows = {}
+    for range_start, range_end in plan_ranges(windows):
+        # info message
+        print(
+            f"Fetching {version} {entity} data "
+            f"from timestamp {range_start} to {range_end}"
+        )
+
+        rows.update(
+            stream_range(
+                version,
+                entity,
+                range_start,
+                range_end,
+                {
+                    event_name: (start, end)
+                    for event_name, (start, end) in windows.items()
+                    if range_start <= start and end <= range_end
+                },
+                data_path,
+                profile,
+            )
+        )
+
+    return rows
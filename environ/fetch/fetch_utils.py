@@ -3,6 +3,7 @@ Utility functions for fetch module.
 """
 
 import datetime
+import numpy as np
 import pandas as pd
 from config import constants
 
@@ -26,5 +27,14 @@ def timestamp_converter(datestr: str) -> dict[str, int]:
     }
 
 
+def split_window(start: int, end: int, parts: int) -> list[tuple[int, int]]:
+    """
+    Function to split [start, end) into contiguous sub-windows.
+    """
+
+    bounds = np.linspace(start, end, parts + 1).astype(int)
+    return [(int(lo), int(hi)) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+
 if __name__ == "__main__":
     print(timestamp_converter(constants.EVENT_ONE[1]))
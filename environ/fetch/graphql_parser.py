@@ -0,0 +1,334 @@
+"""
+Minimal GraphQL parser for the subgraph queries.
+
+Covers the subset of the language used by the subgraph queries: one
+operation with variable definitions, aliased fields, arguments and nested
+selection sets. Fragments and directives are not supported.
+"""
+
+import json
+import re
+from typing import Any
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<ignored>[\s,]+|\#[^\n]*)
+  | (?P<punct>[!$():=\[\]{}])
+  | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<name>[_A-Za-z][_0-9A-Za-z]*)
+    """,
+    re.VERBOSE,
+)
+
+
+class Variable:
+    """
+    Reference to an operation variable, e.g. `$start_timestamp_gt`.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"${self.name}"
+
+
+class Enum(str):
+    """
+    Enum value, e.g. the `timestamp` in `orderBy: timestamp`.
+    """
+
+
+class Field:
+    """
+    Field of a selection set with its alias, arguments and sub-selections.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        alias: str | None = None,
+        arguments: dict[str, Any] | None = None,
+        selections: list["Field"] | None = None,
+    ) -> None:
+        self.name = name
+        self.alias = alias
+        self.arguments = arguments or {}
+        self.selections = selections or []
+
+    @property
+    def key(self) -> str:
+        """
+        Key of the field in the response.
+        """
+
+        return self.alias or self.name
+
+    def __repr__(self) -> str:
+        return f"Field({self.key!r})"
+
+
+class Operation:
+    """
+    Parsed GraphQL operation.
+    """
+
+    def __init__(
+        self,
+        operation_type: str,
+        name: str | None,
+        variables: list[tuple[str, str]],
+        selections: list[Field],
+    ) -> None:
+        self.operation_type = operation_type
+        self.name = name
+        self.variables = variables
+        self.selections = selections
+
+
+def tokenize(text: str) -> list[tuple[str, str]]:
+    """
+    Function to split a GraphQL document into (kind, value) tokens.
+    """
+
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if match is None:
+            raise ValueError(f"Unexpected character {text[position]!r} at {position}")
+        kind = match.lastgroup
+        if kind != "ignored":
+            tokens.append((kind, match.group()))
+        position = match.end()
+
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive descent parser over the tokens of a document.
+    """
+
+    def __init__(self, text: str) -> None:
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def _peek(self) -> tuple[str, str] | None:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def _next(self) -> tuple[str, str]:
+        token = self._peek()
+        if token is None:
+            raise ValueError("Unexpected end of the query")
+        self.position += 1
+        return token
+
+    def _expect(self, value: str) -> None:
+        token = self._next()
+        if token[1] != value:
+            raise ValueError(f"Expected {value!r}, got {token[1]!r}")
+
+    def _skip(self, value: str) -> bool:
+        token = self._peek()
+        if token is not None and token[1] == value:
+            self.position += 1
+            return True
+        return False
+
+    def parse_operation(self) -> Operation:
+        """
+        operation := [type [name] [variable definitions]] selection set
+        """
+
+        operation_type, name, variables = "query", None, []
+        token = self._peek()
+        if token is not None and token[0] == "name":
+            operation_type = self._next()[1]
+            token = self._peek()
+            if token is not None and token[0] == "name":
+                name = self._next()[1]
+            if self._skip("("):
+                while not self._skip(")"):
+                    self._expect("$")
+                    var_name = self._next()[1]
+                    self._expect(":")
+                    var_type = self._parse_type()
+                    if self._skip("="):
+                        self._parse_value()
+                    variables.append((var_name, var_type))
+
+        selections = self.parse_selection_set()
+        if self._peek() is not None:
+            raise ValueError(f"Unexpected token {self._peek()[1]!r}")
+
+        return Operation(operation_type, name, variables, selections)
+
+    def _parse_type(self) -> str:
+        if self._skip("["):
+            type_str = f"[{self._parse_type()}]"
+            self._expect("]")
+        else:
+            type_str = self._next()[1]
+        if self._skip("!"):
+            type_str += "!"
+        return type_str
+
+    def parse_selection_set(self) -> list[Field]:
+        """
+        selection set := '{' field+ '}'
+        """
+
+        self._expect("{")
+        fields = []
+        while not self._skip("}"):
+            fields.append(self._parse_field())
+        return fields
+
+    def _parse_field(self) -> Field:
+        name = self._next()[1]
+        alias = None
+        if self._skip(":"):
+            alias, name = name, self._next()[1]
+
+        arguments = {}
+        if self._skip("("):
+            while not self._skip(")"):
+                arg_name = self._next()[1]
+                self._expect(":")
+                arguments[arg_name] = self._parse_value()
+
+        selections = []
+        token = self._peek()
+        if token is not None and token[1] == "{":
+            selections = self.parse_selection_set()
+
+        return Field(name, alias, arguments, selections)
+
+    def _parse_value(self) -> Any:
+        kind, value = self._next()
+        if value == "$":
+            return Variable(self._next()[1])
+        if value == "[":
+            values = []
+            while not self._skip("]"):
+                values.append(self._parse_value())
+            return values
+        if value == "{":
+            fields = {}
+            while not self._skip("}"):
+                key = self._next()[1]
+                self._expect(":")
+                fields[key] = self._parse_value()
+            return fields
+        if kind == "number":
+            return float(value) if any(c in value for c in ".eE") else int(value)
+        if kind == "string":
+            return json.loads(value)
+        if value in ("true", "false"):
+            return value == "true"
+        if value == "null":
+            return None
+        return Enum(value)
+
+
+def parse_query(text: str) -> Operation:
+    """
+    Function to parse a GraphQL query.
+    """
+
+    return _Parser(text).parse_operation()
+
+
+def resolve_value(value: Any, variables: dict[str, Any] | None) -> Any:
+    """
+    Function to substitute the variables in an argument value.
+    """
+
+    if isinstance(value, Variable):
+        return (variables or {}).get(value.name)
+    if isinstance(value, list):
+        return [resolve_value(item, variables) for item in value]
+    if isinstance(value, dict):
+        return {key: resolve_value(item, variables) for key, item in value.items()}
+    if isinstance(value, Enum):
+        return str(value)
+    return value
+
+
+def print_value(value: Any) -> str:
+    """
+    Function to print an argument value back to GraphQL.
+    """
+
+    if isinstance(value, Variable):
+        return f"${value.name}"
+    if isinstance(value, Enum):
+        return str(value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "null"
+    if isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, list):
+        return f"[{', '.join(print_value(item) for item in value)}]"
+    if isinstance(value, dict):
+        items = ", ".join(f"{key}: {print_value(item)}" for key, item in value.items())
+        return f"{{{items}}}"
+    return str(value)
+
+
+def print_fields(fields: list[Field], indent: int = 1) -> str:
+    """
+    Function to print a selection set, one field per line.
+    """
+
+    pad = "  " * indent
+    lines = []
+    for field in fields:
+        line = f"{pad}{field.alias}: {field.name}" if field.alias else pad + field.name
+        if field.arguments:
+            arguments = ", ".join(
+                f"{key}: {print_value(value)}" for key, value in field.arguments.items()
+            )
+            line += f"({arguments})"
+        if field.selections:
+            line += " {\n" + print_fields(field.selections, indent + 1) + f"\n{pad}}}"
+        lines.append(line)
+
+    return "\n".join(lines)
+
+
+def print_query(operation: Operation) -> str:
+    """
+    Function to print an operation back to a GraphQL query.
+    """
+
+    header = operation.operation_type
+    if operation.name:
+        header += f" {operation.name}"
+    if operation.variables:
+        definitions = ", ".join(
+            f"${name}: {var_type}" for name, var_type in operation.variables
+        )
+        header += f" ({definitions})"
+
+    return f"{header} {{\n{print_fields(operation.selections)}\n}}\n"
+
+
+def rename_variables(value: Any, prefix: str) -> Any:
+    """
+    Function to prefix the variable references in an argument value.
+    """
+
+    if isinstance(value, Variable):
+        return Variable(f"{prefix}{value.name}")
+    if isinstance(value, list):
+        return [rename_variables(item, prefix) for item in value]
+    if isinstance(value, dict):
+        return {key: rename_variables(item, prefix) for key, item in value.items()}
+    return value
@@ -0,0 +1,105 @@
+"""
+Functions to decode subgraph pages into column buffers.
+"""
+
+import json
+from functools import lru_cache
+from typing import Any
+import numpy as np
+import pandas as pd
+from config import constants
+
+# use the faster json parser when it is installed
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def loads(content: bytes | str) -> Any:
+    """
+    Function to decode a json response, with orjson when available.
+    """
+
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+@lru_cache(maxsize=8)
+def _field_dtypes(version: str | None) -> dict[str, np.dtype]:
+    """
+    Function to get the numpy dtypes of the int64 and float64 fields
+    declared in `FIELD_TYPES` for a version, only the timestamp without one.
+    """
+
+    if version is None:
+        return {"timestamp": np.dtype(np.int64)}
+
+    return {
+        field: np.dtype(type_name)
+        for type_name, fields in constants.FIELD_TYPES[version].items()
+        if type_name in ("int64", "float64")
+        for field in fields
+    }
+
+
+def decode_page(
+    records: list[dict], version: str | None = None
+) -> dict[str, np.ndarray]:
+    """
+    Function to decode the records of one page into preallocated column
+    buffers, one per field.
+
+    The fields of the records declared int64 or float64 for the `version`,
+    e.g. the timestamp and the BigDecimal amounts, are parsed into typed
+    buffers in the same pass; without a version only the timestamp is.
+    A declared field null or missing in a record, or not parsed, is kept
+    in an object buffer like the other fields, filled with None where it
+    is missing. The nested pair/pool/token/transaction objects are kept as
+    they are for `unwrap_df`, and their fields parsed by `parse_events`.
+    """
+
+    # columns in order of first appearance across the page
+    columns = list(dict.fromkeys(key for record in records for key in record))
+    dtypes = _field_dtypes(version)
+
+    batch = {}
+    for column in columns:
+        values = [record.get(column) for record in records]
+        dtype = dtypes.get(column)
+        if dtype is not None and None not in values:
+            try:
+                batch[column] = np.array(values, dtype=dtype)
+                continue
+            except (ValueError, TypeError, OverflowError):
+                # e.g. a BigInt past int64: parsed later from its strings
+                pass
+        buffer = np.empty(len(records), dtype=object)
+        buffer[:] = values
+        batch[column] = buffer
+
+    return batch
+
+
+def concat_batches(batches: list[dict[str, np.ndarray]]) -> pd.DataFrame:
+    """
+    Function to build one dataframe from the column batches of all the pages.
+    """
+
+    batches = [batch for batch in batches if batch]
+    if not batches:
+        return pd.DataFrame()
+
+    columns = list(dict.fromkeys(column for batch in batches for column in batch))
+    lengths = [len(next(iter(batch.values()))) for batch in batches]
+
+    data = {}
+    for column in columns:
+        parts = [
+            batch[column] if column in batch else np.full(length, None, dtype=object)
+            for batch, length in zip(batches, lengths)
+        ]
+        data[column] = np.concatenate(parts)
+
+    return pd.DataFrame(data, copy=False)
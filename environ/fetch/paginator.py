@@ -0,0 +1,401 @@
+"""
+Lossless pagination of the subgraph events on a (timestamp, id) or
+(block, id) cursor.
+"""
+
+from functools import lru_cache
+from typing import Any, Iterator
+import environ.fetch.subgraph_query as subgraph
+from environ.fetch.graphql_parser import (
+    Enum,
+    Field,
+    Operation,
+    Variable,
+    parse_query,
+    print_query,
+)
+
+# filters of the event queries replaced by the cursor filters
+_TIMESTAMP_FILTERS = ["timestamp", "timestamp_gt", "timestamp_gte", "timestamp_lt"]
+
+
+def _cursor_field(
+    query_scripts: str, alias: str | None, where: dict, order_by: str
+) -> Field:
+    """
+    Function to get the root field of an event query with the cursor filters.
+    """
+
+    root = parse_query(query_scripts).selections[0]
+
+    # keep the other filters of the query, if any
+    other_filters = {
+        key: value
+        for key, value in (root.arguments.get("where") or {}).items()
+        if key not in _TIMESTAMP_FILTERS
+    }
+    root.alias = alias
+    root.arguments = {
+        **root.arguments,
+        "orderBy": Enum(order_by),
+        "orderDirection": Enum("asc"),
+        "where": {**other_filters, **where},
+    }
+
+    return root
+
+
+@lru_cache(maxsize=64)
+def paginated_queries(query_scripts: str) -> tuple[str, str, str, int]:
+    """
+    Function to derive the two queries of the paginator from an event query:
+
+    - the scan query pages the events of `(timestamp_gt, timestamp_lt)`
+      ordered by timestamp, ties broken by id as graph-node does;
+    - the resume query follows a full page: its `drain` field pages the rest
+      of the last second of the page with `id_gt` ordered by id, and its
+      `scan` field the seconds after it, in the same request.
+
+    Returns the scan query, the resume query, the entity and the page size.
+    """
+
+    scan = _cursor_field(
+        query_scripts,
+        None,
+        {
+            "timestamp_gt": Variable("timestamp_gt"),
+            "timestamp_lt": Variable("timestamp_lt"),
+        },
+        "timestamp",
+    )
+    drain = _cursor_field(
+        query_scripts,
+        "drain",
+        {"timestamp": Variable("timestamp"), "id_gt": Variable("id_gt")},
+        "id",
+    )
+    resume_scan = _cursor_field(
+        query_scripts,
+        "scan",
+        {
+            "timestamp_gt": Variable("timestamp"),
+            "timestamp_lt": Variable("timestamp_lt"),
+        },
+        "timestamp",
+    )
+
+    scan_query = print_query(
+        Operation(
+            "query", None, [("timestamp_gt", "Int!"), ("timestamp_lt", "Int!")], [scan]
+        )
+    )
+    resume_query = print_query(
+        Operation(
+            "query",
+            None,
+            [("timestamp", "Int!"), ("id_gt", "ID!"), ("timestamp_lt", "Int!")],
+            [drain, resume_scan],
+        )
+    )
+
+    return scan_query, resume_query, scan.key, int(scan.arguments.get("first", 100))
+
+
+def _with_block_number(fields: list[Field]) -> list[Field]:
+    """
+    Function to add `transaction { blockNumber }` to the selection set of
+    an event, which the block cursor reads, if it is not fetched already.
+    """
+
+    for field in fields:
+        if field.name == "transaction" and field.selections:
+            if all(sub_field.name != "blockNumber" for sub_field in field.selections):
+                field.selections = [Field("blockNumber"), *field.selections]
+            return fields
+
+    return [*fields, Field("transaction", selections=[Field("blockNumber")])]
+
+
+@lru_cache(maxsize=64)
+def paginated_block_queries(query_scripts: str) -> tuple[str, str, str, int]:
+    """
+    Function to derive the two queries of the block paginator from an event
+    query, as `paginated_queries` does with the block number of the
+    transaction of the events in place of their timestamp:
+
+    - the scan query pages the events of `(block_gt, block_lt)` ordered by
+      block, ties broken by id;
+    - the resume query drains the rest of the last block of a full page
+      with `id_gt` and scans the blocks after it, in the same request.
+
+    Returns the scan query, the resume query, the entity and the page size.
+    """
+
+    scan = _cursor_field(
+        query_scripts,
+        None,
+        {
+            "transaction_": {
+                "blockNumber_gt": Variable("block_gt"),
+                "blockNumber_lt": Variable("block_lt"),
+            }
+        },
+        "transaction__blockNumber",
+    )
+    drain = _cursor_field(
+        query_scripts,
+        "drain",
+        {
+            "transaction_": {"blockNumber": Variable("block")},
+            "id_gt": Variable("id_gt"),
+        },
+        "id",
+    )
+    resume_scan = _cursor_field(
+        query_scripts,
+        "scan",
+        {
+            "transaction_": {
+                "blockNumber_gt": Variable("block"),
+                "blockNumber_lt": Variable("block_lt"),
+            }
+        },
+        "transaction__blockNumber",
+    )
+    for root in (scan, drain, resume_scan):
+        root.selections = _with_block_number(root.selections)
+
+    scan_query = print_query(
+        Operation(
+            "query", None, [("block_gt", "BigInt!"), ("block_lt", "BigInt!")], [scan]
+        )
+    )
+    resume_query = print_query(
+        Operation(
+            "query",
+            None,
+            [("block", "BigInt!"), ("id_gt", "ID!"), ("block_lt", "BigInt!")],
+            [drain, resume_scan],
+        )
+    )
+
+    return scan_query, resume_query, scan.key, int(scan.arguments.get("first", 100))
+
+
+class Paginator:
+    """
+    Forward scan over the events of `(start_timestamp_gt, end_timestamp_lt)`
+    with no gaps and no duplicates.
+
+    The cursor is the (timestamp, id) of the last event returned. After a
+    full page, the next request drains the rest of its last second with
+    `id_gt` and scans the seconds after it, so seconds shared by two pages,
+    or holding more events than a page, are fetched whole and only once,
+    still one request per page.
+
+    The paginator is steppable: `next_request` gives the query to run and
+    `advance` consumes its page, so the same cursor logic serves the sync,
+    async and batched fetchers. The cursor is a plain dict that can be saved
+    and restored, and `end_timestamp_lt` may be lowered while paging.
+    """
+
+    def __init__(
+        self,
+        http: str,
+        query_scripts: str,
+        start_timestamp_gt: int,
+        end_timestamp_lt: int,
+        cursor: dict[str, Any] | None = None,
+    ) -> None:
+        self.http = http
+        self.scan_query, self.resume_query, self.entity, self.page_size = self.queries(
+            query_scripts
+        )
+        self.end_timestamp_lt = end_timestamp_lt
+        self.pages = 0
+
+        # the timestamp of the cursor and the id of the last event returned
+        # in that second, None once the second is complete
+        self.timestamp = start_timestamp_gt
+        self.last_id: str | None = None
+        self.done = False
+        if cursor is not None:
+            self.cursor = cursor
+
+    @staticmethod
+    def queries(query_scripts: str) -> tuple[str, str, str, int]:
+        """
+        Scan and resume queries, entity and page size of an event query.
+        """
+
+        return paginated_queries(query_scripts)
+
+    @staticmethod
+    def position(event: dict) -> int:
+        """
+        Position of an event on the cursor.
+        """
+
+        return int(event["timestamp"])
+
+    @property
+    def cursor(self) -> dict[str, Any]:
+        """
+        Serializable state of the paginator.
+        """
+
+        return {
+            "timestamp": self.timestamp,
+            "id": self.last_id,
+            "end": self.end_timestamp_lt,
+            "done": self.done,
+        }
+
+    @cursor.setter
+    def cursor(self, cursor: dict[str, Any]) -> None:
+        self.timestamp = int(cursor["timestamp"])
+        self.last_id = cursor["id"]
+        self.end_timestamp_lt = int(cursor["end"])
+        self.done = bool(cursor["done"])
+
+    def next_request(self) -> tuple[str, dict[str, Any]]:
+        """
+        Query and variables of the next page.
+        """
+
+        # finish the second cut by the end of the previous page, then go on
+        if self.last_id is not None:
+            return self.resume_query, {
+                "timestamp": self.timestamp,
+                "id_gt": self.last_id,
+                "timestamp_lt": self.end_timestamp_lt,
+            }
+
+        return self.scan_query, {
+            "timestamp_gt": self.timestamp,
+            "timestamp_lt": self.end_timestamp_lt,
+        }
+
+    def advance(self, data: dict[str, list[dict]]) -> list[dict]:
+        """
+        Move the cursor past the `data` of the response to `next_request`
+        and return the events of the page within the window.
+        """
+
+        self.pages += 1
+        if self.last_id is not None:
+            drained, scanned = data["drain"], data["scan"]
+
+            # the second holds more events than a page: keep draining it
+            if len(drained) >= self.page_size:
+                self.last_id = drained[-1]["id"]
+                return drained
+        else:
+            drained, scanned = [], data[self.entity]
+
+        if len(scanned) >= self.page_size:
+            # full scanned page: its last second may continue on the next page
+            self.timestamp = self.position(scanned[-1])
+            self.last_id = scanned[-1]["id"]
+        else:
+            # short scanned page: the window is covered
+            self.last_id = None
+            self.done = True
+
+        # the end may have been lowered while the page was in flight
+        if self.timestamp >= self.end_timestamp_lt:
+            self.done = True
+        return drained + [
+            event for event in scanned if self.position(event) < self.end_timestamp_lt
+        ]
+
+    def step(self) -> list[dict]:
+        """
+        Fetch the next page with the shared subgraph client.
+        """
+
+        query_scripts, params = self.next_request()
+        result = subgraph.run_query_var(self.http, query_scripts, params)
+
+        return self.advance(result["data"])
+
+    def __iter__(self) -> Iterator[list[dict]]:
+        while not self.done:
+            yield self.step()
+
+
+class BlockPaginator(Paginator):
+    """
+    Forward scan over the events mined in the blocks
+    `(start_block_gt, end_block_lt)`, on a (block, id) cursor.
+
+    The cursor logic is the one of `Paginator`, whose `timestamp` and
+    `end_timestamp_lt` hold block numbers here. Blocks are evenly spaced
+    in time, so block ranges give slices of even width, and the order of
+    the events does not depend on the timestamps of the subgraph.
+
+    A block range covers whole blocks, so the events can be limited to the
+    timestamps `[window[0], window[1])` of a time window, see `BlockIndex`.
+    """
+
+    def __init__(
+        self,
+        http: str,
+        query_scripts: str,
+        start_block_gt: int,
+        end_block_lt: int,
+        cursor: dict[str, Any] | None = None,
+        window: tuple[int, int] | None = None,
+    ) -> None:
+        super().__init__(http, query_scripts, start_block_gt, end_block_lt, cursor)
+        self.window = window
+
+    @staticmethod
+    def queries(query_scripts: str) -> tuple[str, str, str, int]:
+        """
+        Scan and resume queries, entity and page size of an event query.
+        """
+
+        return paginated_block_queries(query_scripts)
+
+    @staticmethod
+    def position(event: dict) -> int:
+        """
+        Block number of an event.
+        """
+
+        return int(event["transaction"]["blockNumber"])
+
+    def next_request(self) -> tuple[str, dict[str, Any]]:
+        """
+        Query and variables of the next page.
+        """
+
+        # finish the block cut by the end of the previous page, then go on
+        if self.last_id is not None:
+            return self.resume_query, {
+                "block": self.timestamp,
+                "id_gt": self.last_id,
+                "block_lt": self.end_timestamp_lt,
+            }
+
+        return self.scan_query, {
+            "block_gt": self.timestamp,
+            "block_lt": self.end_timestamp_lt,
+        }
+
+    def advance(self, data: dict[str, list[dict]]) -> list[dict]:
+        """
+        Move the cursor past the `data` of the response to `next_request`
+        and return the events of the page within the blocks and the window.
+        """
+
+        events = super().advance(data)
+        if self.window is None:
+            return events
+
+        return [
+            event
+            for event in events
+            if self.window[0] <= int(event["timestamp"]) < self.window[1]
+        ]
@@ -0,0 +1,193 @@
+"""
+Functions to build projected subgraph queries from a declared column set.
+"""
+
+from functools import lru_cache
+from config import constants
+from environ.fetch.event_registry import get_event, version_events
+from environ.fetch.graphql_parser import (
+    Enum,
+    Field,
+    Operation,
+    Variable,
+    parse_query,
+    print_query,
+)
+
+# query profiles of the event queries
+PROFILES = ["full", "panel-minimal", "normalized"]
+
+# columns always fetched since the pagination and the dedup rely on them
+REQUIRED_COLUMNS = ["id", "timestamp"]
+
+
+def _column_names(fields: list[Field], prefix: str = "") -> list[str]:
+    """
+    Function to flatten a selection set into the column names
+    produced by `unwrap_df`, e.g. `pair { token0 { id } }` -> `pair_token0_id`.
+    """
+
+    columns = []
+    for field in fields:
+        name = f"{prefix}{field.key}"
+        if field.selections:
+            columns.extend(_column_names(field.selections, f"{name}_"))
+        else:
+            columns.append(name)
+
+    return columns
+
+
+def query_columns(query_scripts: str) -> list[str]:
+    """
+    Function to list the flattened columns fetched by an event query.
+    """
+
+    root = parse_query(query_scripts).selections[0]
+
+    return _column_names(root.selections)
+
+
+def project_fields(
+    fields: list[Field], columns: set[str], prefix: str = ""
+) -> list[Field]:
+    """
+    Function to keep only the fields of a selection set whose flattened
+    column is in `columns`; nested objects are kept if any of their
+    fields are.
+    """
+
+    projected = []
+    for field in fields:
+        name = f"{prefix}{field.key}"
+        if field.selections:
+            selections = project_fields(field.selections, columns, f"{name}_")
+            if selections:
+                projected.append(
+                    Field(field.name, field.alias, field.arguments, selections)
+                )
+        elif name in columns:
+            projected.append(field)
+
+    return projected
+
+
+@lru_cache(maxsize=64)
+def build_query(query_scripts: str, columns: tuple[str, ...]) -> str:
+    """
+    Function to build the projection of an event query on a column set,
+    keeping the variables, arguments and field order of the query.
+    """
+
+    # check the columns against the fields of the full query
+    unknown = sorted(set(columns) - set(query_columns(query_scripts)))
+    if unknown:
+        raise ValueError(f"Columns not in the query: {unknown}")
+
+    # project the selection set of the root field
+    operation = parse_query(query_scripts)
+    root = operation.selections[0]
+    root.selections = project_fields(
+        root.selections, set(columns) | set(REQUIRED_COLUMNS)
+    )
+
+    return print_query(operation)
+
+
+def normalize_fields(fields: list[Field], dimensions: dict[str, str]) -> list[Field]:
+    """
+    Function to replace the nested dimension objects of a selection set
+    by their id, e.g. `pair { id reserve0 }` -> `pair { id }`.
+    """
+
+    return [
+        (
+            Field(field.name, field.alias, field.arguments, [Field("id")])
+            if field.selections and field.name in dimensions
+            else field
+        )
+        for field in fields
+    ]
+
+
+@lru_cache(maxsize=64)
+def normalize_query(query_scripts: str, version: str) -> str:
+    """
+    Function to build the normalized version of an event query, which
+    keeps the event fields and only the ids of the dimension objects.
+    """
+
+    operation = parse_query(query_scripts)
+    root = operation.selections[0]
+    root.selections = normalize_fields(
+        root.selections, constants.DIMENSION_FIELDS[version]
+    )
+
+    return print_query(operation)
+
+
+def dimension_fields(version: str) -> dict[str, list[Field]]:
+    """
+    Function to collect the fields of each dimension of a version from the
+    nested objects of its event queries, in order of first appearance.
+    Nested dimensions of a dimension are reduced to their id.
+    """
+
+    dimensions = constants.DIMENSION_FIELDS[version]
+    collected: dict[str, dict[str, Field]] = {}
+
+    def _collect(fields: list[Field]) -> None:
+        for field in fields:
+            if not field.selections:
+                continue
+            if field.name in dimensions:
+                known = collected.setdefault(dimensions[field.name], {})
+                for sub_field in normalize_fields(field.selections, dimensions):
+                    known.setdefault(sub_field.key, sub_field)
+            _collect(field.selections)
+
+    for spec in version_events(version):
+        _collect(parse_query(spec.query_scripts).selections[0].selections)
+
+    return {dimension: list(fields.values()) for dimension, fields in collected.items()}
+
+
+@lru_cache(maxsize=16)
+def build_dimension_query(version: str, dimension: str) -> str:
+    """
+    Function to build the query of a batch of a dimension table by ids.
+    """
+
+    root = Field(
+        dimension,
+        arguments={
+            "first": constants.DIMENSION_BATCH_SIZE,
+            "orderBy": Enum("id"),
+            "where": {"id_in": Variable("ids")},
+        },
+        selections=dimension_fields(version)[dimension],
+    )
+
+    return print_query(Operation("query", None, [("ids", "[ID!]!")], [root]))
+
+
+def get_query(version: str, entity: str, profile: str | None = None) -> str:
+    """
+    Function to get the query of an entity for a profile,
+    by default the `QUERY_PROFILE` of the constants.
+    """
+
+    profile = profile or constants.QUERY_PROFILE
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown query profile {profile!r}")
+
+    # the full query is the one of the constants as it is
+    query_scripts = get_event(version, entity).query_scripts
+    if profile == "full":
+        return query_scripts
+    if profile == "normalized":
+        return normalize_query(query_scripts, version)
+
+    if (version, entity) not in constants.PANEL_COLUMNS:
+        raise ValueError(f"The panel does not use the {version} {entity}")
+    return build_query(query_scripts, tuple(constants.PANEL_COLUMNS[(version, entity)]))
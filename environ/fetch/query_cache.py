@@ -0,0 +1,220 @@
+"""
+Content-addressed on-disk cache of the subgraph query responses.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future
+from typing import Callable
+from config import constants
+from environ.fetch.page_decoder import loads
+
+
+def make_key(http: str, query_scripts: str, var: dict | None) -> str:
+    """
+    Function to compute the cache key of a query from the endpoint,
+    the hash of the query text and the variables.
+    """
+
+    query_hash = hashlib.sha256(query_scripts.encode()).hexdigest()
+    content = json.dumps([http, query_hash, var], sort_keys=True)
+
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class QueryCache:
+    """
+    Gzip-compressed response cache with a size cap and LRU eviction.
+
+    Entries live under `root/<key[:2]>/<key>.json.gz`; the modification time
+    of an entry is refreshed on every hit and the least recently used entries
+    are evicted once the cache grows beyond `max_bytes`. Concurrent requests
+    for the same key are coalesced into a single fetch.
+    """
+
+    def __init__(
+        self,
+        root: str = constants.CACHE_PATH,
+        max_bytes: int = constants.CACHE_MAX_BYTES,
+    ) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evicted": 0}
+
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+        self._size: int | None = None
+
+    def _path(self, key: str) -> str:
+        """
+        Path of the entry of a key.
+        """
+
+        return os.path.join(self.root, key[:2], f"{key}.json.gz")
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        """
+        List the (mtime, size, path) of all the entries.
+        """
+
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if not filename.endswith(".json.gz"):
+                    continue
+                file_path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(file_path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, file_path))
+
+        return entries
+
+    def get(self, key: str) -> dict | None:
+        """
+        Return the cached response of a key, or None on a miss.
+        """
+
+        file_path = self._path(key)
+        try:
+            with gzip.open(file_path, "rb") as file:
+                entry = loads(file.read())
+            # mark the entry as recently used
+            os.utime(file_path)
+        except (FileNotFoundError, EOFError, OSError, ValueError):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+
+        with self._lock:
+            self.stats["hits"] += 1
+        return entry["result"]
+
+    def put(self, key: str, result: dict, meta: dict | None = None) -> None:
+        """
+        Store the response of a key and evict old entries if needed. An
+        entry that cannot be written is skipped, the response is still
+        returned to the fetcher.
+        """
+
+        file_path = self._path(key)
+        tmp_path = f"{file_path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+            # size of the entry replaced, if any
+            try:
+                replaced = os.stat(file_path).st_size
+            except FileNotFoundError:
+                replaced = 0
+
+            # write to a temporary file first so readers never see partial entries
+            content = gzip.compress(
+                json.dumps({**(meta or {}), "result": result}).encode()
+            )
+            with open(tmp_path, "wb") as file:
+                file.write(content)
+            os.replace(tmp_path, file_path)
+        except OSError as exc:
+            # info message
+            print(f"Response of {key} not cached: {exc}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(content) - replaced
+            over_cap = self._size > self.max_bytes
+
+        if over_cap:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used entries until the cache
+        is back under 90% of its size cap.
+        """
+
+        with self._lock:
+            entries = sorted(self._entries())
+            size = sum(entry_size for _, entry_size, _ in entries)
+            for _, entry_size, file_path in entries:
+                if size <= 0.9 * self.max_bytes:
+                    break
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+                size -= entry_size
+                self.stats["evicted"] += 1
+            self._size = size
+
+    def get_or_fetch(
+        self, key: str, fetch: Callable[[], dict], meta: dict | None = None
+    ) -> dict:
+        """
+        Return the cached response of a key or fetch and store it.
+        Identical concurrent requests wait for the first one instead of
+        fetching the same response again.
+        """
+
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+
+        # another thread is already fetching this key
+        if not leader:
+            return future.result()
+
+        try:
+            result = fetch()
+        except BaseException as exc:
+            future.set_exception(exc)
+            with self._lock:
+                del self._inflight[key]
+            raise
+
+        # keep the key in flight until the entry is written
+        future.set_result(result)
+        try:
+            self.put(key, result, meta)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+        return result
+
+
+_CACHE: QueryCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> QueryCache | None:
+    """
+    Return the process-wide cache, or None if caching is disabled.
+    """
+
+    global _CACHE  # pylint: disable=global-statement
+    if not constants.CACHE_ENABLED:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = QueryCache()
+        return _CACHE
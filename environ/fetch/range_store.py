@@ -0,0 +1,207 @@
+"""
+Store of the fetched events with an index of the time ranges covered.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Iterable, Iterator
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from config import constants
+from environ.fetch.page_decoder import loads
+from environ.fetch.schema import cast_table, csv_dtypes, table_frame
+from environ.fetch.sinks import ParquetSink
+
+# the index of a store is updated by one thread at a time
+_INDEX_LOCK = threading.Lock()
+
+
+def merge_intervals(intervals: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    Function to merge overlapping or adjacent [start, end) intervals.
+    """
+
+    merged: list[tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+def missing_intervals(
+    start: int, end: int, covered: list[tuple[int, int]]
+) -> list[tuple[int, int]]:
+    """
+    Function to list the parts of [start, end) not in the covered intervals.
+    """
+
+    missing = []
+    for covered_start, covered_end in merge_intervals(covered):
+        if covered_end <= start or covered_start >= end:
+            continue
+        if covered_start > start:
+            missing.append((start, covered_start))
+        start = max(start, covered_end)
+    if start < end:
+        missing.append((start, end))
+
+    return missing
+
+
+class RangeStore:
+    """
+    Events of one (endpoint, entity, query) stored by fetched time range.
+
+    Each fetched range [start, end) is a Parquet chunk
+    `<start>_<end>.parquet`, and `coverage.json` lists the chunks. A chunk is
+    listed only after it is written, so the index never covers events that
+    are not stored, and an empty range is listed without a chunk. The CSV
+    chunks `<start>_<end>.csv`, and the Parquet chunks of strings, of the
+    earlier stores are still read, with the declared types of the version.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        entity: str,
+        http: str,
+        query_scripts: str,
+        root: str = constants.RANGE_STORE_PATH,
+    ) -> None:
+        self.version = version
+        key_hash = hashlib.sha256(f"{http}\n{query_scripts}".encode()).hexdigest()
+        self.path = os.path.join(root, f"{version}_{entity}_{key_hash[:12]}")
+
+    @property
+    def index_path(self) -> str:
+        """
+        Path of the coverage index.
+        """
+
+        return os.path.join(self.path, "coverage.json")
+
+    def _chunk_path(self, start: int, end: int, extension: str = "parquet") -> str:
+        """
+        Path of the chunk of a range.
+        """
+
+        return os.path.join(self.path, f"{start}_{end}.{extension}")
+
+    def _iter_chunk(self, start: int, end: int) -> Iterator[pd.DataFrame]:
+        """
+        Yield the events of the chunk of a range in frames of at most
+        `STREAM_CHUNK_ROWS` rows, none if the range has no events.
+        """
+
+        chunk_path = self._chunk_path(start, end)
+        if os.path.exists(chunk_path):
+            for batch in pq.ParquetFile(chunk_path).iter_batches(
+                batch_size=constants.STREAM_CHUNK_ROWS
+            ):
+                yield table_frame(
+                    cast_table(self.version, pa.Table.from_batches([batch]))
+                )
+            return
+
+        # chunk of an earlier store
+        chunk_path = self._chunk_path(start, end, "csv")
+        if os.path.exists(chunk_path):
+            columns = list(pd.read_csv(chunk_path, nrows=0).columns)
+            yield from pd.read_csv(
+                chunk_path,
+                dtype=csv_dtypes(self.version, columns),
+                chunksize=constants.STREAM_CHUNK_ROWS,
+            )
+
+    def chunks(self) -> list[tuple[int, int]]:
+        """
+        Return the ranges stored, in the order they were fetched.
+        """
+
+        try:
+            with open(self.index_path, "rb") as file:
+                return [tuple(chunk) for chunk in loads(file.read())["chunks"]]
+        except FileNotFoundError:
+            return []
+
+    def covered(self) -> list[tuple[int, int]]:
+        """
+        Return the merged time ranges already fetched.
+        """
+
+        return merge_intervals(self.chunks())
+
+    def missing(self, start: int, end: int) -> list[tuple[int, int]]:
+        """
+        Return the parts of [start, end) still to fetch.
+        """
+
+        return missing_intervals(start, end, self.covered())
+
+    def put(self, start: int, end: int, frames: Iterable[pd.DataFrame]) -> None:
+        """
+        Store the events of the range [start, end), frame by frame as they
+        are fetched, and index it.
+        """
+
+        os.makedirs(self.path, exist_ok=True)
+
+        # write the chunk, if any events, before it is indexed
+        with ParquetSink(self._chunk_path(start, end)) as sink:
+            for df_frame in frames:
+                sink.write(df_frame)
+
+        with _INDEX_LOCK:
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump({"chunks": self.chunks() + [(start, end)]}, file)
+            os.replace(tmp_path, self.index_path)
+
+    def iter_read(self, start: int, end: int) -> Iterator[pd.DataFrame]:
+        """
+        Yield the stored events of [start, end) in timestamp order, in
+        frames of at most `STREAM_CHUNK_ROWS` rows, with the declared types
+        of the version.
+        """
+
+        for chunk_start, chunk_end in sorted(self.chunks()):
+            if chunk_end <= start or chunk_start >= end:
+                continue
+
+            # the chunks are disjoint, so every event is read once
+            for df_chunk in self._iter_chunk(chunk_start, chunk_end):
+                df_chunk = df_chunk[
+                    (df_chunk["timestamp"] >= start) & (df_chunk["timestamp"] < end)
+                ]
+                if not df_chunk.empty:
+                    yield df_chunk
+
+    def read(self, start: int, end: int) -> pd.DataFrame:
+        """
+        Return the stored events of [start, end), see `iter_read`.
+        """
+
+        frames = list(self.iter_read(start, end))
+        if not frames:
+            return pd.DataFrame()
+
+        return pd.concat(frames, ignore_index=True)
+
+
+def get_range_store(
+    version: str, entity: str, http: str, query_scripts: str
+) -> RangeStore | None:
+    """
+    Return the range store of an event query, or None if it is disabled.
+    """
+
+    if not constants.RANGE_STORE_ENABLED:
+        return None
+
+    return RangeStore(version, entity, http, query_scripts, constants.RANGE_STORE_PATH)
@@ -0,0 +1,142 @@
+"""
+Declared schema of the events and dimension tables of each version.
+"""
+
+from functools import lru_cache
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from config import constants
+
+# arrow types of the declared field types
+_ARROW_TYPES = {"int64": pa.int64(), "float64": pa.float64(), "bool": pa.bool_()}
+
+# pandas dtypes of the arrow types, nullable for the integers and booleans
+_PANDAS_DTYPES = {pa.int64(): pd.Int64Dtype(), pa.bool_(): pd.BooleanDtype()}
+
+# dtypes of `pd.read_csv` for the arrow types
+_CSV_DTYPES = {
+    pa.int64(): "Int64",
+    pa.float64(): "float64",
+    pa.bool_(): "boolean",
+    pa.string(): "str",
+}
+
+
+def column_type(version: str, column: str) -> pa.DataType:
+    """
+    Function to get the declared type of a column of the unwrapped data,
+    the type of its leaf field, e.g. `reserve0` for `pair_reserve0`.
+    """
+
+    field = column.rsplit("_", 1)[-1]
+    for type_name, fields in constants.FIELD_TYPES[version].items():
+        if field in fields:
+            return _ARROW_TYPES[type_name]
+
+    return pa.string()
+
+
+@lru_cache(maxsize=256)
+def _event_schema(version: str, columns: tuple[str, ...]) -> pa.Schema:
+    """
+    Function to build the schema of the columns once per process.
+    """
+
+    return pa.schema([(column, column_type(version, column)) for column in columns])
+
+
+def event_schema(version: str, columns: list[str]) -> pa.Schema:
+    """
+    Function to get the declared schema of the columns of the unwrapped
+    events or dimension rows of a version.
+    """
+
+    return _event_schema(version, tuple(columns))
+
+
+def _array(values: pd.Series, data_type: pa.DataType) -> pa.Array:
+    """
+    Function to convert a column into an arrow array of its declared type,
+    parsing the strings of the subgraph in one vectorized cast.
+    """
+
+    try:
+        array = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # mixed values, e.g. numbers and strings
+        array = pa.array(values.map(str, na_action="ignore"), from_pandas=True)
+
+    if array.type == data_type:
+        return array
+    try:
+        return pc.cast(array, data_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as exc:
+        raise ValueError(
+            f"Column {values.name!r} does not match its type {data_type}: {exc}"
+        ) from exc
+
+
+def frame_table(df_frame: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """
+    Function to convert a frame into an arrow table of a schema, with the
+    missing columns null.
+    """
+
+    df_frame = df_frame.reindex(columns=schema.names)
+
+    return pa.Table.from_arrays(
+        [_array(df_frame[field.name], field.type) for field in schema],
+        schema=schema,
+    )
+
+
+def table_frame(table: pa.Table) -> pd.DataFrame:
+    """
+    Function to convert an arrow table into a frame, with nullable integers
+    and booleans.
+    """
+
+    return table.to_pandas(types_mapper=_PANDAS_DTYPES.get)
+
+
+def typed_frame(df_frame: pd.DataFrame, schema: pa.Schema) -> pd.DataFrame:
+    """
+    Function to parse a frame of the strings of the subgraph into the
+    types of a schema.
+    """
+
+    return table_frame(frame_table(df_frame, schema))
+
+
+def cast_table(version: str, table: pa.Table) -> pa.Table:
+    """
+    Function to cast a table to the declared types of its columns, e.g. a
+    table saved with the strings of the subgraph.
+    """
+
+    return table.cast(event_schema(version, table.column_names))
+
+
+def csv_dtypes(version: str, columns: list[str]) -> dict[str, str]:
+    """
+    Function to get the `dtype` of `pd.read_csv` for the declared types of
+    the columns of a version.
+    """
+
+    return {
+        field.name: _CSV_DTYPES[field.type] for field in event_schema(version, columns)
+    }
+
+
+def read_csv(
+    version: str, file_path: str, usecols: list[str] | None = None
+) -> pd.DataFrame:
+    """
+    Function to read a CSV file of a version with the declared types of its
+    columns, or of `usecols` only.
+    """
+
+    columns = usecols or list(pd.read_csv(file_path, nrows=0).columns)
+
+    return pd.read_csv(file_path, usecols=usecols, dtype=csv_dtypes(version, columns))
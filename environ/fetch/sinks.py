@@ -0,0 +1,172 @@
+"""
+Sinks writing the fetched events to disk frame by frame.
+"""
+
+import os
+from abc import ABC, abstractmethod
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from config import constants
+from environ.fetch.schema import frame_table
+
+
+class Sink(ABC):
+    """
+    File written frame by frame, taking its name once complete.
+    """
+
+    @abstractmethod
+    def write(self, df_frame: pd.DataFrame) -> None:
+        """
+        Append the rows of a frame.
+        """
+
+    @abstractmethod
+    def close(self) -> int:
+        """
+        Move the file to its name and return the number of rows written.
+        """
+
+    @abstractmethod
+    def abort(self) -> None:
+        """
+        Remove the partial file.
+        """
+
+    def __enter__(self) -> "Sink":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class CsvSink(Sink):
+    """
+    CSV file written in chunks, so only one frame is held in memory.
+
+    The frames are appended to a temporary file under the columns of the
+    sink, the `columns` given or those of the first frame, and the file
+    takes its name on `close`. A sink closed without rows writes only the
+    header if the columns are known, and nothing otherwise.
+    """
+
+    def __init__(self, file_path: str, columns: list[str] | None = None) -> None:
+        self.file_path = file_path
+        self.tmp_path = f"{file_path}.tmp"
+        self.columns = columns
+        self.rows = 0
+        self._started = False
+
+    def write(self, df_frame: pd.DataFrame) -> None:
+        """
+        Append the rows of a frame.
+        """
+
+        if df_frame.empty:
+            return
+        if self.columns is None:
+            self.columns = list(df_frame.columns)
+
+        df_frame.reindex(columns=self.columns).to_csv(
+            self.tmp_path,
+            mode="a" if self._started else "w",
+            header=not self._started,
+            index=False,
+        )
+        self._started = True
+        self.rows += len(df_frame)
+
+    def close(self) -> int:
+        """
+        Move the file to its name and return the number of rows written.
+        """
+
+        if not self._started:
+            if self.columns is None:
+                return 0
+            pd.DataFrame(columns=self.columns).to_csv(self.tmp_path, index=False)
+        os.replace(self.tmp_path, self.file_path)
+
+        return self.rows
+
+    def abort(self) -> None:
+        """
+        Remove the partial file.
+        """
+
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class ParquetSink(Sink):
+    """
+    Parquet file written one row group per frame, so only one frame is held
+    in memory.
+
+    The frames are written under the `schema` of the sink, the one given or
+    that of the first frame, compressed with `PARQUET_COMPRESSION`, to a
+    temporary file that takes its name on `close`. A sink closed without
+    rows writes a file without rows if the schema is known, and nothing
+    otherwise.
+    """
+
+    def __init__(self, file_path: str, schema: pa.Schema | None = None) -> None:
+        self.file_path = file_path
+        self.tmp_path = f"{file_path}.tmp"
+        self.schema = schema
+        self.rows = 0
+        self._writer: pq.ParquetWriter | None = None
+
+    def _open(self) -> pq.ParquetWriter:
+        """
+        Open the writer of the temporary file on the first frame.
+        """
+
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(
+                self.tmp_path,
+                self.schema,
+                compression=constants.PARQUET_COMPRESSION,
+            )
+
+        return self._writer
+
+    def write(self, df_frame: pd.DataFrame) -> None:
+        """
+        Append the rows of a frame as a row group.
+        """
+
+        if df_frame.empty:
+            return
+        if self.schema is None:
+            self.schema = pa.Schema.from_pandas(df_frame, preserve_index=False)
+
+        writer = self._open()
+        writer.write_table(frame_table(df_frame, writer.schema))
+        self.rows += len(df_frame)
+
+    def close(self) -> int:
+        """
+        Move the file to its name and return the number of rows written.
+        """
+
+        if self._writer is None and self.schema is None:
+            return 0
+        self._open().close()
+        os.replace(self.tmp_path, self.file_path)
+
+        return self.rows
+
+    def abort(self) -> None:
+        """
+        Remove the partial file.
+        """
+
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
@@ -0,0 +1,531 @@
+"""
+Functions to page an event window in parallel time slices.
+"""
+
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Callable, Iterator
+from config import constants
+import environ.fetch.fetch_utils as utils
+from environ.fetch.paginator import Paginator, paginated_queries
+
+
+class DensityModel:
+    """
+    Events per second over fixed time buckets, learned from the pages.
+    With the block cursor the seconds are blocks.
+    """
+
+    def __init__(self, bucket: int = constants.DENSITY_BUCKET) -> None:
+        self.bucket = bucket
+        self.events: dict[int, float] = {}
+        self.seconds: dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, lo: int, hi: int, events: int) -> None:
+        """
+        Record `events` spread evenly over the seconds [lo, hi).
+        """
+
+        if hi <= lo:
+            return
+        rate = events / (hi - lo)
+        with self._lock:
+            for bucket in range(lo // self.bucket, (hi - 1) // self.bucket + 1):
+                overlap = min(hi, (bucket + 1) * self.bucket) - max(
+                    lo, bucket * self.bucket
+                )
+                self.events[bucket] = self.events.get(bucket, 0.0) + rate * overlap
+                self.seconds[bucket] = self.seconds.get(bucket, 0.0) + overlap
+
+    def _rate(self, bucket: int, observed: list[int]) -> float:
+        """
+        Rate of a bucket not observed yet, interpolated between the nearest
+        `observed` buckets, sorted, on each side.
+        """
+
+        index = bisect_left(observed, bucket)
+        if index == 0:
+            nearest = observed[0]
+        elif index == len(observed):
+            nearest = observed[-1]
+        else:
+            before, after = observed[index - 1], observed[index]
+            rate_before = self.events[before] / self.seconds[before]
+            rate_after = self.events[after] / self.seconds[after]
+            return rate_before + (rate_after - rate_before) * (bucket - before) / (
+                after - before
+            )
+
+        return self.events[nearest] / self.seconds[nearest]
+
+    def _segments(self, lo: int, hi: int) -> list[tuple[int, int, float]] | None:
+        """
+        (lo, hi, rate) of the buckets overlapping [lo, hi); the buckets not
+        observed yet get the rate interpolated from their neighbours. None if
+        nothing is observed.
+        """
+
+        with self._lock:
+            observed = sorted(
+                bucket for bucket, seconds in self.seconds.items() if seconds
+            )
+            if not observed:
+                return None
+
+            segments = []
+            for bucket in range(lo // self.bucket, (hi - 1) // self.bucket + 1):
+                seconds = self.seconds.get(bucket)
+                rate = (
+                    self.events[bucket] / seconds
+                    if seconds
+                    else self._rate(bucket, observed)
+                )
+                segments.append(
+                    (
+                        max(lo, bucket * self.bucket),
+                        min(hi, (bucket + 1) * self.bucket),
+                        rate,
+                    )
+                )
+
+        return segments
+
+    def expected(self, lo: int, hi: int) -> float | None:
+        """
+        Expected events in the seconds [lo, hi), None if nothing is observed.
+        """
+
+        if hi <= lo:
+            return 0.0
+        segments = self._segments(lo, hi)
+        if segments is None:
+            return None
+
+        return sum((seg_hi - seg_lo) * rate for seg_lo, seg_hi, rate in segments)
+
+    def quantiles(self, lo: int, hi: int, parts: int) -> list[int] | None:
+        """
+        Cut points splitting [lo, hi) into `parts` ranges of about the same
+        expected events, None if nothing is observed.
+        """
+
+        segments = self._segments(lo, hi)
+        if segments is None:
+            return None
+        total = sum((seg_hi - seg_lo) * rate for seg_lo, seg_hi, rate in segments)
+        if total <= 0:
+            return None
+
+        cuts, cumulative = [], 0.0
+        targets = [total * part / parts for part in range(1, parts)]
+        for seg_lo, seg_hi, rate in segments:
+            seg_events = (seg_hi - seg_lo) * rate
+            while targets and cumulative + seg_events >= targets[0] and rate > 0:
+                cuts.append(seg_lo + int((targets.pop(0) - cumulative) / rate))
+            cumulative += seg_events
+
+        # keep the cut points strictly inside the range and increasing
+        return sorted({cut for cut in cuts if lo < cut < hi})
+
+
+_MODELS: dict[tuple[str, str, str], DensityModel] = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def get_density_model(http: str, query_scripts: str) -> DensityModel:
+    """
+    Return the density model of the entity of a query on an endpoint and
+    the cursor of the `FETCH_MODE`, shared by all the fetches of the process.
+    """
+
+    key = (http, paginated_queries(query_scripts)[2], constants.FETCH_MODE)
+    with _MODELS_LOCK:
+        if key not in _MODELS:
+            _MODELS[key] = DensityModel()
+        return _MODELS[key]
+
+
+def plan_slices(
+    start: int,
+    end: int,
+    slices: int,
+    page_size: int,
+    model: DensityModel | None = None,
+) -> list[tuple[int, int]]:
+    """
+    Function to split [start, end) into time slices.
+
+    Without a density estimate the slices have the same width. With one,
+    they hold about the same expected events, and adjacent slices expected
+    to fill less than `SLICE_MIN_PAGES` pages are merged.
+    """
+
+    cuts = model.quantiles(start, end, slices) if model is not None else None
+    if cuts is None:
+        return utils.split_window(start, end, slices)
+
+    bounds = [start, *cuts, end]
+    planned = [(bounds[0], bounds[1])]
+    for lo, hi in zip(bounds[1:-1], bounds[2:]):
+        # merge the sparse stretches into the previous slice
+        if model.expected(*planned[-1]) < constants.SLICE_MIN_PAGES * page_size:
+            planned[-1] = (planned[-1][0], hi)
+        else:
+            planned.append((lo, hi))
+
+    # and a sparse last slice into the one before it
+    if (
+        len(planned) > 1
+        and model.expected(*planned[-1]) < constants.SLICE_MIN_PAGES * page_size
+    ):
+        planned[-2:] = [(planned[-2][0], planned[-1][1])]
+
+    return planned
+
+
+def slice_paginators(
+    http: str,
+    query_scripts: str,
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    slices: int,
+    model: DensityModel | None = None,
+    paginator: Callable[..., Paginator] = Paginator,
+) -> list[Paginator]:
+    """
+    Function to split the window `(start_timestamp_gt, end_timestamp_lt)`
+    into time slices with one `paginator` each, see `plan_slices`.
+    """
+
+    return [
+        paginator(http, query_scripts, lo - 1, hi)
+        for lo, hi in plan_slices(
+            start_timestamp_gt + 1,
+            end_timestamp_lt,
+            slices,
+            paginated_queries(query_scripts)[3],
+            model,
+        )
+    ]
+
+
+def stitch_pages(
+    pages: Iterator[list[dict]], position: Callable[[dict], int]
+) -> Iterator[list[dict]]:
+    """
+    Function to drop the events already returned by an earlier page, so
+    the stitched slices hold every event once.
+
+    The pages come in cursor order, so only the ids at the latest `position`
+    of the events are kept: an event before it was returned already.
+    """
+
+    last, seen, dropped = None, set(), 0
+    for page in pages:
+        kept = []
+        for event in page:
+            at = position(event)
+            if last is None or at > last:
+                last, seen = at, set()
+            elif at < last or event["id"] in seen:
+                dropped += 1
+                continue
+            seen.add(event["id"])
+            kept.append(event)
+        yield kept
+
+    if dropped:
+        # info message
+        print(f"Dropped {dropped} events returned twice by the slices")
+
+
+class _Slice:
+    """
+    A time slice of a window: its paginator and the pages fetched but not
+    yielded yet.
+    """
+
+    def __init__(self, paginator: Paginator) -> None:
+        self.paginator = paginator
+        self.start = paginator.timestamp + 1
+        self.pages: deque[list[dict]] = deque()
+        self.done = False
+
+
+class SliceScheduler:
+    """
+    Work-stealing scheduler of the time slices of one window.
+
+    Every worker thread pages one slice at a time and records the density
+    of each page. When a worker goes idle, the busy workers split the rest
+    of their slice at its expected midpoint and queue the second half, so
+    dense or slow stretches are shared out instead of one slice dominating
+    the wall time.
+
+    The pages are handed to the consumer as they arrive and yielded in
+    timestamp order. About `SLICE_BUFFER_PAGES` pages at most wait across
+    the slices: past it, the workers wait for the consumer, except for the
+    slice being yielded once the consumer has drained it.
+
+    The slices are paged by instances of `paginator`, e.g. a
+    `BlockPaginator` to slice a range of blocks.
+    """
+
+    def __init__(
+        self,
+        http: str,
+        query_scripts: str,
+        start_timestamp_gt: int,
+        end_timestamp_lt: int,
+        slices: int,
+        workers: int,
+        model: DensityModel | None = None,
+        paginator: Callable[..., Paginator] = Paginator,
+        buffer_pages: int = constants.SLICE_BUFFER_PAGES,
+    ) -> None:
+        self.http = http
+        self.query_scripts = query_scripts
+        self.paginator = paginator
+        self.start = start_timestamp_gt + 1
+        self.end = end_timestamp_lt
+        self.workers = workers
+        self.model = model or DensityModel()
+        self.buffer_pages = buffer_pages
+        self.splits = 0
+        self.completed = 0
+
+        # queued slices sorted by start, the slices not yielded yet by
+        # start, the pages waiting in them and the worker states
+        self.page_size = paginated_queries(query_scripts)[3]
+        self.tasks = [
+            _Slice(task)
+            for task in slice_paginators(
+                http,
+                query_scripts,
+                start_timestamp_gt,
+                end_timestamp_lt,
+                slices,
+                model,
+                paginator,
+            )
+        ]
+        self.slices = {task.start: task for task in self.tasks}
+        self.position = self.tasks[0].paginator.position
+        self.buffered = 0
+        self.cursor = self.start
+        self.idle = 0
+        self.active = 0
+        self.error: BaseException | None = None
+        self.stopped = False
+        self._cond = threading.Condition()
+
+    def _next_task(self) -> _Slice | None:
+        """
+        Wait for a queued slice, None once all the work is done. The
+        earliest slice is taken first, so the one being yielded never waits
+        for a worker.
+        """
+
+        with self._cond:
+            while not self.tasks and self.active and not self.stopped:
+                self.idle += 1
+                self._cond.wait()
+                self.idle -= 1
+            if not self.tasks or self.stopped:
+                return None
+            self.active += 1
+            return self.tasks.pop(0)
+
+    def _maybe_split(self, paginator: Paginator) -> None:
+        """
+        Hand the second half of the rest of a slice to an idle worker.
+        """
+
+        # the last page of the slice is in: nothing is left to split
+        if paginator.done:
+            return
+        with self._cond:
+            if not self.idle or self.tasks:
+                return
+
+        lo, hi = paginator.timestamp + 1, paginator.end_timestamp_lt
+        expected = self.model.expected(lo, hi)
+        if expected is None or expected < 2 * constants.SLICE_MIN_PAGES * (
+            self.page_size
+        ):
+            return
+        cuts = self.model.quantiles(lo, hi, 2)
+        if not cuts:
+            return
+
+        # the paginator keeps [.., mid), the new slice takes [mid, hi)
+        mid = cuts[0]
+        task = _Slice(self.paginator(self.http, self.query_scripts, mid - 1, hi))
+        with self._cond:
+            self.slices[task.start] = task
+            insort(self.tasks, task, key=lambda queued: queued.start)
+            paginator.end_timestamp_lt = mid
+            self.splits += 1
+            self._cond.notify_all()
+
+    def _hand_over(self, task: _Slice, page: list[dict]) -> None:
+        """
+        Pass a page of a slice to the consumer, waiting while the buffer is
+        full unless the slice is the one being yielded and the consumer has
+        drained it.
+        """
+
+        with self._cond:
+            while (
+                self.buffered >= self.buffer_pages
+                and (task.start != self.cursor or task.pages)
+                and not self.stopped
+            ):
+                self._cond.wait()
+            task.pages.append(page)
+            self.buffered += 1
+            self._cond.notify_all()
+
+    def _page(self, task: _Slice) -> None:
+        """
+        Page through one slice, learning the density of every page.
+        """
+
+        paginator = task.paginator
+        while not paginator.done and not self.stopped:
+            timestamp, resuming = paginator.timestamp, paginator.last_id is not None
+            page = paginator.step()
+
+            # seconds covered by the page, from the second it resumed
+            self.model.observe(
+                timestamp if resuming else timestamp + 1,
+                (
+                    paginator.end_timestamp_lt
+                    if paginator.done
+                    else paginator.timestamp + 1
+                ),
+                len(page),
+            )
+
+            self._hand_over(task, page)
+            self._maybe_split(paginator)
+
+    def _work(self) -> None:
+        """
+        Worker loop: page queued slices until all the work is done.
+        """
+
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            try:
+                self._page(task)
+            except BaseException as exc:  # pylint: disable=broad-except
+                with self._cond:
+                    self.error = self.error or exc
+                    self.stopped = True
+                    self._cond.notify_all()
+                return
+
+            with self._cond:
+                task.done = True
+                self.completed += 1
+                self.active -= 1
+                self._cond.notify_all()
+
+    def _next_page(self) -> list[dict] | None:
+        """
+        Wait for the next page in timestamp order, None at the end of the
+        window.
+        """
+
+        with self._cond:
+            while self.cursor < self.end:
+                # every slice is registered before the one ending at its
+                # start is done, so a missing one is a gap in the window
+                task = self.slices.get(self.cursor)
+                if task is None:
+                    raise RuntimeError(f"No time slice starts at {self.cursor}")
+                while not task.pages and not task.done and self.error is None:
+                    self._cond.wait()
+                if self.error is not None:
+                    raise self.error
+
+                if task.pages:
+                    self.buffered -= 1
+                    self._cond.notify_all()
+                    return task.pages.popleft()
+
+                # the slice is yielded: go on with the next one
+                del self.slices[self.cursor]
+                self.cursor = task.paginator.end_timestamp_lt
+                self._cond.notify_all()
+
+        return None
+
+    def __iter__(self) -> Iterator[list[dict]]:
+        threads = [
+            threading.Thread(target=self._work, daemon=True)
+            for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while (page := self._next_page()) is not None:
+                yield page
+        finally:
+            # stop the workers if a slice failed or the consumer stopped
+            with self._cond:
+                self.stopped = True
+                self._cond.notify_all()
+            for thread in threads:
+                thread.join()
+
+
+def iter_pages(
+    http: str,
+    query_scripts: str,
+    start_timestamp_gt: int,
+    end_timestamp_lt: int,
+    slices: int | None = None,
+    workers: int | None = None,
+    paginator: Callable[..., Paginator] = Paginator,
+) -> Iterator[list[dict]]:
+    """
+    Function to page the events of a window, in timestamp order.
+
+    With more than one slice the window is split into `slices` sub-windows
+    paged by up to `workers` threads, which split dense slices further
+    while paging, see `SliceScheduler`. The density learned is kept for
+    the next fetches of the same entity, whose slices are then sized by
+    expected events rather than by time.
+
+    The window is paged by instances of `paginator`, by default on the
+    timestamps of the events.
+    """
+
+    slices = slices or constants.FETCH_SLICES
+
+    # a single slice is paged in turn
+    if slices <= 1 or end_timestamp_lt - start_timestamp_gt <= 2:
+        yield from paginator(http, query_scripts, start_timestamp_gt, end_timestamp_lt)
+        return
+
+    scheduler = SliceScheduler(
+        http,
+        query_scripts,
+        start_timestamp_gt,
+        end_timestamp_lt,
+        slices,
+        min(workers or constants.SLICE_WORKERS, slices),
+        get_density_model(http, query_scripts),
+        paginator,
+    )
+    yield from stitch_pages(iter(scheduler), scheduler.position)
+
+    # info message
+    print(f"Paged {scheduler.completed} slices after {scheduler.splits} splits")
@@ -2,32 +2,490 @@
 Functions to query the subgraph for data.
 """
 
+import email.utils
+import random
+import threading
+import time
+from collections import deque
+from functools import lru_cache
 import requests
+from requests.adapters import HTTPAdapter
+from config import constants
+from environ.fetch.endpoints import get_pool
+from environ.fetch.graphql_parser import (
+    Field,
+    Operation,
+    parse_query,
+    print_query,
+    rename_variables,
+)
+from environ.fetch.page_decoder import loads
+from environ.fetch.query_cache import QueryCache, get_cache, make_key
+from environ.fetch.telemetry import record_request
 
 
-def run_query(http: str, query_scripts: str) -> None:
+class SubgraphError(Exception):
+    """
+    Query failed and will not be retried (any more).
+    """
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the request rate of all the workers
+    sharing it.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take one token and return the number of seconds the caller
+        has to wait before using it.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+
+            # a negative balance is the debt the caller waits for
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class RetryPolicy:
+    """
+    Retry policy with exponential backoff and full jitter, honoring
+    Retry-After, plus a token-bucket rate limit per endpoint. Shared by the
+    sync and the asyncio clients so their counters and rate limits are
+    global.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = constants.RETRY_MAX_ATTEMPTS,
+        backoff_base: float = constants.RETRY_BACKOFF_BASE,
+        backoff_cap: float = constants.RETRY_BACKOFF_CAP,
+        rate_limit: float = constants.RATE_LIMIT_PER_SECOND,
+        rate_burst: int = constants.RATE_LIMIT_BURST,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self.buckets: dict[str, TokenBucket] = {}
+
+        # retry and throttle counters
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "throttled": 0,
+            "throttle_wait": 0.0,
+            "failures": 0,
+        }
+        self._lock = threading.Lock()
+
+    def count(self, key: str, value: float = 1) -> None:
+        """
+        Increase one of the counters.
+        """
+
+        with self._lock:
+            self.stats[key] += value
+
+    def throttle_delay(self, http: str) -> float:
+        """
+        Seconds to wait before sending the next request to an endpoint.
+        """
+
+        with self._lock:
+            if http not in self.buckets:
+                self.buckets[http] = TokenBucket(self.rate_limit, self.rate_burst)
+            bucket = self.buckets[http]
+
+        delay = bucket.reserve()
+        self.count("requests")
+        if delay > 0:
+            self.count("throttled")
+            self.count("throttle_wait", delay)
+        return delay
+
+    def backoff_delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """
+        Seconds to wait before retry number `attempt` (starting at 0).
+        """
+
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2**attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    @staticmethod
+    def is_retryable(status: int) -> bool:
+        """
+        Whether a HTTP status code is worth retrying.
+        """
+
+        return status == 429 or status >= 500
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Parse a Retry-After header given either in seconds or as a HTTP date.
+    """
+
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(
+            0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+class SubgraphClient:
+    """
+    HTTP client shared by all the subgraph queries.
+
+    Keeps the TCP/TLS connections alive between pages, negotiates gzip
+    responses, serves repeated queries from the on-disk response cache,
+    retries failed queries according to the retry policy and records the
+    wall time of every request, and every query in the telemetry.
+
+    The queries to an endpoint with mirrors are balanced over the pool of
+    its equivalent endpoints, and a failed request is retried at once on
+    another healthy one, see `EndpointPool`. The cache keys stay those of
+    the endpoint.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = constants.HTTP_POOL_CONNECTIONS,
+        pool_maxsize: int = constants.HTTP_POOL_MAXSIZE,
+        timeout: float = constants.HTTP_TIMEOUT,
+        policy: RetryPolicy | None = None,
+        cache: QueryCache | None = None,
+        use_cache: bool = True,
+        timings_kept: int | None = constants.HTTP_TIMINGS_KEPT,
+    ) -> None:
+        self.timeout = timeout
+        self.policy = policy or get_policy()
+        self.cache = (cache or get_cache()) if use_cache else None
+
+        # keep-alive session with a connection pool per host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {
+                "Accept-Encoding": "gzip, deflate",
+                "Content-Type": "application/json",
+            }
+        )
+
+        # timing of the latest `timings_kept` requests, or of all if None
+        self.timings: deque[dict] = deque(maxlen=timings_kept)
+        self._lock = threading.Lock()
+
+    def _send(self, http: str, payload: dict) -> tuple[requests.Response, float]:
+        """
+        Send one request, waiting for the rate limit first.
+        Returns the response and its wall time.
+        """
+
+        time.sleep(self.policy.throttle_delay(http))
+
+        start = time.perf_counter()
+        request = self.session.post(http, json=payload, timeout=self.timeout)
+        elapsed = time.perf_counter() - start
+
+        # record the timing of this request
+        with self._lock:
+            self.timings.append(
+                {
+                    "http": http,
+                    "status": request.status_code,
+                    "elapsed": elapsed,
+                    "bytes": len(request.content),
+                }
+            )
+
+        return request, elapsed
+
+    def post(self, http: str, payload: dict) -> dict:
+        """
+        Post a GraphQL payload and return the decoded json response,
+        served from the response cache when possible.
+        """
+
+        if self.cache is None:
+            return self._post(http, payload)
+
+        start = time.perf_counter()
+        fetched = []
+
+        def _fetch() -> dict:
+            fetched.append(True)
+            return self._post(http, payload)
+
+        var = payload.get("variables")
+        result = self.cache.get_or_fetch(
+            make_key(http, payload["query"], var),
+            _fetch,
+            meta={"http": http, "query": payload["query"], "variables": var},
+        )
+
+        # record the responses served from the cache
+        if not fetched:
+            elapsed = time.perf_counter() - start
+            record_request(http, payload, result, elapsed, elapsed, cached=True)
+
+        return result
+
+    def _post(self, http: str, payload: dict) -> dict:
+        """
+        Post a GraphQL payload to the endpoint, or one of its mirrors.
+        Retries HTTP 429/5xx, connection errors and GraphQL error payloads.
+        """
+
+        pool = get_pool(http)
+        error, result, endpoint = None, None, http
+        start, latency, nbytes, attempt = time.perf_counter(), 0.0, 0, 0
+        try:
+            for attempt in range(self.policy.max_attempts):
+                retry_after, elapsed = None, None
+                endpoint = pool.acquire()
+                try:
+                    request, elapsed = self._send(endpoint, payload)
+                except (requests.ConnectionError, requests.Timeout) as exc:
+                    error = repr(exc)
+                else:
+                    latency += elapsed
+                    nbytes += len(request.content)
+                    if request.status_code == 200:
+                        try:
+                            response = loads(request.content)
+                        except ValueError:
+                            response = {"errors": "response is not valid json"}
+                        if "errors" not in response:
+                            pool.release(endpoint, elapsed, True)
+                            result = response
+                            return result
+                        error = response["errors"]
+                    elif self.policy.is_retryable(request.status_code):
+                        error = f"return code is {request.status_code}"
+                        retry_after = parse_retry_after(
+                            request.headers.get("Retry-After")
+                        )
+                    else:
+                        pool.release(endpoint, elapsed, True)
+                        self.policy.count("failures")
+                        raise SubgraphError(
+                            f"Query failed. return code is {request.status_code}. "
+                            f"{payload['query']}"
+                        )
+                pool.release(endpoint, elapsed, False)
+
+                # wait before the next attempt, unless another endpoint can
+                # take it at once
+                if attempt + 1 < self.policy.max_attempts:
+                    self.policy.count("retries")
+                    if not pool.failover(endpoint):
+                        time.sleep(self.policy.backoff_delay(attempt, retry_after))
+
+            self.policy.count("failures")
+            raise SubgraphError(
+                f"Query failed after {self.policy.max_attempts} attempts. {error}"
+            )
+        finally:
+            # record the query, with all its attempts
+            record_request(
+                http,
+                payload,
+                result,
+                latency,
+                time.perf_counter() - start,
+                nbytes,
+                attempt,
+                endpoint=endpoint,
+            )
+
+    @property
+    def stats(self) -> dict:
+        """
+        Retry and throttle counters of the retry policy.
+        """
+
+        return self.policy.stats
+
+    @property
+    def last_elapsed(self) -> float | None:
+        """
+        Wall time in seconds of the latest request.
+        """
+
+        with self._lock:
+            return self.timings[-1]["elapsed"] if self.timings else None
+
+    def close(self) -> None:
+        """
+        Close the pooled connections.
+        """
+
+        self.session.close()
+
+
+_CLIENT: SubgraphClient | None = None
+_POLICY: RetryPolicy | None = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_policy() -> RetryPolicy:
+    """
+    Return the process-wide retry policy, creating it on first use.
+    """
+
+    global _POLICY  # pylint: disable=global-statement
+    with _CLIENT_LOCK:
+        if _POLICY is None:
+            _POLICY = RetryPolicy()
+        return _POLICY
+
+
+def get_client() -> SubgraphClient:
+    """
+    Return the process-wide client, creating it on first use.
+    """
+
+    global _CLIENT  # pylint: disable=global-statement
+    policy = get_policy()
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = SubgraphClient(policy=policy)
+        return _CLIENT
+
+
+def set_client(client: SubgraphClient | None) -> None:
+    """
+    Replace the process-wide client, e.g. to point the fetchers at a client
+    with other pool sizes. None recreates the default client on next use.
+    """
+
+    global _CLIENT  # pylint: disable=global-statement
+    with _CLIENT_LOCK:
+        _CLIENT = client
+
+
+def run_query(
+    http: str, query_scripts: str, client: SubgraphClient | None = None
+) -> dict:
     """
     execute query without variable parameters
     """
     # endpoint where you are making the request
-    request = requests.post(http, "", json={"query": query_scripts}, timeout=120)
-    if request.status_code == 200:
-        return request.json()
-    raise Exception(
-        f"Query failed. return code is {request.status_code}. {query_scripts}"
-    )
+    client = client or get_client()
+    return client.post(http, {"query": query_scripts})
 
 
-def run_query_var(http: str, query_scripts: str, var: dict[str, int]) -> None:
+def run_query_var(
+    http: str,
+    query_scripts: str,
+    var: dict[str, int],
+    client: SubgraphClient | None = None,
+) -> dict:
     """
     execute query with variable parameters
     """
     # endpoint where you are making the request
-    request = requests.post(
-        http, "", json={"query": query_scripts, "variables": var}, timeout=120
-    )
-    if request.status_code == 200:
-        return request.json()
-    raise Exception(
-        f"Query failed. return code is {request.status_code}. {query_scripts}"
-    )
+    client = client or get_client()
+    return client.post(http, {"query": query_scripts, "variables": var})
+
+
+# the query texts are constants, parse each of them once
+_parse_cached = lru_cache(maxsize=256)(parse_query)
+
+
+def batch_queries(parts: dict[str, tuple[str, dict]]) -> tuple[str, dict]:
+    """
+    Function to merge several (query, variables) parts into one query.
+
+    The root field of the part `alias` is aliased `alias` (`alias_<field>`
+    when the part has several root fields) and its variables are prefixed
+    with `alias_`, so e.g. the swaps, mints and burns of one window, or
+    several time slices of one entity, travel in a single request.
+    """
+
+    definitions, selections, variables = [], [], {}
+    for alias, (query_scripts, var) in parts.items():
+        operation = _parse_cached(query_scripts)
+        prefix = f"{alias}_"
+
+        definitions.extend(
+            (f"{prefix}{name}", var_type) for name, var_type in operation.variables
+        )
+        variables.update({f"{prefix}{name}": value for name, value in var.items()})
+
+        single = len(operation.selections) == 1
+        selections.extend(
+            Field(
+                field.name,
+                alias if single else f"{prefix}{field.key}",
+                rename_variables(field.arguments, prefix),
+                field.selections,
+            )
+            for field in operation.selections
+        )
+
+    return print_query(Operation("query", None, definitions, selections)), variables
+
+
+def split_batched_result(
+    result: dict, parts: dict[str, tuple[str, dict]]
+) -> dict[str, dict]:
+    """
+    Function to split the response of a batched query back into one
+    response per part, shaped like the response of the part on its own.
+    """
+
+    split = {}
+    for alias, (query_scripts, _) in parts.items():
+        operation = _parse_cached(query_scripts)
+        single = len(operation.selections) == 1
+        split[alias] = {
+            "data": {
+                field.key: result["data"][alias if single else f"{alias}_{field.key}"]
+                for field in operation.selections
+            }
+        }
+
+    return split
+
+
+def run_batched_query(
+    http: str,
+    parts: dict[str, tuple[str, dict]],
+    client: SubgraphClient | None = None,
+) -> dict[str, dict]:
+    """
+    execute several queries with variable parameters in one request
+    """
+    query_scripts, var = batch_queries(parts)
+    result = run_query_var(http, query_scripts, var, client)
+    return split_batched_result(result, parts)
@@ -0,0 +1,274 @@
+"""
+Asyncio functions to query the subgraph for data.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable
+import aiohttp
+from config import constants
+from environ.fetch.endpoints import get_pool
+from environ.fetch.page_decoder import loads
+from environ.fetch.query_cache import QueryCache, get_cache, make_key
+from environ.fetch.subgraph_query import (
+    RetryPolicy,
+    SubgraphError,
+    get_policy,
+    parse_retry_after,
+)
+from environ.fetch.telemetry import record_request
+
+
+class AsyncSubgraphClient:
+    """
+    Asyncio HTTP client keeping up to `concurrency` GraphQL requests in flight.
+    Failed queries are retried with the retry policy shared with the sync
+    client, so both draw from the same rate limit, and responses are shared
+    through the same on-disk cache. Every query is recorded in the telemetry,
+    and the endpoints with mirrors share their pool with the sync client.
+
+    Use as an async context manager so the underlying session is closed:
+
+        async with AsyncSubgraphClient(concurrency=8) as client:
+            await client.run_query_var(constants.HTTP_V3, query, var)
+    """
+
+    def __init__(
+        self,
+        concurrency: int = constants.ASYNC_CONCURRENCY,
+        timeout: float = constants.HTTP_TIMEOUT,
+        policy: RetryPolicy | None = None,
+        cache: QueryCache | None = None,
+        use_cache: bool = True,
+        timings_kept: int | None = constants.HTTP_TIMINGS_KEPT,
+    ) -> None:
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.policy = policy or get_policy()
+        self.cache = (cache or get_cache()) if use_cache else None
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._semaphore: asyncio.Semaphore | None = None
+        self._session: aiohttp.ClientSession | None = None
+
+        # timing of the latest `timings_kept` requests, or of all if None
+        self.timings: deque[dict] = deque(maxlen=timings_kept)
+
+    async def __aenter__(self) -> "AsyncSubgraphClient":
+        # the semaphore bounds the requests in flight,
+        # the connector keeps the same number of connections alive
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"Accept-Encoding": "gzip, deflate"},
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._session.close()
+
+    async def _send(
+        self, http: str, payload: dict
+    ) -> tuple[int, bytes, str | None, float]:
+        """
+        Send one request, waiting for the rate limit first.
+        Returns the status, content, Retry-After header and wall time.
+        """
+
+        await asyncio.sleep(self.policy.throttle_delay(http))
+
+        async with self._semaphore:
+            start = time.perf_counter()
+            async with self._session.post(http, json=payload) as response:
+                content = await response.read()
+                status = response.status
+                retry_after = response.headers.get("Retry-After")
+            elapsed = time.perf_counter() - start
+
+        # record the timing of this request
+        self.timings.append(
+            {"http": http, "status": status, "elapsed": elapsed, "bytes": len(content)}
+        )
+
+        return status, content, retry_after, elapsed
+
+    async def post(self, http: str, payload: dict) -> dict:
+        """
+        Post a GraphQL payload and return the decoded json response,
+        served from the response cache when possible. The cache files are
+        read and written in worker threads, off the event loop.
+        """
+
+        if self.cache is None:
+            return await self._post(http, payload)
+
+        start = time.perf_counter()
+        var = payload.get("variables")
+        key = make_key(http, payload["query"], var)
+        result = None
+        if key not in self._inflight:
+            result = await asyncio.to_thread(self.cache.get, key)
+
+        # another task is already fetching this key
+        if result is None and key in self._inflight:
+            self.cache.stats["coalesced"] += 1
+            future = self._inflight[key]
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # the task fetching the key was cancelled, not this one:
+                # fetch it again
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    return await self.post(http, payload)
+                raise
+
+        # record the responses served from the cache
+        if result is not None:
+            elapsed = time.perf_counter() - start
+            record_request(http, payload, result, elapsed, elapsed, cached=True)
+            return result
+
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await self._post(http, payload)
+        except asyncio.CancelledError:
+            future.cancel()
+            del self._inflight[key]
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # the followers see the error, do not report it as unretrieved
+            future.exception()
+            del self._inflight[key]
+            raise
+
+        # keep the key in flight until the entry is written, the cache
+        # skips the entries it cannot write
+        future.set_result(result)
+        try:
+            await asyncio.to_thread(
+                self.cache.put,
+                key,
+                result,
+                {"http": http, "query": payload["query"], "variables": var},
+            )
+        finally:
+            del self._inflight[key]
+
+        return result
+
+    async def _post(self, http: str, payload: dict) -> dict:
+        """
+        Post a GraphQL payload to the endpoint, or one of its mirrors.
+        Retries HTTP 429/5xx, connection errors and GraphQL error payloads.
+        """
+
+        pool = get_pool(http)
+        error, result, endpoint = None, None, http
+        start, latency, nbytes, attempt = time.perf_counter(), 0.0, 0, 0
+        try:
+            for attempt in range(self.policy.max_attempts):
+                retry_after, elapsed = None, None
+
+                # the health checks block on their requests: run them in a
+                # worker thread, off the event loop
+                if pool.check_due():
+                    endpoint = await asyncio.to_thread(pool.acquire)
+                else:
+                    endpoint = pool.acquire()
+                try:
+                    status, content, retry_header, elapsed = await self._send(
+                        endpoint, payload
+                    )
+                except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                    error = repr(exc)
+                else:
+                    latency += elapsed
+                    nbytes += len(content)
+                    if status == 200:
+                        try:
+                            response = loads(content)
+                        except ValueError:
+                            response = {"errors": "response is not valid json"}
+                        if "errors" not in response:
+                            pool.release(endpoint, elapsed, True)
+                            result = response
+                            return result
+                        error = response["errors"]
+                    elif self.policy.is_retryable(status):
+                        error = f"return code is {status}"
+                        retry_after = parse_retry_after(retry_header)
+                    else:
+                        pool.release(endpoint, elapsed, True)
+                        self.policy.count("failures")
+                        raise SubgraphError(
+                            f"Query failed. return code is {status}. "
+                            f"{payload['query']}"
+                        )
+
+                pool.release(endpoint, elapsed, False)
+
+                # wait before the next attempt, unless another endpoint can
+                # take it at once
+                if attempt + 1 < self.policy.max_attempts:
+                    self.policy.count("retries")
+                    if not pool.failover(endpoint):
+                        await asyncio.sleep(
+                            self.policy.backoff_delay(attempt, retry_after)
+                        )
+
+            self.policy.count("failures")
+            raise SubgraphError(
+                f"Query failed after {self.policy.max_attempts} attempts. {error}"
+            )
+        finally:
+            # record the query, with all its attempts
+            record_request(
+                http,
+                payload,
+                result,
+                latency,
+                time.perf_counter() - start,
+                nbytes,
+                attempt,
+                endpoint=endpoint,
+            )
+
+    @property
+    def stats(self) -> dict:
+        """
+        Retry and throttle counters of the retry policy.
+        """
+
+        return self.policy.stats
+
+    async def run_query(self, http: str, query_scripts: str) -> dict:
+        """
+        execute query without variable parameters
+        """
+        return await self.post(http, {"query": query_scripts})
+
+    async def run_query_var(
+        self, http: str, query_scripts: str, var: dict[str, int]
+    ) -> dict:
+        """
+        execute query with variable parameters
+        """
+        return await self.post(http, {"query": query_scripts, "variables": var})
+
+
+async def gather_or_cancel(*aws: Awaitable[Any]) -> list[Any]:
+    """
+    Await all the awaitables concurrently. If one of them fails,
+    cancel the others before re-raising the error.
+    """
+
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
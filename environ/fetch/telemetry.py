@@ -0,0 +1,399 @@
+"""
+Telemetry of the subgraph requests of the fetch runs.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Any
+import pandas as pd
+from config import constants
+import environ.fetch.fetch_utils as utils
+from environ.fetch.graphql_parser import parse_query
+
+# counters of the Prometheus snapshot: help text and the record field summed
+_COUNTERS = {
+    "subgraph_requests_total": ("Requests to the subgraph endpoints.", None),
+    "subgraph_request_seconds_total": (
+        "Seconds spent in the requests, retries included.",
+        "latency",
+    ),
+    "subgraph_response_bytes_total": ("Bytes of the responses.", "bytes"),
+    "subgraph_rows_total": ("Rows returned.", "rows"),
+    "subgraph_retries_total": ("Retries of failed attempts.", "retries"),
+    "subgraph_failures_total": ("Requests failed after every attempt.", "failed"),
+}
+
+# labels of the Prometheus counters
+_LABELS = ["endpoint", "version", "entity", "event", "cached"]
+
+# histogram of the latency of the requests answered by each endpoint
+_HISTOGRAM = (
+    "subgraph_request_latency_seconds",
+    "Latency of the requests not answered by the cache.",
+)
+
+
+@lru_cache(maxsize=256)
+def _root_fields(query_scripts: str) -> str:
+    """
+    Function to get the entities queried, e.g. `swaps` or `swaps,mints`
+    for a batched query.
+    """
+
+    names = dict.fromkeys(field.name for field in parse_query(query_scripts).selections)
+
+    return ",".join(names)
+
+
+def _event_windows() -> list[tuple[str, int, int]]:
+    """
+    Function to get the [start, end) window of each event of `EVENT_LIST`.
+    """
+
+    windows = []
+    for event_name, event_time in constants.EVENT_LIST:
+        timestamps = utils.timestamp_converter(event_time)
+        windows.append(
+            (event_name, timestamps["start_timestamp"], timestamps["end_timestamp"])
+        )
+
+    return windows
+
+
+def endpoint_version(http: str) -> str:
+    """
+    Function to get the version served by an endpoint.
+    """
+
+    if http == constants.HTTP_V2:
+        return "v2"
+    if http == constants.HTTP_V3:
+        return "v3"
+    if http == constants.HTTP_BLOCKS:
+        return "blocks"
+
+    return "other"
+
+
+def _position(variables: dict[str, Any] | None, data: dict | None) -> int | None:
+    """
+    Function to get the timestamp a request is at: the timestamp of the
+    first event returned, else the timestamp cursor of its variables.
+    """
+
+    for rows in (data or {}).values():
+        if isinstance(rows, list) and rows and "timestamp" in rows[0]:
+            return int(rows[0]["timestamp"])
+
+    cursors = [
+        int(value)
+        for name, value in (variables or {}).items()
+        if name.endswith(("timestamp", "timestamp_gt"))
+    ]
+
+    return min(cursors) if cursors else None
+
+
+def event_of(timestamp: int | None, windows: list[tuple[str, int, int]]) -> str:
+    """
+    Function to get the event whose window holds a timestamp, "other" if
+    none does.
+    """
+
+    if timestamp is not None:
+        for event_name, start, end in windows:
+            if start - 1 <= timestamp < end:
+                return event_name
+
+    return "other"
+
+
+def _escape(value: str) -> str:
+    """
+    Function to escape a Prometheus label value.
+    """
+
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Telemetry:
+    """
+    Counters of the subgraph requests of one run.
+
+    Each request is appended as a JSON line to `requests_<run>.jsonl`, with
+    its endpoint, version, entities, event window, variables, latency,
+    response bytes, rows and retries, by a writer thread so recording never
+    waits on the disk. Only running counters and a latency histogram per
+    endpoint are kept in memory; they are written to the Prometheus textfile
+    `fetch.prom` every `TELEMETRY_SNAPSHOT_SECONDS` and by `snapshot`, e.g.
+    for the textfile collector of the node exporter. The summaries read the
+    JSON lines back.
+    """
+
+    def __init__(self, root: str = constants.TELEMETRY_PATH) -> None:
+        self.run = f"{time.strftime('%Y%m%dT%H%M%S')}_{os.getpid()}"
+        self.records_path = os.path.join(root, f"requests_{self.run}.jsonl")
+        self.metrics_path = os.path.join(root, "fetch.prom")
+        self.windows = _event_windows()
+        self.buckets = list(constants.TELEMETRY_LATENCY_BUCKETS)
+        self.requests = 0
+        self.counters: dict[str, dict[tuple, float]] = {name: {} for name in _COUNTERS}
+        # requests per latency bucket of each endpoint, the last one past
+        # every bound, and the sum of their latencies
+        self.latency_counts: dict[str, list[int]] = {}
+        self.latency_sums: dict[str, float] = {}
+        self._snapshot_time = time.monotonic()
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+        # records waiting for the writer thread
+        self._queue: queue.Queue[dict[str, Any]] = queue.Queue()
+        threading.Thread(target=self._write, daemon=True).start()
+        atexit.register(self.flush)
+
+    def record(
+        self,
+        http: str,
+        payload: dict,
+        result: dict | None,
+        latency: float,
+        wall: float,
+        nbytes: int = 0,
+        retries: int = 0,
+        cached: bool = False,
+        endpoint: str | None = None,
+    ) -> None:
+        """
+        Record a request to the endpoint `http`, answered by `endpoint`, e.g.
+        a mirror, `result` None if it failed.
+        """
+
+        data = (result or {}).get("data") or {}
+        variables = payload.get("variables")
+        record = {
+            "time": round(time.time(), 3),
+            "endpoint": endpoint or http,
+            "version": endpoint_version(http),
+            "entity": _root_fields(payload["query"]),
+            "event": event_of(_position(variables, data), self.windows),
+            "variables": variables,
+            "latency": round(latency, 6),
+            "wall": round(wall, 6),
+            "bytes": nbytes,
+            "rows": sum(len(rows) for rows in data.values() if isinstance(rows, list)),
+            "retries": retries,
+            "failed": result is None,
+            "cached": cached,
+        }
+
+        labels = (
+            record["endpoint"],
+            record["version"],
+            record["entity"],
+            record["event"],
+            str(cached).lower(),
+        )
+        with self._lock:
+            self.requests += 1
+            for name, (_, field) in _COUNTERS.items():
+                value = 1 if field is None else float(record[field])
+                self.counters[name][labels] = (
+                    self.counters[name].get(labels, 0.0) + value
+                )
+            if not cached:
+                counts = self.latency_counts.setdefault(
+                    record["endpoint"], [0] * (len(self.buckets) + 1)
+                )
+                counts[bisect_left(self.buckets, latency)] += 1
+                self.latency_sums[record["endpoint"]] = (
+                    self.latency_sums.get(record["endpoint"], 0.0) + latency
+                )
+
+        self._queue.put(record)
+
+    def _write(self) -> None:
+        """
+        Writer loop: append the queued records to the JSON lines, and write
+        the snapshot of the counters now and then.
+        """
+
+        while True:
+            records = [self._queue.get()]
+            while not self._queue.empty():
+                records.append(self._queue.get_nowait())
+            try:
+                with open(self.records_path, "a", encoding="utf-8") as file:
+                    file.writelines(json.dumps(record) + "\n" for record in records)
+                if (
+                    time.monotonic() - self._snapshot_time
+                    >= constants.TELEMETRY_SNAPSHOT_SECONDS
+                ):
+                    self.snapshot()
+            except OSError as exc:
+                # info message
+                print(f"Telemetry not written: {exc}")
+            finally:
+                for _ in records:
+                    self._queue.task_done()
+
+    def flush(self) -> None:
+        """
+        Wait until the records of the run are written.
+        """
+
+        self._queue.join()
+
+    def _metric_lines(self) -> list[str]:
+        """
+        Lines of the Prometheus textfile of the counters and histograms.
+        """
+
+        with self._lock:
+            counters = {name: dict(values) for name, values in self.counters.items()}
+            histograms = {
+                endpoint: (list(counts), self.latency_sums[endpoint])
+                for endpoint, counts in self.latency_counts.items()
+            }
+
+        lines = []
+        for name, (help_text, _) in _COUNTERS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(counters[name].items()):
+                label_text = ",".join(
+                    f'{label}="{_escape(label_value)}"'
+                    for label, label_value in zip(_LABELS, labels)
+                )
+                lines.append(f"{name}{{{label_text}}} {value:g}")
+
+        # cumulative buckets of the histogram of each endpoint
+        name, help_text = _HISTOGRAM
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for endpoint, (counts, total) in sorted(histograms.items()):
+            label_text = f'endpoint="{_escape(endpoint)}"'
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{label_text}}} {total:g}")
+            lines.append(f"{name}_count{{{label_text}}} {cumulative}")
+
+        return lines
+
+    def snapshot(self) -> None:
+        """
+        Write the counters of the run to the Prometheus textfile.
+        """
+
+        self._snapshot_time = time.monotonic()
+        lines = self._metric_lines()
+
+        # write to a temporary file first so the collector never reads it partial
+        with self._snapshot_lock:
+            tmp_path = f"{self.metrics_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, self.metrics_path)
+
+    def summary(self, by: list[str] | None = None) -> pd.DataFrame:
+        """
+        Summarize the requests of the run by `by`, by default by event and
+        version, from its JSON lines: requests, rows, bytes, time in the
+        requests and its share, latency percentiles and rows per second.
+        """
+
+        by = by or ["event", "version"]
+        self.flush()
+        if not os.path.exists(self.records_path):
+            return pd.DataFrame()
+        df_records = pd.read_json(self.records_path, lines=True, convert_dates=False)
+        if df_records.empty:
+            return pd.DataFrame()
+
+        df_summary = df_records.groupby(by).agg(
+            requests=("latency", "size"),
+            cached=("cached", "sum"),
+            retries=("retries", "sum"),
+            failures=("failed", "sum"),
+            rows=("rows", "sum"),
+            mb=("bytes", lambda nbytes: nbytes.sum() / 2**20),
+            seconds=("latency", "sum"),
+            p50_ms=("latency", lambda latency: latency.quantile(0.5) * 1000),
+            p95_ms=("latency", lambda latency: latency.quantile(0.95) * 1000),
+        )
+        df_summary["share"] = df_summary["seconds"] / df_summary["seconds"].sum()
+        df_summary["rows_per_s"] = df_summary["rows"] / df_summary["seconds"].where(
+            df_summary["seconds"] > 0
+        )
+
+        return df_summary.sort_values("seconds", ascending=False).round(3).reset_index()
+
+
+_TELEMETRY: dict[str, Telemetry] = {}
+_TELEMETRY_LOCK = threading.Lock()
+
+
+def get_telemetry() -> Telemetry | None:
+    """
+    Return the telemetry of the run, or None if it is disabled.
+    """
+
+    if not constants.TELEMETRY_ENABLED:
+        return None
+
+    with _TELEMETRY_LOCK:
+        if constants.TELEMETRY_PATH not in _TELEMETRY:
+            _TELEMETRY[constants.TELEMETRY_PATH] = Telemetry(constants.TELEMETRY_PATH)
+        return _TELEMETRY[constants.TELEMETRY_PATH]
+
+
+def record_request(
+    http: str,
+    payload: dict,
+    result: dict | None,
+    latency: float,
+    wall: float,
+    nbytes: int = 0,
+    retries: int = 0,
+    cached: bool = False,
+    endpoint: str | None = None,
+) -> None:
+    """
+    Function to record a request in the telemetry of the run, if enabled.
+    """
+
+    telemetry = get_telemetry()
+    if telemetry is not None:
+        telemetry.record(
+            http, payload, result, latency, wall, nbytes, retries, cached, endpoint
+        )
+
+
+def report() -> pd.DataFrame:
+    """
+    Function to end a run: write the Prometheus snapshot and print the
+    time spent by event and version, and by endpoint. Returns the summary
+    by event and version.
+    """
+
+    telemetry = get_telemetry()
+    if telemetry is None or not telemetry.requests:
+        return pd.DataFrame()
+
+    telemetry.snapshot()
+    df_summary = telemetry.summary()
+
+    # info message
+    print(f"Requests of the run, in {telemetry.records_path}:")
+    print(df_summary.to_string(index=False))
+    print(telemetry.summary(["endpoint"]).to_string(index=False))
+
+    return df_summary
@@ -0,0 +1,149 @@
+"""
+Concurrent runner of a DAG of tasks with per-resource limits.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable
+import pandas as pd
+
+
+class Task:
+    """
+    A node of the DAG: `func` is called with the results of its
+    dependencies, by name, once they are all complete. A task holding a
+    `resource`, e.g. an endpoint, only runs while the resource has a
+    free slot.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[dict[str, Any]], Any],
+        deps: list[str] | None = None,
+        resource: str | None = None,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.deps = deps or []
+        self.resource = resource
+        self.result: Any = None
+        self.ready: float | None = None
+        self.start: float | None = None
+        self.end: float | None = None
+
+    @property
+    def duration(self) -> float:
+        """
+        Run time of the task in seconds.
+        """
+
+        return self.end - self.start
+
+
+def run_dag(
+    tasks: list[Task], workers: int, limits: dict[str, int] | None = None
+) -> dict[str, Task]:
+    """
+    Function to run the tasks on a pool of `workers` threads, each as soon
+    as its dependencies are complete and its resource has a free slot,
+    e.g. `limits={endpoint: 2}`. The ready tasks start in list order.
+    Returns the tasks by name with their results and timings, relative
+    to the start of the run.
+    """
+
+    limits = limits or {}
+    by_name = {task.name: task for task in tasks}
+    unknown = [dep for task in tasks for dep in task.deps if dep not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown dependencies: {sorted(set(unknown))}")
+
+    pending = list(tasks)
+    running: dict[Future, Task] = {}
+    in_use: dict[str, int] = {}
+    complete: set[str] = set()
+    origin = time.perf_counter()
+
+    def _run(task: Task) -> Any:
+        task.start = time.perf_counter() - origin
+        try:
+            return task.func({dep: by_name[dep].result for dep in task.deps})
+        finally:
+            task.end = time.perf_counter() - origin
+
+    with ThreadPoolExecutor(workers) as executor:
+        while pending or running:
+            # start the ready tasks while there are free workers and slots
+            for task in list(pending):
+                if any(dep not in complete for dep in task.deps):
+                    continue
+                if task.ready is None:
+                    task.ready = time.perf_counter() - origin
+                if len(running) >= workers:
+                    continue
+                if task.resource is not None and in_use.get(
+                    task.resource, 0
+                ) >= limits.get(task.resource, workers):
+                    continue
+
+                pending.remove(task)
+                if task.resource is not None:
+                    in_use[task.resource] = in_use.get(task.resource, 0) + 1
+                running[executor.submit(_run, task)] = task
+
+            if not running:
+                raise ValueError("The tasks have a dependency cycle")
+
+            # collect the tasks complete
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                if task.resource is not None:
+                    in_use[task.resource] -= 1
+
+                # stop scheduling on the first failure
+                try:
+                    task.result = future.result()
+                except BaseException:
+                    for other in running:
+                        other.cancel()
+                    raise
+                complete.add(task.name)
+
+    return by_name
+
+
+def critical_path(tasks: dict[str, Task]) -> list[Task]:
+    """
+    Function to trace the critical path of a run: from the task finishing
+    last, back through the dependency finishing last of each task.
+    """
+
+    task = max(tasks.values(), key=lambda task: task.end)
+    path = [task]
+    while task.deps:
+        task = max((tasks[dep] for dep in task.deps), key=lambda dep: dep.end)
+        path.append(task)
+
+    return path[::-1]
+
+
+def timing_summary(tasks: dict[str, Task]) -> pd.DataFrame:
+    """
+    Function to summarize the critical path of a run: for each of its tasks
+    the time waiting for a worker or a resource slot and the run time.
+    """
+
+    rows = []
+    for task in critical_path(tasks):
+        rows.append(
+            {
+                "task": task.name,
+                "start_s": round(task.start, 2),
+                "wait_s": round(task.start - task.ready, 2),
+                "run_s": round(task.duration, 2),
+                "end_s": round(task.end, 2),
+            }
+        )
+
+    return pd.DataFrame(rows)
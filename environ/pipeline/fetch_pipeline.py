@@ -0,0 +1,205 @@
+"""
+Pipeline fetching every (version, entity, event) and converting each
+partition into the panel as soon as it lands.
+"""
+
+import threading
+from typing import Any
+import pandas as pd
+from config import constants
+from environ.fetch.endpoints import endpoint_urls
+from environ.fetch.event_registry import get_event
+from environ.fetch.event_store import read_partition
+from environ.fetch.fetch_dimensions import update_dimensions
+from environ.fetch.fetch_plan import event_windows, plan_ranges, stream_range
+from environ.pipeline.dag import Task, run_dag, timing_summary
+from environ.process.process_panel import (
+    convert_partition,
+    panel_partitions,
+    save_panel,
+)
+
+# the dimension tables of a version are updated by one task at a time
+_DIMENSION_LOCKS = {"v2": threading.Lock(), "v3": threading.Lock()}
+
+
+def _data_path(version: str) -> str:
+    """
+    Function to get the raw data directory of a version.
+    """
+
+    return constants.DATA_V2_PATH if version == "v2" else constants.DATA_V3_PATH
+
+
+def _fetch_task(
+    version: str,
+    entity: str,
+    start: int,
+    end: int,
+    windows: dict[str, tuple[int, int]],
+    profile: str | None,
+) -> Task:
+    """
+    Task fetching a range of the plan and streaming the partitions of the
+    event windows in it to disk.
+    """
+
+    def _fetch(_: dict[str, Any]) -> dict[str, int]:
+        return stream_range(
+            version, entity, start, end, windows, _data_path(version), profile
+        )
+
+    return Task(
+        f"fetch {version} {entity} {start}-{end}",
+        _fetch,
+        resource=get_event(version, entity).endpoint,
+    )
+
+
+def _dimension_task(
+    version: str, entity: str, windows: dict[str, tuple[int, int]], fetch: str
+) -> Task:
+    """
+    Task adding the dimension rows referenced by the partitions of a
+    fetched range.
+    """
+
+    def _update(_: dict[str, Any]) -> None:
+        # only the id columns of the partitions are needed
+        event_dfs = [
+            read_partition(
+                version,
+                _data_path(version),
+                event_name,
+                entity,
+                usecols=lambda column: column.endswith("_id"),
+            )
+            for event_name in windows
+        ]
+        with _DIMENSION_LOCKS[version]:
+            update_dimensions(version, event_dfs, _data_path(version))
+
+    return Task(
+        f"dimensions {fetch}",
+        _update,
+        [fetch],
+        resource=getattr(constants, f"HTTP_{version.upper()}"),
+    )
+
+
+def _convert_task(
+    version: str, entity: str, event_info: tuple[str, str], deps: list[str]
+) -> Task:
+    """
+    Task converting a saved partition into its part of the panel.
+    """
+
+    def _convert(_: dict[str, Any]) -> pd.DataFrame:
+        return convert_partition(version, entity, event_info)
+
+    return Task(f"convert {version} {entity} {event_info[0]}", _convert, deps)
+
+
+def build_tasks(
+    versions: list[str] | None = None,
+    entities: list[str] | None = None,
+    events: list[tuple[str, str]] | None = None,
+    profile: str | None = None,
+) -> list[Task]:
+    """
+    Function to build the tasks of the pipeline:
+
+    - one fetch task per (version, entity) and range of the fetch plan,
+      so overlapping event windows are fetched once, streaming the
+      (version, entity, event) partitions in it to disk;
+    - with the normalized profile, one dimension task per fetch task;
+    - one conversion task per partition, into its part of the panel;
+    - the panel task, saving the partitions in panel order.
+    """
+
+    versions = versions or ["v2", "v3"]
+    entities = entities or ["swaps", "burns", "mints"]
+    events = events or constants.EVENT_LIST
+    windows = event_windows(events)
+    ranges = plan_ranges(windows)
+    normalized = (profile or constants.QUERY_PROFILE) == "normalized"
+
+    fetch_tasks, other_tasks, converts = [], [], {}
+    for version in versions:
+        for entity in entities:
+            for start, end in ranges:
+                # the partitions of the event windows in this range
+                range_windows = {
+                    event_name: window
+                    for event_name, window in windows.items()
+                    if start <= window[0] and window[1] <= end
+                }
+                fetch_task = _fetch_task(
+                    version, entity, start, end, range_windows, profile
+                )
+                fetch_tasks.append(fetch_task)
+                deps = [fetch_task.name]
+                if normalized:
+                    other_tasks.append(
+                        _dimension_task(version, entity, range_windows, fetch_task.name)
+                    )
+                    deps.append(other_tasks[-1].name)
+
+                # convert each partition as soon as it is saved
+                for event_info in events:
+                    if event_info[0] not in range_windows:
+                        continue
+                    convert_task = _convert_task(version, entity, event_info, deps)
+                    other_tasks.append(convert_task)
+                    converts[(version, entity, event_info[0])] = convert_task.name
+
+    # the panel of the partitions, in panel order
+    panel_deps = [
+        converts[(version, entity, event_info[0])]
+        for version, entity, event_info in panel_partitions()
+        if (version, entity, event_info[0]) in converts
+    ]
+    panel_task = Task(
+        "panel",
+        lambda results: save_panel([results[name] for name in panel_deps]),
+        panel_deps,
+    )
+
+    # the short tasks first, so partitions are converted while fetching
+    return other_tasks + fetch_tasks + [panel_task]
+
+
+def run_pipeline(
+    versions: list[str] | None = None,
+    entities: list[str] | None = None,
+    events: list[tuple[str, str]] | None = None,
+    profile: str | None = None,
+    workers: int = constants.PIPELINE_WORKERS,
+    endpoint_concurrency: int = constants.ENDPOINT_CONCURRENCY,
+) -> pd.DataFrame:
+    """
+    Function to run the pipeline on a pool of `workers` threads, with at
+    most `endpoint_concurrency` fetch tasks per subgraph endpoint, and as
+    many more per mirror of the endpoint.
+    Returns the timing summary of the critical path of the run.
+    """
+
+    tasks = build_tasks(versions, entities, events, profile)
+    limits = {
+        task.resource: endpoint_concurrency * len(endpoint_urls(task.resource))
+        for task in tasks
+        if task.resource is not None
+    }
+
+    tasks_run = run_dag(tasks, workers, limits)
+
+    # info message
+    endpoint_time = sum(
+        task.duration for task in tasks_run.values() if task.resource is not None
+    )
+    print(
+        f"Ran {len(tasks_run)} tasks in {tasks_run['panel'].end:.2f}s "
+        f"with {endpoint_time:.2f}s of queries to the endpoints"
+    )
+
+    return timing_summary(tasks_run)
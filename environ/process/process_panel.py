@@ -4,13 +4,84 @@ Function to aggregate data from multiple sources.
 
 import warnings
 import os
+from functools import lru_cache
 import pandas as pd
 from config import constants
+from environ.fetch.event_store import read_partition
+from environ.fetch.schema import read_csv
 
 # ignore warnings
 warnings.filterwarnings("ignore")
 
 
+@lru_cache(maxsize=16)
+def _read_dimension_version(
+    version: str, file_path: str, mtime_ns: int
+) -> pd.DataFrame:
+    """
+    Function to read a version of a dimension table once per process.
+    """
+
+    return read_csv(version, file_path)
+
+
+def _read_dimension(version: str, file_path: str) -> pd.DataFrame:
+    """
+    Function to read a dimension table with the declared types of the
+    version, again only once it has changed.
+    """
+
+    return _read_dimension_version(version, file_path, os.stat(file_path).st_mtime_ns)
+
+
+def _join_dimensions(
+    df_events: pd.DataFrame,
+    version: str,
+    data_path: str,
+    columns: list[str],
+    prefix: str = "",
+) -> pd.DataFrame:
+    """
+    Function to join the dimension tables back onto normalized events,
+    e.g. `pair_id` -> `pair_reserve0`, `pair_token0_id` -> `pair_token0_name`.
+
+    Only the dimension columns in `columns` are joined and the events which
+    already carry their dimension fields are left as they are.
+    """
+
+    dimensions = constants.DIMENSION_FIELDS[version]
+    for field, dimension in dimensions.items():
+        key, field_prefix = f"{prefix}{field}_id", f"{prefix}{field}_"
+
+        # skip the dimensions not referenced or already unwrapped
+        if key not in df_events.columns or any(
+            column.startswith(field_prefix) and column != key
+            for column in df_events.columns
+        ):
+            continue
+
+        # keep the id, the needed columns and the ids of the nested dimensions
+        df_dimension = _read_dimension(version, f"{data_path}/dim_{dimension}.csv")
+        df_dimension = df_dimension[
+            [
+                column
+                for column in df_dimension.columns
+                if column == "id"
+                or f"{field_prefix}{column}" in columns
+                or column in [f"{nested}_id" for nested in dimensions]
+            ]
+        ].add_prefix(field_prefix)
+
+        df_events = df_events.merge(df_dimension, on=key, how="left")
+
+        # join the dimensions nested in this one, e.g. the pair tokens
+        df_events = _join_dimensions(
+            df_events, version, data_path, columns, field_prefix
+        )
+
+    return df_events
+
+
 def _swaps_v2_converter(df_swaps: pd.DataFrame, event_info: list[str]) -> pd.DataFrame:
     """
     Function to standardize the swaps data from v2.
@@ -27,28 +98,8 @@ def _swaps_v2_converter(df_swaps: pd.DataFrame, event_info: list[str]) -> pd.Dat
 
     # only keep the necessary columns
     df_swaps = df_swaps[
-        [
-            "dex",
-            "method",
-            "event_name",
-            "event_time",
-            "id",
-            "timestamp",
-            "pair_id",
-            "pair_token0_id",
-            "pair_token0_name",
-            "pair_token0_symbol",
-            "pair_token1_id",
-            "pair_token1_name",
-            "pair_token1_symbol",
-            "amount0In",
-            "amount0Out",
-            "amount1In",
-            "amount1Out",
-            "amountUSD",
-            "pair_reserve0",
-            "pair_reserve1",
-        ]
+        ["dex", "method", "event_name", "event_time"]
+        + constants.PANEL_COLUMNS[("v2", "swaps")]
     ]
 
     # create two column for the amount0 and amount1
@@ -117,26 +168,8 @@ def _swaps_v3_converter(df_swaps: pd.DataFrame, event_info: list[str]) -> pd.Dat
 
     # only keep the necessary columns
     df_swaps = df_swaps[
-        [
-            "dex",
-            "method",
-            "event_name",
-            "event_time",
-            "id",
-            "timestamp",
-            "pool_id",
-            "token0_id",
-            "token0_name",
-            "token0_symbol",
-            "token1_id",
-            "token1_name",
-            "token1_symbol",
-            "amount0",
-            "amount1",
-            "amountUSD",
-            "pool_totalValueLockedToken0",
-            "pool_totalValueLockedToken1",
-        ]
+        ["dex", "method", "event_name", "event_time"]
+        + constants.PANEL_COLUMNS[("v3", "swaps")]
     ]
 
     # create two column for the amount0 and amount1
@@ -192,26 +225,8 @@ def _burns_v2_converter(df_burns: pd.DataFrame, event_info: list[str]) -> pd.Dat
 
     # only keep the necessary columns
     df_burns = df_burns[
-        [
-            "dex",
-            "method",
-            "event_name",
-            "event_time",
-            "id",
-            "timestamp",
-            "pair_id",
-            "pair_token0_id",
-            "pair_token0_name",
-            "pair_token0_symbol",
-            "pair_token1_id",
-            "pair_token1_name",
-            "pair_token1_symbol",
-            "amount0",
-            "amount1",
-            "amountUSD",
-            "pair_reserve0",
-            "pair_reserve1",
-        ]
+        ["dex", "method", "event_name", "event_time"]
+        + constants.PANEL_COLUMNS[("v2", "burns")]
     ]
 
     # from the investors perspective
@@ -278,28 +293,8 @@ def _burns_v3_converter(df_burns: pd.DataFrame, event_info: list[str]) -> pd.Dat
 
     # only keep the necessary columns
     df_burns = df_burns[
-        [
-            "dex",
-            "method",
-            "event_name",
-            "event_time",
-            "id",
-            "timestamp",
-            "pool_id",
-            "token0_id",
-            "token0_name",
-            "token0_symbol",
-            "token1_id",
-            "token1_name",
-            "token1_symbol",
-            "amount0",
-            "amount1",
-            "amountUSD",
-            "pool_totalValueLockedToken0",
-            "pool_totalValueLockedToken1",
-            "pool_token0Price",
-            "pool_token1Price",
-        ]
+        ["dex", "method", "event_name", "event_time"]
+        + constants.PANEL_COLUMNS[("v3", "burns")]
     ]
 
     # from the investors perspective
@@ -367,26 +362,8 @@ def _mints_v2_converter(df_mints: pd.DataFrame, event_info: list[str]) -> pd.Dat
 
     # only keep the necessary columns
     df_mints = df_mints[
-        [
-            "dex",
-            "method",
-            "event_name",
-            "event_time",
-            "id",
-            "timestamp",
-            "pair_id",
-            "pair_token0_id",
-            "pair_token0_name",
-            "pair_token0_symbol",
-            "pair_token1_id",
-            "pair_token1_name",
-            "pair_token1_symbol",
-            "amount0",
-            "amount1",
-            "amountUSD",
-            "pair_reserve0",
-            "pair_reserve1",
-        ]
+        ["dex", "method", "event_name", "event_time"]
+        + constants.PANEL_COLUMNS[("v2", "mints")]
     ]
 
     # from the investors perspective
@@ -453,28 +430,8 @@ def _mints_v3_converter(df_mints: pd.DataFrame, event_info: list[str]) -> pd.Dat
 
     # only keep the necessary columns
     df_mints = df_mints[
-        [
-            "dex",
-            "method",
-            "event_name",
-            "event_time",
-            "id",
-            "timestamp",
-            "pool_id",
-            "token0_id",
-            "token0_name",
-            "token0_symbol",
-            "token1_id",
-            "token1_name",
-            "token1_symbol",
-            "amount0",
-            "amount1",
-            "amountUSD",
-            "pool_totalValueLockedToken0",
-            "pool_totalValueLockedToken1",
-            "pool_token0Price",
-            "pool_token1Price",
-        ]
+        ["dex", "method", "event_name", "event_time"]
+        + constants.PANEL_COLUMNS[("v3", "mints")]
     ]
 
     # from the investors perspective
@@ -526,48 +483,66 @@ def _mints_v3_converter(df_mints: pd.DataFrame, event_info: list[str]) -> pd.Dat
     return df_mints
 
 
-def generate_panel() -> None:
+# converter of each (version, entity)
+CONVERTERS = {
+    ("v2", "swaps"): _swaps_v2_converter,
+    ("v3", "swaps"): _swaps_v3_converter,
+    ("v2", "burns"): _burns_v2_converter,
+    ("v3", "burns"): _burns_v3_converter,
+    ("v2", "mints"): _mints_v2_converter,
+    ("v3", "mints"): _mints_v3_converter,
+}
+
+
+def convert_partition(
+    version: str, data_cat: str, event_info: tuple[str, str]
+) -> pd.DataFrame:
     """
-    Function to aggregate data from multiple sources.
+    Function to convert the raw data of one (version, entity, event)
+    into its part of the panel.
+    """
+
+    data_path = constants.DATA_V2_PATH if version == "v2" else constants.DATA_V3_PATH
+
+    # read the columns of the panel and the ids of the dimensions
+    panel_columns = constants.PANEL_COLUMNS[(version, data_cat)]
+    df_events = read_partition(
+        version,
+        data_path,
+        event_info[0],
+        data_cat,
+        usecols=lambda column: column in panel_columns or column.endswith("_id"),
+    )
+
+    # join the dimension tables of the normalized data
+    df_events = _join_dimensions(df_events, version, data_path, panel_columns)
+
+    # convert the data
+    return CONVERTERS[(version, data_cat)](df_events, event_info)
+
+
+def panel_partitions() -> list[tuple[str, str, tuple[str, str]]]:
+    """
+    Function to list the (version, entity, event) partitions in panel order.
+    """
+
+    return [
+        (version, data_cat, event_info)
+        for data_cat in ["swaps", "burns", "mints"]
+        for event_info in constants.EVENT_LIST
+        for version in ["v2", "v3"]
+    ]
+
+
+def save_panel(panel_data: list[pd.DataFrame]) -> None:
+    """
+    Function to concatenate the converted partitions and save the panel.
     """
 
     # check if there is the path WORKING_DATA_PATH
     if not os.path.exists(constants.WORKING_DATA_PATH):
         os.makedirs(constants.WORKING_DATA_PATH)
 
-    # create a list for the panel data
-    panel_data = []
-
-    for data_cat in ["swaps", "burns", "mints"]:
-        for event_info in [
-            constants.EVENT_ONE,
-            constants.EVENT_TWO,
-            constants.EVENT_THREE,
-            constants.EVENT_FOUR,
-        ]:
-            # read the data
-            df_v2 = pd.read_csv(
-                f"{constants.DATA_V2_PATH}/{event_info[0]}_{data_cat}.csv"
-            )
-            df_v3 = pd.read_csv(
-                f"{constants.DATA_V3_PATH}/{event_info[0]}_{data_cat}.csv"
-            )
-
-            # convert the data
-            if data_cat == "swaps":
-                df_v2 = _swaps_v2_converter(df_v2, event_info)
-                df_v3 = _swaps_v3_converter(df_v3, event_info)
-            elif data_cat == "burns":
-                df_v2 = _burns_v2_converter(df_v2, event_info)
-                df_v3 = _burns_v3_converter(df_v3, event_info)
-            elif data_cat == "mints":
-                df_v2 = _mints_v2_converter(df_v2, event_info)
-                df_v3 = _mints_v3_converter(df_v3, event_info)
-
-            # append the data
-            panel_data.append(df_v2)
-            panel_data.append(df_v3)
-
     # concatenate the data
     df_panel = pd.concat(panel_data)
 
@@ -575,11 +550,27 @@ def generate_panel() -> None:
     df_panel.to_csv(f"{constants.WORKING_DATA_PATH}/panel.csv", index=False)
 
 
+def generate_panel() -> None:
+    """
+    Function to aggregate data from multiple sources.
+    """
+
+    # convert each partition in panel order
+    panel_data = [
+        convert_partition(version, data_cat, event_info)
+        for version, data_cat, event_info in panel_partitions()
+    ]
+
+    save_panel(panel_data)
+
+
 if __name__ == "__main__":
     # test the function
     print(
         _swaps_v2_converter(
-            pd.read_csv(f"{constants.DATA_V2_PATH}/{constants.EVENT_ONE[0]}_swaps.csv"),
+            read_partition(
+                "v2", constants.DATA_V2_PATH, constants.EVENT_ONE[0], "swaps"
+            ),
             constants.EVENT_ONE,
         )
     )
@@ -587,7 +578,9 @@ if __name__ == "__main__":
     # test the function for v3
     print(
         _swaps_v3_converter(
-            pd.read_csv(f"{constants.DATA_V3_PATH}/{constants.EVENT_ONE[0]}_swaps.csv"),
+            read_partition(
+                "v3", constants.DATA_V3_PATH, constants.EVENT_ONE[0], "swaps"
+            ),
             constants.EVENT_ONE,
         )
     )
@@ -595,7 +588,9 @@ if __name__ == "__main__":
     # test the function for burns
     print(
         _burns_v2_converter(
-            pd.read_csv(f"{constants.DATA_V2_PATH}/{constants.EVENT_ONE[0]}_burns.csv"),
+            read_partition(
+                "v2", constants.DATA_V2_PATH, constants.EVENT_ONE[0], "burns"
+            ),
             constants.EVENT_ONE,
         )
     )
@@ -603,7 +598,9 @@ if __name__ == "__main__":
     # test the function for burns
     print(
         _burns_v3_converter(
-            pd.read_csv(f"{constants.DATA_V3_PATH}/{constants.EVENT_ONE[0]}_burns.csv"),
+            read_partition(
+                "v3", constants.DATA_V3_PATH, constants.EVENT_ONE[0], "burns"
+            ),
             constants.EVENT_ONE,
         )
     )
@@ -611,7 +608,9 @@ if __name__ == "__main__":
     # test the function for mints
     print(
         _mints_v2_converter(
-            pd.read_csv(f"{constants.DATA_V2_PATH}/{constants.EVENT_ONE[0]}_mints.csv"),
+            read_partition(
+                "v2", constants.DATA_V2_PATH, constants.EVENT_ONE[0], "mints"
+            ),
             constants.EVENT_ONE,
         )
     )
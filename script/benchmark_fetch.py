@@ -0,0 +1,52 @@
+"""
+Script to benchmark the fetch functions against local stand-in subgraphs.
+"""
+
+import argparse
+from environ.benchmark.fetch_benchmark import FETCHERS, benchmark_fetch
+
+
+def benchmark_main() -> None:
+    """
+    Parse the arguments and print the benchmark report.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", default="1,2,4,8")
+    parser.add_argument(
+        "--mode", choices=["sync", "async", "sliced", "both"], default="both"
+    )
+    parser.add_argument("--window-hours", type=float, default=1.0)
+    parser.add_argument("--entities", default="swaps")
+    parser.add_argument("--versions", default="v2,v3")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--server-rate-limit", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    keys = tuple(
+        (version, entity)
+        for entity in args.entities.split(",")
+        for version in args.versions.split(",")
+        if (version, entity) in FETCHERS
+    )
+
+    df_report = benchmark_fetch(
+        concurrency_levels=tuple(int(level) for level in args.concurrency.split(",")),
+        modes=("sync", "async") if args.mode == "both" else (args.mode,),
+        window_hours=args.window_hours,
+        keys=keys,
+        latency=args.latency_ms / 1000,
+        latency_jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate,
+        server_rate_limit=args.server_rate_limit,
+        seed=args.seed,
+    )
+
+    print(df_report.to_string(index=False))
+
+
+if __name__ == "__main__":
+    benchmark_main()
@@ -0,0 +1,30 @@
+"""
+Script to benchmark the flattening of the nested subgraph objects.
+"""
+
+import argparse
+from environ.benchmark.unwrap_benchmark import benchmark_unwrap
+
+
+def benchmark_main() -> None:
+    """
+    Parse the arguments and print the benchmark report.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="10000,100000,1000000")
+    parser.add_argument("--version", default="v2")
+    parser.add_argument("--entity", default="swaps")
+    args = parser.parse_args()
+
+    df_report = benchmark_unwrap(
+        rows_levels=tuple(int(rows) for rows in args.rows.split(",")),
+        version=args.version,
+        entity=args.entity,
+    )
+
+    print(df_report.to_string(index=False))
+
+
+if __name__ == "__main__":
+    benchmark_main()
@@ -0,0 +1,31 @@
+"""
+Script to fetch the pair, pool and token tables of the normalized event data.
+"""
+
+from config import constants
+from environ.fetch.fetch_dimensions import update_dimensions_from_store
+from environ.fetch.telemetry import report
+
+
+def fetch_main() -> None:
+    """
+    Update the dimension tables of both versions from the saved events.
+    """
+
+    for version, data_path in [
+        ("v2", constants.DATA_V2_PATH),
+        ("v3", constants.DATA_V3_PATH),
+    ]:
+        # info message
+        print(f"Updating the {version} dimension tables in {data_path}")
+
+        # fetch the dimension rows missing from the tables
+        added = update_dimensions_from_store(version, data_path)
+        print(f"Added {added}")
+
+    # time spent in the requests by version
+    report()
+
+
+if __name__ == "__main__":
+    fetch_main()
@@ -0,0 +1,52 @@
+"""
+Script to fetch swaps, mints and burns from Uniswap V2 and V3 together.
+"""
+
+import argparse
+from config import constants
+from environ.fetch.fetch_dimensions import update_dimensions
+from environ.fetch.fetch_estimate import print_plan
+from environ.fetch.fetch_plan import fetch_event_windows, save_event_windows
+from environ.fetch.telemetry import report
+
+
+def fetch_main() -> None:
+    """
+    Fetch all the entities of the event windows in batched requests.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--plan", action="store_true", help="print the estimated cost and exit"
+    )
+    args = parser.parse_args()
+
+    # estimate the fetch without running it
+    if args.plan:
+        print_plan(entities=["swaps", "mints", "burns"])
+        return
+
+    for version, data_path in [
+        ("v2", constants.DATA_V2_PATH),
+        ("v3", constants.DATA_V3_PATH),
+    ]:
+        # fetch the three entities of the union of the event windows, once
+        data = fetch_event_windows(version, ["swaps", "mints", "burns"])
+
+        # save the data of each event to the version directory
+        save_event_windows(data, version, data_path)
+
+        # fetch the pairs, pools and tokens referenced by normalized events
+        if constants.QUERY_PROFILE == "normalized":
+            update_dimensions(
+                version,
+                [df_entity for dfs in data.values() for df_entity in dfs.values()],
+                data_path,
+            )
+
+    # time spent in the requests by event and version
+    report()
+
+
+if __name__ == "__main__":
+    fetch_main()
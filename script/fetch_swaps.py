@@ -2,11 +2,11 @@
 Script to fetch event data from Uniswap V2 and V3.
 """
 
-import os
+import argparse
 from config import constants
-import environ.fetch.fetch_utils as utils
-from environ.fetch.fetch_swaps_v2 import fetch_swaps_v2
-from environ.fetch.fetch_swaps_v3 import fetch_swaps_v3
+from environ.fetch.fetch_estimate import print_plan
+from environ.fetch.fetch_plan import stream_event_windows
+from environ.fetch.telemetry import report
 
 
 def fetch_main() -> None:
@@ -14,53 +14,27 @@ def fetch_main() -> None:
     Aggregate all the fetch functions.
     """
 
-    for event_info in [
-        constants.EVENT_ONE,
-        constants.EVENT_TWO,
-        constants.EVENT_THREE,
-        constants.EVENT_FOUR,
-    ]:
-        # convert the timestring to timestamp
-        event_start_timestamp = utils.timestamp_converter(event_info[1])[
-            "start_timestamp"
-        ]
-        event_end_timestamp = utils.timestamp_converter(event_info[1])["end_timestamp"]
-
-        # info message
-        print(
-            f"Fetching v2 swap data for {event_info[0]} from {event_info[1]} "
-            f"with timestamp {event_start_timestamp} to {event_end_timestamp}"
-        )
-
-        # fetch swaps of Uniswap V2
-        df_swaps = fetch_swaps_v2(event_start_timestamp, event_end_timestamp)
-
-        # check if there is the path
-        if not os.path.exists(constants.DATA_V2_PATH):
-            os.makedirs(constants.DATA_V2_PATH)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--plan", action="store_true", help="print the estimated cost and exit"
+    )
+    args = parser.parse_args()
 
-        # save the data to Uniswap V2 directory
-        df_swaps.to_csv(
-            f"{constants.DATA_V2_PATH}/{event_info[0]}_swaps.csv", index=False
-        )
+    # estimate the fetch without running it
+    if args.plan:
+        print_plan(entities=["swaps"])
+        return
 
-        # info message
-        print(
-            f"Fetching v3 swap data for {event_info[0]} from {event_info[1]} "
-            f"with timestamp {event_start_timestamp} to {event_end_timestamp}"
-        )
-
-        # fetch swaps of Uniswap V3
-        df_swaps = fetch_swaps_v3(event_start_timestamp, event_end_timestamp)
-
-        # check if there is the path
-        if not os.path.exists(constants.DATA_V3_PATH):
-            os.makedirs(constants.DATA_V3_PATH)
+    for version, data_path in [
+        ("v2", constants.DATA_V2_PATH),
+        ("v3", constants.DATA_V3_PATH),
+    ]:
+        # fetch the swaps of the union of the event windows once, saving
+        # the data of each event to the version directory as it arrives
+        stream_event_windows(version, "swaps", data_path)
 
-        # save the data to Uniswap V3 directory
-        df_swaps.to_csv(
-            f"{constants.DATA_V3_PATH}/{event_info[0]}_swaps.csv", index=False
-        )
+    # time spent in the requests by event and version
+    report()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,55 @@
+"""
+Script to fetch the events of Uniswap V2 and V3 and generate the panel
+in one concurrent pipeline.
+"""
+
+import argparse
+from config import constants
+from environ.fetch.fetch_estimate import print_plan
+from environ.fetch.telemetry import report
+from environ.pipeline.fetch_pipeline import run_pipeline
+
+
+def pipeline_main() -> None:
+    """
+    Parse the arguments, run the pipeline and print the critical path.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--versions", default="v2,v3")
+    parser.add_argument("--entities", default="swaps,burns,mints")
+    parser.add_argument("--workers", type=int, default=constants.PIPELINE_WORKERS)
+    parser.add_argument(
+        "--endpoint-concurrency", type=int, default=constants.ENDPOINT_CONCURRENCY
+    )
+    parser.add_argument(
+        "--plan", action="store_true", help="print the estimated cost and exit"
+    )
+    args = parser.parse_args()
+
+    # estimate the fetch without running it
+    if args.plan:
+        print_plan(
+            versions=args.versions.split(","),
+            entities=args.entities.split(","),
+            endpoint_concurrency=args.endpoint_concurrency,
+        )
+        return
+
+    df_summary = run_pipeline(
+        versions=args.versions.split(","),
+        entities=args.entities.split(","),
+        workers=args.workers,
+        endpoint_concurrency=args.endpoint_concurrency,
+    )
+
+    # info message
+    print("Critical path:")
+    print(df_summary.to_string(index=False))
+
+    # time spent in the requests by event and version
+    report()
+
+
+if __name__ == "__main__":
+    pipeline_main()
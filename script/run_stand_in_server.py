@@ -0,0 +1,50 @@
+"""
+Script to run a local stand-in subgraph endpoint.
+"""
+
+import argparse
+from environ.benchmark.stand_in_server import (
+    ReplayIndex,
+    StandInServer,
+    SyntheticSubgraph,
+)
+
+
+def serve_main() -> None:
+    """
+    Parse the arguments and serve until interrupted.
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--replay", default=None, help="replay the responses recorded in this cache"
+    )
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    args = parser.parse_args()
+
+    backend = ReplayIndex(args.replay) if args.replay else SyntheticSubgraph(args.seed)
+    server = StandInServer(
+        backend,
+        host=args.host,
+        port=args.port,
+        latency=args.latency_ms / 1000,
+        latency_jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+    )
+
+    print(f"Serving the stand-in subgraph at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    serve_main()
@@ -7,11 +7,21 @@ from setuptools import setup, find_packages
 setup(
     name="environ",
     packages=find_packages(),
-    install_requires=["requests", "numpy", "pandas", "matplotlib", "tqdm"],
+    install_requires=[
+        "requests",
+        "aiohttp",
+        "numpy",
+        "pandas",
+        "pyarrow",
+        "matplotlib",
+        "tqdm",
+    ],
     extras_require={
+        "fast": ["orjson"],
         "dev": [
             "pylint",
             "black",
-        ]
+            "pytest",
+        ],
     },
 )
@@ -0,0 +1,114 @@
+"""
+Fixtures of the tests of the fetch layer, run against local stand-in
+subgraphs.
+"""
+
+from typing import Callable, Iterator
+import pytest
+from config import constants
+import environ.fetch.endpoints as endpoints
+import environ.fetch.slicer as slicer
+import environ.fetch.subgraph_query as subgraph
+from environ.benchmark.stand_in_server import (
+    DATA_START,
+    StandInServer,
+    SyntheticSubgraph,
+)
+
+# first second of the data of the tests
+T0 = DATA_START + 3600
+
+
+class CountsSubgraph(SyntheticSubgraph):
+    """
+    Synthetic subgraph with exactly `counts[timestamp]` events of every
+    entity at each second, none at the other seconds.
+    """
+
+    def __init__(self, counts: dict[int, int], seed: int = 0) -> None:
+        super().__init__(seed, burst_times=[])
+        self.counts = counts
+
+    def density(self, entity: str, timestamp: int) -> float:
+        return float(self.counts.get(timestamp, 0))
+
+    def ids(self, entity: str, lo: int, hi: int) -> list[str]:
+        """
+        Ids of the events of [lo, hi) in (timestamp, id) order.
+        """
+
+        return [
+            event["id"]
+            for timestamp in range(lo, hi)
+            for event in self.bucket(entity, timestamp)
+        ]
+
+
+def swaps_query(first: int) -> str:
+    """
+    Swaps query with pages of `first` events.
+    """
+
+    return f"""
+query ($start_timestamp_gt: Int!){{
+  swaps(
+    first: {first}
+    orderBy: timestamp
+    orderDirection: asc
+    where: {{timestamp_gt: $start_timestamp_gt}}
+  ) {{
+    id
+    timestamp
+    transaction {{
+      id
+      blockNumber
+    }}
+  }}
+}}
+"""
+
+
+@pytest.fixture(autouse=True)
+def isolated_fetch(tmp_path, monkeypatch) -> Iterator[None]:
+    """
+    Point the files of the fetch layer at a temporary directory, without
+    the response cache, the telemetry or the rate limit, and with fresh
+    endpoint pools and density models.
+    """
+
+    monkeypatch.setattr(constants, "CACHE_ENABLED", False)
+    monkeypatch.setattr(constants, "TELEMETRY_ENABLED", False)
+    monkeypatch.setattr(constants, "CHECKPOINT_PATH", str(tmp_path / "checkpoints"))
+    monkeypatch.setattr(constants, "RANGE_STORE_PATH", str(tmp_path / "ranges"))
+    monkeypatch.setattr(constants, "BLOCK_INDEX_PATH", str(tmp_path / "blocks"))
+    monkeypatch.setattr(constants, "CACHE_PATH", str(tmp_path / "cache"))
+    monkeypatch.setattr(endpoints, "_POOLS", {})
+    monkeypatch.setattr(slicer, "_MODELS", {})
+
+    policy = subgraph.RetryPolicy(
+        max_attempts=3, backoff_base=0.01, rate_limit=1000.0, rate_burst=1000
+    )
+    client = subgraph.SubgraphClient(policy=policy, use_cache=False)
+    subgraph.set_client(client)
+    yield
+    subgraph.set_client(None)
+    client.close()
+
+
+@pytest.fixture
+def stand_in() -> Iterator[Callable[..., StandInServer]]:
+    """
+    Start stand-in servers in this process, stopped after the test.
+    """
+
+    servers = []
+
+    def _start(backend: SyntheticSubgraph | None = None, **kwargs) -> StandInServer:
+        server = StandInServer(backend or SyntheticSubgraph(), **kwargs)
+        server.start()
+        servers.append(server)
+        return server
+
+    yield _start
+    for server in servers:
+        server.stop()
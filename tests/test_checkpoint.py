@@ -0,0 +1,116 @@
+"""
+Tests of the checkpoints of the pagination.
+"""
+
+import os
+from environ.fetch.checkpoint import Checkpoint, checkpointed_pages
+from environ.fetch.paginator import Paginator
+from tests.conftest import T0, CountsSubgraph, swaps_query
+
+# ten seconds of 7 events, 7 pages of 10
+COUNTS = {T0 + offset: 7 for offset in range(10)}
+
+
+def _checkpoint(tmp_path) -> Checkpoint:
+    """
+    Checkpoint of the test window.
+    """
+
+    return Checkpoint("v2", "swaps", T0 - 1, T0 + 10, swaps_query(10), str(tmp_path))
+
+
+def _ids(pages) -> list[str]:
+    """
+    Ids of the events of the pages, in order.
+    """
+
+    return [event["id"] for page in pages for event in page]
+
+
+def _interrupt(url: str, checkpoint: Checkpoint, pages: int) -> list[list[dict]]:
+    """
+    Page the test window with a checkpoint and stop after `pages` pages,
+    as a killed run would.
+    """
+
+    iterator = checkpointed_pages(
+        checkpoint, Paginator(url, swaps_query(10), T0 - 1, T0 + 10)
+    )
+    fetched = [next(iterator) for _ in range(pages)]
+    iterator.close()
+
+    return fetched
+
+
+def test_resume_after_interruption(stand_in, tmp_path):
+    backend = CountsSubgraph(COUNTS)
+    server = stand_in(backend)
+    fetched = _interrupt(server.url, _checkpoint(tmp_path), 3)
+    requests = server.stats["requests"]
+
+    # the next run reads the three pages back and fetches the others
+    checkpoint = _checkpoint(tmp_path)
+    pages = list(
+        checkpointed_pages(
+            checkpoint, Paginator(server.url, swaps_query(10), T0 - 1, T0 + 10)
+        )
+    )
+
+    assert pages[:3] == fetched
+    assert _ids(pages) == backend.ids("swaps", T0, T0 + 10)
+    assert server.stats["requests"] - requests == len(pages) - 3
+
+    # the checkpoint is removed once the window is covered
+    assert not os.path.exists(checkpoint.path)
+
+
+def test_resume_after_torn_last_line(stand_in, tmp_path):
+    backend = CountsSubgraph(COUNTS)
+    server = stand_in(backend)
+    fetched = _interrupt(server.url, _checkpoint(tmp_path), 3)
+
+    # the run was killed while appending the fourth page
+    checkpoint = _checkpoint(tmp_path)
+    size = os.path.getsize(checkpoint.pages_path)
+    with open(checkpoint.pages_path, "ab") as file:
+        file.write(b'[{"id": "0xtorn", "timest')
+
+    cursor, pages = checkpoint.load()
+
+    assert list(pages) == fetched
+    assert checkpoint.pages == 3
+    assert os.path.getsize(checkpoint.pages_path) == size
+
+    # the torn page is fetched again
+    paginator = Paginator(server.url, swaps_query(10), T0 - 1, T0 + 10, cursor)
+    assert _ids([*fetched, *paginator]) == backend.ids("swaps", T0, T0 + 10)
+
+
+def test_page_written_without_its_cursor(stand_in, tmp_path):
+    backend = CountsSubgraph(COUNTS)
+    server = stand_in(backend)
+    fetched = _interrupt(server.url, _checkpoint(tmp_path), 2)
+
+    # the run was killed after writing a whole page, before its cursor
+    checkpoint = _checkpoint(tmp_path)
+    with open(checkpoint.pages_path, "ab") as file:
+        file.write(b'[{"id": "0xextra", "timestamp": "1"}]\n')
+
+    _, pages = checkpoint.load()
+
+    assert list(pages) == fetched
+
+
+def test_pages_shorter_than_the_cursor(stand_in, tmp_path):
+    server = stand_in(CountsSubgraph(COUNTS))
+    _interrupt(server.url, _checkpoint(tmp_path), 3)
+
+    # the pages file lost its end: the window is fetched again from the start
+    checkpoint = _checkpoint(tmp_path)
+    with open(checkpoint.pages_path, "rb+") as file:
+        file.truncate(10)
+
+    cursor, pages = checkpoint.load()
+
+    assert cursor is None
+    assert not list(pages)
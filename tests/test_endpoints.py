@@ -0,0 +1,118 @@
+"""
+Tests of the failover between the mirrors of a subgraph.
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from config import constants
+from environ.fetch.endpoints import EndpointPool, get_pool
+from environ.fetch.paginator import Paginator
+from environ.fetch.subgraph_query_async import AsyncSubgraphClient
+from tests.conftest import T0, CountsSubgraph, swaps_query
+
+# ten seconds of 7 events, 7 pages of 10
+COUNTS = {T0 + offset: 7 for offset in range(10)}
+
+
+@pytest.fixture
+def mirrors(stand_in, monkeypatch):
+    """
+    Two stand-ins of the same subgraph, the second a mirror of the first,
+    with a long cooldown.
+    """
+
+    backend = CountsSubgraph(COUNTS)
+    primary, mirror = stand_in(backend), stand_in(backend)
+    monkeypatch.setattr(constants, "HTTP_V2", primary.url)
+    monkeypatch.setattr(constants, "HTTP_V2_MIRRORS", [mirror.url])
+    monkeypatch.setattr(constants, "ENDPOINT_COOLDOWN", 60.0)
+
+    return backend, primary, mirror
+
+
+def _ids(url: str) -> list[str]:
+    """
+    Ids of the events of the test window, paged from `url`.
+    """
+
+    paginator = Paginator(url, swaps_query(10), T0 - 1, T0 + 10)
+
+    return [event["id"] for page in paginator for event in page]
+
+
+@pytest.mark.parametrize("down", [False, True])
+def test_requests_fail_over_to_the_mirror(mirrors, down):
+    backend, primary, mirror = mirrors
+    pool = get_pool(primary.url)
+    pool.check()
+
+    # the primary is stopped, or answers every request with an error
+    if down:
+        primary.stop()
+    else:
+        primary.error_rate = 1.0
+    ids = _ids(primary.url)
+
+    # the failed page is sent again to the mirror, which takes the rest
+    assert ids == backend.ids("swaps", T0, T0 + 10)
+    assert primary.stats["errors"] == (0 if down else 1)
+    assert mirror.stats["requests"] == 7
+
+    # the primary sits out its cooldown while the mirror takes the requests
+    state = pool.states[primary.url]
+    assert not state.healthy
+    assert state.retry_at - time.monotonic() == pytest.approx(60.0, abs=5.0)
+    assert pool.acquire() == mirror.url
+
+
+def test_endpoint_back_after_its_health_check(mirrors, monkeypatch):
+    backend, primary, mirror = mirrors
+    pool = get_pool(primary.url)
+    pool.check()
+    primary.error_rate = 1.0
+    _ids(primary.url)
+
+    # the primary recovers, and the next health check is due
+    primary.error_rate = 0.0
+    monkeypatch.setattr(constants, "ENDPOINT_HEALTH_SECONDS", 0.1)
+    time.sleep(0.2)
+    requests = mirror.stats["requests"]
+    ids = _ids(primary.url)
+
+    # the `_meta` check clears the cooldown and the primary takes requests
+    state = pool.states[primary.url]
+    assert state.healthy and state.retry_at == 0.0
+    assert state.block is not None
+    assert state.block == pool.states[mirror.url].block
+    assert primary.stats["requests"] > 0
+    assert mirror.stats["requests"] - requests < 7
+    assert ids == backend.ids("swaps", T0, T0 + 10)
+
+
+def test_async_health_check_off_the_event_loop(mirrors, monkeypatch):
+    backend, primary, mirror = mirrors
+    threads = []
+    check = EndpointPool.check
+
+    def _check(pool: EndpointPool) -> None:
+        threads.append(threading.get_ident())
+        check(pool)
+
+    monkeypatch.setattr(EndpointPool, "check", _check)
+
+    async def _fetch() -> tuple[dict, int]:
+        async with AsyncSubgraphClient(use_cache=False) as client:
+            result = await client.post(
+                primary.url,
+                {"query": swaps_query(10), "variables": {"start_timestamp_gt": T0}},
+            )
+        return result, threading.get_ident()
+
+    result, loop_thread = asyncio.run(_fetch())
+
+    assert threads and loop_thread not in threads
+    assert [event["id"] for event in result["data"]["swaps"]] == backend.ids(
+        "swaps", T0 + 1, T0 + 3
+    )[:10]
@@ -0,0 +1,71 @@
+"""
+Tests of the decoding of the subgraph pages into column buffers.
+"""
+
+import numpy as np
+import pandas as pd
+from environ.fetch.event_registry import get_event
+from environ.fetch.fetch_engine import parse_events, unwrap_df
+from environ.fetch.page_decoder import concat_batches, decode_page
+
+RECORDS = [
+    {
+        "id": "0xa-1",
+        "timestamp": "1600000000",
+        "logIndex": "3",
+        "amountUSD": "1234.5678",
+        "sqrtPriceX96": "1461446703485210103287273052203988822378723970342",
+        "tick": "-12",
+        "pool": {"id": "0xpool", "token0Price": "0.25"},
+    },
+    {
+        "id": "0xa-2",
+        "timestamp": "1600000001",
+        "logIndex": "4",
+        "amountUSD": "0.000001",
+        "sqrtPriceX96": "79228162514264337593543950336",
+        "pool": None,
+    },
+]
+
+
+def test_declared_fields_decoded_into_typed_buffers():
+    batch = decode_page(RECORDS, "v3")
+
+    assert batch["timestamp"].dtype == np.int64
+    assert batch["logIndex"].tolist() == [3, 4]
+    assert batch["amountUSD"].dtype == np.float64
+    assert batch["amountUSD"].tolist() == [1234.5678, 0.000001]
+    assert batch["sqrtPriceX96"].dtype == np.float64
+
+    # a field missing from a record, the ids and the nested objects
+    assert batch["tick"].tolist() == ["-12", None]
+    assert batch["id"].dtype == object
+    assert batch["pool"].tolist() == [RECORDS[0]["pool"], None]
+
+
+def test_without_a_version_only_the_timestamp_is_typed():
+    batch = decode_page(RECORDS)
+
+    assert [column for column, buffer in batch.items() if buffer.dtype != object] == [
+        "timestamp"
+    ]
+
+
+def test_int64_field_past_int64_kept_as_strings():
+    batch = decode_page([{"logIndex": str(2**70)}, {"logIndex": "1"}], "v3")
+
+    assert batch["logIndex"].tolist() == [str(2**70), "1"]
+
+
+def test_typed_buffers_parse_as_the_strings():
+    nested_list = get_event("v3", "swaps").nested_list
+    frames = [
+        parse_events(
+            "v3",
+            unwrap_df(concat_batches([decode_page(RECORDS, version)]), nested_list),
+        )
+        for version in (None, "v3")
+    ]
+
+    pd.testing.assert_frame_equal(*frames)
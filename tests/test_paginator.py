@@ -0,0 +1,139 @@
+"""
+Tests of the lossless pagination on the (timestamp, id) and (block, id)
+cursors.
+"""
+
+import pytest
+from environ.benchmark.stand_in_server import BLOCK_TIME, SyntheticSubgraph
+from environ.fetch.paginator import BlockPaginator, Paginator
+from tests.conftest import T0, CountsSubgraph, swaps_query
+
+
+def _page_all(paginator: Paginator) -> list[list[dict]]:
+    """
+    Page through a paginator, returning its pages.
+    """
+
+    return list(paginator)
+
+
+def _ids(pages: list[list[dict]]) -> list[str]:
+    """
+    Ids of the events of the pages, in order.
+    """
+
+    return [event["id"] for page in pages for event in page]
+
+
+def test_second_denser_than_a_page(stand_in):
+    # a second holding more events than the largest page of the subgraph
+    backend = CountsSubgraph({T0: 5, T0 + 1: 2500, T0 + 2: 3})
+    server = stand_in(backend)
+
+    pages = _page_all(Paginator(server.url, swaps_query(1000), T0 - 1, T0 + 10))
+
+    assert _ids(pages) == backend.ids("swaps", T0, T0 + 10)
+    assert [len(page) for page in pages] == [1000, 1000, 508]
+    assert server.stats["requests"] == 3
+
+
+@pytest.mark.parametrize(
+    "counts, sizes",
+    [
+        # the drain of the second ends exactly on a page boundary
+        ({T0: 5, T0 + 1: 25, T0 + 2: 4}, [10, 10, 10, 4]),
+        # the scanned page ends exactly at the end of a second
+        ({T0: 5, T0 + 1: 5, T0 + 2: 4}, [10, 4]),
+        # the window ends right after a full page
+        ({T0: 4, T0 + 1: 6}, [10, 0]),
+    ],
+)
+def test_page_boundaries(stand_in, counts, sizes):
+    backend = CountsSubgraph(counts)
+    server = stand_in(backend)
+
+    pages = _page_all(Paginator(server.url, swaps_query(10), T0 - 1, T0 + 10))
+
+    assert _ids(pages) == backend.ids("swaps", T0, T0 + 10)
+    assert [len(page) for page in pages] == sizes
+    assert server.stats["requests"] == len(sizes)
+
+
+def test_drain_and_scan_in_one_request(stand_in):
+    # the second cut by the first page and the seconds after it come back
+    # in the same request
+    backend = CountsSubgraph({T0: 8, T0 + 1: 4, T0 + 2: 6, T0 + 3: 3})
+    server = stand_in(backend)
+    paginator = Paginator(server.url, swaps_query(10), T0 - 1, T0 + 10)
+
+    first = paginator.step()
+    query, params = paginator.next_request()
+    second = paginator.step()
+
+    assert query == paginator.resume_query
+    assert params == {
+        "timestamp": T0 + 1,
+        "id_gt": first[-1]["id"],
+        "timestamp_lt": T0 + 10,
+    }
+    assert paginator.done
+    assert [len(first), len(second)] == [10, 11]
+    assert _ids([first, second]) == backend.ids("swaps", T0, T0 + 10)
+    assert server.stats["requests"] == 2
+
+
+def test_end_lowered_while_paging(stand_in):
+    backend = CountsSubgraph({T0 + offset: 7 for offset in range(6)})
+    server = stand_in(backend)
+    paginator = Paginator(server.url, swaps_query(10), T0 - 1, T0 + 6)
+
+    first = paginator.step()
+    paginator.end_timestamp_lt = T0 + 3
+    rest = _page_all(paginator)
+
+    assert _ids([first, *rest]) == backend.ids("swaps", T0, T0 + 3)
+
+
+def test_cursor_round_trip(stand_in):
+    backend = CountsSubgraph({T0: 5, T0 + 1: 25, T0 + 2: 4})
+    server = stand_in(backend)
+    paginator = Paginator(server.url, swaps_query(10), T0 - 1, T0 + 10)
+    first = paginator.step()
+
+    # a new paginator restored from the cursor goes on where it stopped
+    restored = Paginator(
+        server.url, swaps_query(10), 0, 0, cursor=dict(paginator.cursor)
+    )
+
+    assert _ids([first, *_page_all(restored)]) == backend.ids("swaps", T0, T0 + 10)
+
+
+def test_block_paginator_dense_block(stand_in):
+    backend = SyntheticSubgraph(burst_times=[T0], burst_factor=60.0, burst_width=5.0)
+    server = stand_in(backend)
+    block = backend.block_of(T0)
+    window = (T0 - 20, T0 + 20)
+
+    pages = _page_all(
+        BlockPaginator(server.url, swaps_query(10), block - 3, block + 3, window=window)
+    )
+
+    # events in block order, ties broken by id, within the window
+    expected = [
+        event["id"]
+        for number in range(block - 2, block + 3)
+        for event in sorted(
+            (
+                event
+                for second in range(
+                    backend.timestamp_of(number),
+                    backend.timestamp_of(number) + BLOCK_TIME,
+                )
+                for event in backend.bucket("swaps", second)
+                if window[0] <= second < window[1]
+            ),
+            key=lambda event: event["id"],
+        )
+    ]
+    assert max(len(backend.bucket("swaps", T0 + offset)) for offset in range(3)) > 10
+    assert _ids(pages) == expected
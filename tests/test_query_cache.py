@@ -0,0 +1,66 @@
+"""
+Tests of the on-disk response cache and of the requests coalesced on it.
+"""
+
+import asyncio
+from environ.fetch.query_cache import QueryCache, make_key
+from environ.fetch.subgraph_query_async import AsyncSubgraphClient
+from tests.conftest import T0, swaps_query
+
+T0_VARIABLES = {"start_timestamp_gt": T0}
+PAYLOAD = {"query": swaps_query(10), "variables": T0_VARIABLES}
+
+
+def test_size_of_a_rewritten_entry_counted_once(tmp_path):
+    cache = QueryCache(str(tmp_path), max_bytes=2**20)
+    cache.put("aa", {"data": {"swaps": []}})
+    for rows in range(1, 4):
+        cache.put("aa", {"data": {"swaps": [{"id": "0x1"}] * rows}})
+    cache.put("bb", {"data": {"swaps": []}})
+
+    assert cache._size == sum(size for _, size, _ in cache._entries())
+
+
+def test_entry_not_written_is_skipped(tmp_path):
+    # the root of the cache is a file: no entry can be written
+    root = tmp_path / "cache"
+    root.write_text("")
+    cache = QueryCache(str(root))
+
+    cache.put("aa", {"data": {"swaps": []}})
+
+    assert cache.get("aa") is None
+    assert cache.get_or_fetch("bb", lambda: {"data": {}}) == {"data": {}}
+
+
+def test_followers_fetch_again_when_the_leader_is_cancelled(stand_in, tmp_path):
+    server = stand_in(latency=0.3)
+    cache = QueryCache(str(tmp_path / "cache"))
+
+    async def _fetch() -> tuple[asyncio.Task, dict]:
+        async with AsyncSubgraphClient(cache=cache) as client:
+            leader = asyncio.create_task(client.post(server.url, PAYLOAD))
+            await asyncio.sleep(0.1)
+            follower = asyncio.create_task(client.post(server.url, PAYLOAD))
+            await asyncio.sleep(0.1)
+            leader.cancel()
+            return leader, await follower
+
+    leader, result = asyncio.run(_fetch())
+
+    assert leader.cancelled()
+    assert cache.stats["coalesced"] == 1
+    assert len(result["data"]["swaps"]) == 10
+    assert cache.get(make_key(server.url, PAYLOAD["query"], T0_VARIABLES)) == result
+
+
+def test_async_fetch_not_failed_by_the_cache(stand_in, tmp_path):
+    server = stand_in()
+    root = tmp_path / "cache"
+    root.write_text("")
+
+    async def _fetch() -> dict:
+        async with AsyncSubgraphClient(cache=QueryCache(str(root))) as client:
+            return await client.post(server.url, PAYLOAD)
+
+    assert len(asyncio.run(_fetch())["data"]["swaps"]) == 10
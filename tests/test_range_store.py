@@ -0,0 +1,92 @@
+"""
+Tests of the range store of the fetched events.
+"""
+
+import pandas as pd
+import pytest
+from config import constants
+from environ.benchmark.stand_in_server import SyntheticSubgraph
+from environ.fetch.fetch_engine import fetch_events
+from environ.fetch.query_builder import get_query
+from environ.fetch.range_store import (
+    RangeStore,
+    get_range_store,
+    merge_intervals,
+    missing_intervals,
+)
+from tests.conftest import T0
+
+
+@pytest.mark.parametrize(
+    "intervals, merged",
+    [
+        ([], []),
+        ([(0, 10), (5, 20)], [(0, 20)]),
+        ([(0, 10), (10, 20)], [(0, 20)]),
+        ([(10, 20), (0, 5), (2, 8)], [(0, 8), (10, 20)]),
+        ([(0, 30), (5, 10)], [(0, 30)]),
+        ([(0, 10), (11, 20)], [(0, 10), (11, 20)]),
+    ],
+)
+def test_merge_intervals(intervals, merged):
+    assert merge_intervals(intervals) == merged
+
+
+@pytest.mark.parametrize(
+    "start, end, covered, missing",
+    [
+        (0, 100, [], [(0, 100)]),
+        (0, 100, [(0, 100)], []),
+        (0, 100, [(20, 40)], [(0, 20), (40, 100)]),
+        (0, 100, [(20, 40), (40, 60)], [(0, 20), (60, 100)]),
+        (0, 100, [(-10, 30), (90, 200)], [(30, 90)]),
+        (0, 100, [(100, 200), (-50, 0)], [(0, 100)]),
+    ],
+)
+def test_missing_intervals(start, end, covered, missing):
+    assert missing_intervals(start, end, covered) == missing
+
+
+def _frame(timestamps: list[int]) -> pd.DataFrame:
+    """
+    Frame of events at the timestamps.
+    """
+
+    return pd.DataFrame(
+        {"id": [f"0x{timestamp}" for timestamp in timestamps], "timestamp": timestamps}
+    )
+
+
+def test_put_and_read(tmp_path):
+    store = RangeStore("v2", "swaps", "http://stand-in/", "query", str(tmp_path))
+    store.put(0, 10, [_frame([1, 2]), _frame([5])])
+    store.put(10, 20, [])
+    store.put(20, 30, [_frame([25, 29])])
+
+    assert store.chunks() == [(0, 10), (10, 20), (20, 30)]
+    assert store.covered() == [(0, 30)]
+    assert store.missing(-5, 40) == [(-5, 0), (30, 40)]
+    assert store.read(2, 26)["timestamp"].tolist() == [2, 5, 25]
+    assert store.read(10, 20).empty
+
+
+def test_partial_overlap_fetches_only_the_gaps(stand_in, monkeypatch):
+    server = stand_in(SyntheticSubgraph())
+    monkeypatch.setattr(constants, "HTTP_V2", server.url)
+    store = get_range_store(
+        "v2", "swaps", server.url, get_query("v2", "swaps", "panel-minimal")
+    )
+
+    fetch_events("v2", "swaps", T0, T0 + 100, "panel-minimal")
+    requests = server.stats["requests"]
+    df_swaps = fetch_events("v2", "swaps", T0 - 50, T0 + 150, "panel-minimal")
+
+    # only the two gaps around the first range are queried
+    assert store.chunks() == [(T0, T0 + 100), (T0 - 50, T0), (T0 + 100, T0 + 150)]
+    assert server.stats["requests"] - requests == 2
+
+    # and the events are those of a fetch of the whole range at once
+    monkeypatch.setattr(constants, "RANGE_STORE_ENABLED", False)
+    df_direct = fetch_events("v2", "swaps", T0 - 50, T0 + 150, "panel-minimal")
+    assert df_swaps["id"].tolist() == df_direct["id"].tolist()
+    pd.testing.assert_frame_equal(df_swaps, df_direct)
@@ -0,0 +1,47 @@
+"""
+Tests of the sinks writing the events frame by frame.
+"""
+
+import os
+import pandas as pd
+import pytest
+from environ.fetch.sinks import CsvSink, ParquetSink, Sink
+
+
+def test_sink_without_its_methods_fails_at_instantiation():
+    class WriteOnlySink(Sink):
+        def write(self, df_frame: pd.DataFrame) -> None:
+            pass
+
+    with pytest.raises(TypeError, match="abstract"):
+        WriteOnlySink()
+
+
+@pytest.mark.parametrize(
+    "sink, read", [(CsvSink, pd.read_csv), (ParquetSink, pd.read_parquet)]
+)
+def test_sink_takes_its_name_once_complete(tmp_path, sink, read):
+    file_path = str(tmp_path / "events")
+    frames = [
+        pd.DataFrame({"id": ["0x1", "0x2"], "timestamp": [1, 2]}),
+        pd.DataFrame({"id": ["0x3"], "timestamp": [3]}),
+    ]
+
+    with sink(file_path) as open_sink:
+        for df_frame in frames:
+            open_sink.write(df_frame)
+        assert not os.path.exists(file_path)
+
+    df_read = read(file_path)
+    assert df_read["id"].tolist() == ["0x1", "0x2", "0x3"]
+
+
+def test_sink_aborted_on_error(tmp_path):
+    file_path = str(tmp_path / "events.csv")
+
+    with pytest.raises(ValueError):
+        with CsvSink(file_path) as sink:
+            sink.write(pd.DataFrame({"id": ["0x1"], "timestamp": [1]}))
+            raise ValueError("interrupted")
+
+    assert not os.listdir(tmp_path)
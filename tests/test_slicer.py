@@ -0,0 +1,211 @@
+"""
+Tests of the adaptive time slices: the density model, the slice plans and
+the work-stealing scheduler.
+"""
+
+import time
+import pytest
+from config import constants
+from environ.benchmark.stand_in_server import SyntheticSubgraph
+from environ.fetch.paginator import BlockPaginator, Paginator
+from environ.fetch.slicer import (
+    DensityModel,
+    SliceScheduler,
+    get_density_model,
+    iter_pages,
+    plan_slices,
+    stitch_pages,
+)
+from tests.conftest import T0, CountsSubgraph, swaps_query
+
+# skewed data: a burst of events in the middle of the window
+BURST = T0 + 300
+
+
+def _skewed() -> SyntheticSubgraph:
+    """
+    Synthetic subgraph with a narrow burst at `BURST`.
+    """
+
+    return SyntheticSubgraph(
+        rates={"swaps": 1.0}, burst_times=[BURST], burst_factor=40.0, burst_width=30.0
+    )
+
+
+def _ids(pages) -> list[str]:
+    """
+    Ids of the events of the pages, in order.
+    """
+
+    return [event["id"] for page in pages for event in page]
+
+
+def test_quantiles_split_the_expected_events():
+    model = DensityModel(bucket=10)
+    model.observe(0, 100, 100)
+    model.observe(100, 110, 900)
+
+    cuts = model.quantiles(0, 110, 4)
+
+    # a quarter of the 1000 events is before the dense bucket
+    assert cuts == sorted(set(cuts))
+    assert all(0 < cut < 110 for cut in cuts)
+    assert cuts[0] == 100 + 15 // 10
+    bounds = [0, *cuts, 110]
+    parts = [model.expected(lo, hi) for lo, hi in zip(bounds, bounds[1:])]
+    assert max(parts) - min(parts) <= 100
+
+
+def test_quantiles_without_observations():
+    assert DensityModel().quantiles(0, 100, 4) is None
+    assert plan_slices(0, 100, 4, 10) == [(0, 25), (25, 50), (50, 75), (75, 100)]
+
+
+@pytest.mark.parametrize("slices", [2, 5, 16])
+def test_plan_slices_cover_the_window(slices):
+    model = DensityModel(bucket=10)
+    model.observe(0, 1000, 50)
+    model.observe(500, 520, 2000)
+
+    planned = plan_slices(1, 1000, slices, 10, model)
+
+    # contiguous, disjoint and covering [start, end)
+    assert planned[0][0] == 1 and planned[-1][1] == 1000
+    assert all(hi == lo for (_, hi), (lo, _) in zip(planned, planned[1:]))
+    assert all(lo < hi for lo, hi in planned)
+
+    # every slice holds enough events to be worth a worker
+    assert all(
+        model.expected(lo, hi) >= constants.SLICE_MIN_PAGES * 10 for lo, hi in planned
+    )
+
+
+def test_plan_slices_merges_sparse_stretches():
+    model = DensityModel(bucket=10)
+    model.observe(0, 1000, 30)
+
+    # 30 events fill less than SLICE_MIN_PAGES pages of 10 per slice
+    assert plan_slices(0, 1000, 8, 10, model) == [(0, 1000)]
+
+
+@pytest.mark.parametrize("slices, workers", [(2, 2), (4, 8), (16, 4)])
+def test_sliced_fetch_matches_single_paginator(stand_in, slices, workers):
+    server = stand_in(_skewed())
+    query = swaps_query(25)
+
+    single = _ids(Paginator(server.url, query, T0 - 1, T0 + 600))
+    sliced = _ids(iter_pages(server.url, query, T0 - 1, T0 + 600, slices, workers))
+
+    assert len(single) > 40 * 25
+    assert sliced == single
+
+
+def test_slices_split_while_paging(stand_in):
+    # one slice and idle workers: the slice is split while it is paged
+    server = stand_in(_skewed(), latency=0.002)
+    query = swaps_query(25)
+    single = _ids(Paginator(server.url, query, T0 - 1, T0 + 600))
+
+    scheduler = SliceScheduler(server.url, query, T0 - 1, T0 + 600, 1, 4)
+    sliced = _ids(scheduler)
+
+    assert scheduler.splits > 0
+    assert scheduler.completed == scheduler.splits + 1
+    assert sliced == single
+
+
+def test_stitch_pages_drops_events_returned_twice():
+    def _event(timestamp: int, event_id: str) -> dict:
+        return {"id": event_id, "timestamp": str(timestamp)}
+
+    # a slice fetched again from inside the second 2, and a repeated id
+    pages = [
+        [_event(1, "a"), _event(2, "b"), _event(2, "c")],
+        [_event(2, "c"), _event(2, "d"), _event(3, "e")],
+        [_event(1, "a"), _event(3, "e"), _event(3, "f")],
+    ]
+
+    stitched = list(stitch_pages(iter(pages), Paginator.position))
+
+    assert [len(page) for page in stitched] == [3, 2, 1]
+    assert _ids(stitched) == ["a", "b", "c", "d", "e", "f"]
+
+
+def test_no_split_after_the_last_page(stand_in):
+    # sparse seconds in the density bucket of a dense second seen before
+    lo = T0 // constants.DENSITY_BUCKET * constants.DENSITY_BUCKET
+    backend = CountsSubgraph({lo + offset: 1 for offset in range(10, 60, 10)})
+    server = stand_in(backend, latency=0.05)
+    model = DensityModel()
+    model.observe(lo, lo + 1, 1000)
+
+    # one short page covers the slice while the other worker is idle
+    scheduler = SliceScheduler(
+        server.url, swaps_query(10), lo, lo + constants.DENSITY_BUCKET, 1, 2, model
+    )
+    ids = _ids(scheduler)
+
+    assert scheduler.splits == 0
+    assert len(set(ids)) == len(ids)
+    assert ids == backend.ids("swaps", lo + 1, lo + constants.DENSITY_BUCKET)
+
+
+def test_pages_buffered_across_slices_are_bounded(stand_in):
+    # a slow consumer: the workers of the later slices wait for it
+    server = stand_in(_skewed())
+    query = swaps_query(25)
+    single = _ids(Paginator(server.url, query, T0 - 1, T0 + 600))
+
+    scheduler = SliceScheduler(
+        server.url, query, T0 - 1, T0 + 600, 8, 8, buffer_pages=4
+    )
+    pages, buffered = [], []
+    for page in scheduler:
+        time.sleep(0.002)
+        pages.append(page)
+        buffered.append(scheduler.buffered)
+
+    assert max(buffered) <= 4 + 1
+    assert _ids(pages) == single
+
+
+def test_gap_between_slices_raises(stand_in):
+    server = stand_in(_skewed())
+    scheduler = SliceScheduler(server.url, swaps_query(25), T0 - 1, T0 + 600, 4, 4)
+
+    # the second slice is paged but lost to the consumer
+    del scheduler.slices[scheduler.tasks[1].start]
+
+    with pytest.raises(RuntimeError, match="No time slice starts at"):
+        list(scheduler)
+
+
+def test_sliced_fetch_learned_density(stand_in):
+    # the second fetch plans its slices from the density of the first one
+    server = stand_in(_skewed())
+    query = swaps_query(25)
+    first = _ids(iter_pages(server.url, query, T0 - 1, T0 + 600, 4, 4))
+
+    model = get_density_model(server.url, query)
+    planned = plan_slices(T0, T0 + 600, 8, 25, model)
+    scheduler = SliceScheduler(server.url, query, T0 - 1, T0 + 600, 8, 4, model)
+
+    # the slices are narrower over the burst
+    widths = {lo: hi - lo for lo, hi in planned}
+    burst_slice = max(lo for lo in widths if lo <= BURST)
+    assert widths[burst_slice] < max(widths.values())
+    assert _ids(scheduler) == first
+
+
+def test_block_slices_match_single_paginator(stand_in):
+    backend = _skewed()
+    server = stand_in(backend)
+    query = swaps_query(25)
+    block_gt, block_lt = backend.block_of(T0) - 1, backend.block_of(T0 + 600) + 1
+
+    single = _ids(BlockPaginator(server.url, query, block_gt, block_lt))
+    sliced = _ids(
+        iter_pages(server.url, query, block_gt, block_lt, 4, 4, BlockPaginator)
+    )
+
+    assert sliced == single
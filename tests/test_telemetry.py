@@ -0,0 +1,70 @@
+"""
+Tests of the telemetry of the subgraph requests.
+"""
+
+from environ.fetch.telemetry import Telemetry
+from tests.conftest import T0, swaps_query
+
+URL = "http://stand-in/"
+MIRROR = "http://mirror/"
+
+
+def _record(telemetry: Telemetry, latency: float, **kwargs) -> None:
+    """
+    Record a swaps request returning two events.
+    """
+
+    result = {"data": {"swaps": [{"id": "0x1", "timestamp": str(T0)}, {"id": "0x2"}]}}
+    telemetry.record(
+        URL,
+        {"query": swaps_query(10), "variables": {"start_timestamp_gt": T0 - 1}},
+        result,
+        latency,
+        latency,
+        nbytes=100,
+        **kwargs,
+    )
+
+
+def test_counters_and_histograms(tmp_path):
+    telemetry = Telemetry(str(tmp_path))
+    for latency in [0.01, 0.2, 0.3, 3.0]:
+        _record(telemetry, latency)
+    _record(telemetry, 0.0, cached=True)
+    _record(telemetry, 0.7, endpoint=MIRROR, retries=2)
+
+    telemetry.snapshot()
+    with open(telemetry.metrics_path, encoding="utf-8") as file:
+        lines = file.read().splitlines()
+
+    labels = f'endpoint="{URL}",version="other",entity="swaps",event="other"'
+    assert f'subgraph_requests_total{{{labels},cached="false"}} 4' in lines
+    assert f'subgraph_requests_total{{{labels},cached="true"}} 1' in lines
+    assert f'subgraph_rows_total{{{labels},cached="false"}} 8' in lines
+
+    # the cached request is not in the latency histogram of the endpoint
+    histogram = "subgraph_request_latency_seconds"
+    assert f'{histogram}_bucket{{endpoint="{URL}",le="0.05"}} 1' in lines
+    assert f'{histogram}_bucket{{endpoint="{URL}",le="0.5"}} 3' in lines
+    assert f'{histogram}_bucket{{endpoint="{URL}",le="+Inf"}} 4' in lines
+    assert f'{histogram}_count{{endpoint="{URL}"}} 4' in lines
+    assert f'{histogram}_bucket{{endpoint="{MIRROR}",le="1.0"}} 1' in lines
+
+
+def test_summary_read_from_the_records(tmp_path):
+    telemetry = Telemetry(str(tmp_path))
+    assert telemetry.summary().empty
+
+    for latency in [0.1, 0.2, 0.3]:
+        _record(telemetry, latency)
+    _record(telemetry, 0.5, endpoint=MIRROR, retries=1)
+
+    df_summary = telemetry.summary(["endpoint"]).set_index("endpoint")
+
+    assert telemetry.requests == 4
+    assert df_summary.loc[URL, "requests"] == 3
+    assert df_summary.loc[URL, "rows"] == 6
+    assert df_summary.loc[URL, "p50_ms"] == 200
+    assert df_summary.loc[MIRROR, "retries"] == 1
+    with open(telemetry.records_path, encoding="utf-8") as file:
+        assert len(file.readlines()) == 4